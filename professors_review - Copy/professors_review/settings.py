@@ -153,4 +153,16 @@ CSRF_COOKIE_NAME = 'csrftoken'
 CSRF_HEADER_NAME = 'HTTP_X_CSRFTOKEN'
 
 # اگر از مرورگر قدیمی استفاده می‌کنید
-CSRF_USE_SESSIONS = False
\ No newline at end of file
+CSRF_USE_SESSIONS = False
+
+# ==================== بافر رأی‌ها (reviews/vote_buffer.py) ====================
+# در صورت فعال بودن، رأی‌ها در حافظه جمع و به‌صورت دسته‌ای در یک تراکنش ذخیره می‌شوند
+REVIEWS_VOTE_BUFFER_ENABLED = False
+REVIEWS_VOTE_BUFFER_FLUSH_INTERVAL = 1.0  # ثانیه
+REVIEWS_VOTE_BUFFER_MAX_BATCH = 500
+
+# ==================== سهمیه کاربران (reviews/quotas.py) ====================
+# شمارنده‌ها در این کش نگه‌داری می‌شوند؛ در اجرای چندپروسه‌ای کش مشترک لازم است
+REVIEWS_QUOTA_CACHE = 'default'
+# تغییر سقف‌ها برای هر عمل و نقش، مثلاً {'review': {'user': 5, 'staff': 20}}
+REVIEWS_QUOTA_LIMITS = {}
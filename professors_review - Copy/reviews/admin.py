@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
+from django.db import transaction
+from collections import Counter, defaultdict
+from . import decay, quotas
 from .models import Professor, Review, Question, Answer, UserDailyLimit
 from django.contrib import messages
 
@@ -88,7 +91,7 @@ class ProfessorAdmin(admin.ModelAdmin):
                 '<div style="font-size:24px;color:#FF9800;margin:10px 0;">{} <span style="font-size:18px;color:#666;">({:.1f} از 5)</span></div>'
                 '<div style="color:#666;font-size:14px;">بر اساس {} نظر دانشجویان</div>'
                 '</div>',
-                stars, rating, obj.reviews.filter(is_approved=True).count()
+                stars, rating, obj.rating_count
             )
         return "<div style='color:#888;padding:10px;'>⭐ هنوز امتیازی ثبت نشده است</div>"
     
@@ -141,14 +144,30 @@ class ReviewAdmin(admin.ModelAdmin):
     
     actions = ['approve_reviews', 'reject_reviews', 'fix_review_counts']
     
+    def _set_approval(self, queryset, approved):
+        """تغییر وضعیت تأیید نظرات و اعمال گروهی تغییرات روی آمار تجمیعی اساتید"""
+        sign = 1 if approved else -1
+        with transaction.atomic():
+            changing = queryset.filter(is_approved=not approved)
+            deltas = defaultdict(Counter)
+            decayed = defaultdict(lambda: [0.0, 0.0])
+            for professor_id, rating, created_at in changing.values_list('professor_id', 'rating', 'created_at'):
+                weight = sign * decay.weight(created_at)
+                deltas[professor_id][rating] += sign
+                decayed[professor_id][0] += rating * weight
+                decayed[professor_id][1] += weight
+            count = changing.update(is_approved=approved)
+            Professor.apply_rating_deltas(deltas, decayed)
+        return count
+
     def approve_reviews(self, request, queryset):
-        count = queryset.update(is_approved=True)
+        count = self._set_approval(queryset, True)
         self.message_user(request, f'✅ {count} نظر تأیید شد.')
     
     approve_reviews.short_description = "تأیید نظرات انتخاب‌شده"
     
     def reject_reviews(self, request, queryset):
-        count = queryset.update(is_approved=False)
+        count = self._set_approval(queryset, False)
         self.message_user(request, f'❌ {count} نظر رد شد.')
     
     reject_reviews.short_description = "رد نظرات انتخاب‌شده"
@@ -161,7 +180,7 @@ class ReviewAdmin(admin.ModelAdmin):
         fixed_count = 0
         for review in queryset:
             try:
-                limit_date = review.created_at.date()
+                limit_date = review.local_date
                 daily_limit = UserDailyLimit.objects.filter(
                     user=review.user,
                     date=limit_date
@@ -171,7 +190,7 @@ class ReviewAdmin(admin.ModelAdmin):
                     # شمارش واقعی نظرات در آن تاریخ
                     actual_count = Review.objects.filter(
                         user=review.user,
-                        created_at__date=limit_date
+                        local_date=limit_date
                     ).count()
                     
                     if daily_limit.review_count != actual_count:
@@ -237,7 +256,7 @@ class QuestionAdmin(admin.ModelAdmin):
         fixed_count = 0
         for question in queryset:
             try:
-                limit_date = question.created_at.date()
+                limit_date = question.local_date
                 daily_limit = UserDailyLimit.objects.filter(
                     user=question.user,
                     date=limit_date
@@ -247,7 +266,7 @@ class QuestionAdmin(admin.ModelAdmin):
                     # شمارش واقعی پرسش‌ها در آن تاریخ
                     actual_count = Question.objects.filter(
                         user=question.user,
-                        created_at__date=limit_date
+                        local_date=limit_date
                     ).count()
                     
                     if daily_limit.question_count != actual_count:
@@ -330,14 +349,14 @@ class UserDailyLimitAdmin(admin.ModelAdmin):
     
     def can_post_review_display(self, obj):
         if obj.can_post_review:
-            return format_html('<span style="color:green;">✓ بله ({} باقی‌مانده)</span>', 4 - obj.review_count)
+            return format_html('<span style="color:green;">✓ بله ({} باقی‌مانده)</span>', quotas.limit_for(obj.user, 'review') - obj.review_count)
         return format_html('<span style="color:red;">✗ خیر (به حد مجاز رسیده)</span>')
     
     can_post_review_display.short_description = 'می‌تواند نظر بدهد'
     
     def can_post_question_display(self, obj):
         if obj.can_post_question:
-            return format_html('<span style="color:green;">✓ بله ({} باقی‌مانده)</span>', 4 - obj.question_count)
+            return format_html('<span style="color:green;">✓ بله ({} باقی‌مانده)</span>', quotas.limit_for(obj.user, 'question') - obj.question_count)
         return format_html('<span style="color:red;">✗ خیر (به حد مجاز رسیده)</span>')
     
     can_post_question_display.short_description = 'می‌تواند پرسش بدهد'
@@ -352,13 +371,13 @@ class UserDailyLimitAdmin(admin.ModelAdmin):
             # شمارش واقعی نظرات
             actual_review_count = Review.objects.filter(
                 user=daily_limit.user,
-                created_at__date=daily_limit.date
+                local_date=daily_limit.date
             ).count()
             
             # شمارش واقعی پرسش‌ها
             actual_question_count = Question.objects.filter(
                 user=daily_limit.user,
-                created_at__date=daily_limit.date
+                local_date=daily_limit.date
             ).count()
             
             daily_limit.review_count = actual_review_count
@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.models.signals import post_migrate
 
 
 class ReviewsConfig(AppConfig):
     name = 'reviews'
+
+    def ready(self):
+        from . import fuzzy, quotas, search
+        fuzzy.schedule_build()
+        post_migrate.connect(search.reset_fts_available, sender=self)
+        request_finished.connect(quotas.release_uncommitted, dispatch_uid='reviews_quota_holds')
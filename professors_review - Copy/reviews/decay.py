@@ -0,0 +1,30 @@
+"""
+امتیازهای کاهش‌یابنده با زمان (forward decay)
+
+وزن هر امتیاز با گذشت HALF_LIFE_DAYS نصف می‌شود. به‌جای کم کردن وزن همه
+امتیازهای قبلی با گذر زمان، وزن هر امتیاز نسبت به یک مبدأ ثابت حساب می‌شود:
+w = 2^((t - LANDMARK) / HALF_LIFE)، یعنی امتیازهای جدیدتر وزن بیشتری دارند.
+
+میانگین کاهش‌یابنده Σw·x / Σw است؛ ضریب 2^(-(now - LANDMARK) / HALF_LIFE) در
+صورت و مخرج یکسان است و حذف می‌شود، پس مجموع‌های ذخیره شده با گذر زمان
+بازنویسی نمی‌شوند و افزودن یا حذف هر امتیاز فقط یک F() + w·x است.
+
+تغییر HALF_LIFE_DAYS یا LANDMARK مجموع‌های ذخیره شده را بی‌اعتبار می‌کند؛ پس از
+آن rebuild_rating_aggregates و rebuild_evaluation_summaries اجرا شوند.
+"""
+import datetime
+
+LANDMARK = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+HALF_LIFE_DAYS = 365
+
+
+def weight(moment):
+    """وزن امتیاز ثبت شده در moment"""
+    return 2.0 ** ((moment - LANDMARK).total_seconds() / (HALF_LIFE_DAYS * 86400))
+
+
+def average(decayed_sum, decayed_weight):
+    """میانگین کاهش‌یابنده با یک رقم اعشار؛ None اگر امتیازی نباشد"""
+    if decayed_weight <= 0:
+        return None
+    return round(decayed_sum / decayed_weight, 1)
@@ -0,0 +1,167 @@
+"""
+ایندکس فازی (trigram) نام و دپارتمان اساتید در حافظه
+
+برای جستجوی زنده با تحمل غلط تایپی استفاده می‌شود: هر کلمه به سه‌حرفی‌های
+هم‌پوشان شکسته می‌شود و اساتید بر اساس نسبت سه‌حرفی‌های مشترک با عبارت جستجو
+رتبه‌بندی می‌شوند. تطبیق کاملاً در حافظه انجام می‌شود و به پایگاه‌داده نیازی ندارد.
+
+ایندکس در هر پروسه جداگانه نگهداری می‌شود؛ تغییرات اساتید از طریق سیگنال‌ها
+به‌صورت تدریجی اعمال می‌شود.
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.core.signals import request_started
+
+from .normalization import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+def _words(text):
+    return normalize_text(text).split()
+
+
+def _word_trigrams(word, complete=True):
+    padded = f'  {word} ' if complete else f'  {word}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def text_trigrams(text, prefix=False):
+    """سه‌حرفی‌های یک متن؛ در حالت prefix کلمه آخر ناتمام در نظر گرفته می‌شود"""
+    words = _words(text)
+    trigrams = set()
+    for position, word in enumerate(words):
+        complete = not (prefix and position == len(words) - 1)
+        trigrams |= _word_trigrams(word, complete)
+    return trigrams
+
+
+class TrigramIndex:
+    """ایندکس معکوس سه‌حرفی به شناسه استاد"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(set)
+        self._documents = {}
+        self.is_built = False
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _add(self, pk, name, department):
+        trigrams = text_trigrams(f'{name} {department}')
+        self._documents[pk] = trigrams
+        for trigram in trigrams:
+            self._postings[trigram].add(pk)
+
+    def _remove(self, pk):
+        for trigram in self._documents.pop(pk, ()):
+            postings = self._postings.get(trigram)
+            if postings is not None:
+                postings.discard(pk)
+                if not postings:
+                    del self._postings[trigram]
+
+    def build(self, rows):
+        """ساخت کامل ایندکس از (شناسه، نام، دپارتمان)"""
+        with self._lock:
+            self._postings = defaultdict(set)
+            self._documents = {}
+            for pk, name, department in rows:
+                self._add(pk, name, department)
+            self.is_built = True
+
+    def update(self, pk, name, department):
+        """افزودن یا جایگزینی یک استاد"""
+        with self._lock:
+            if not self.is_built:
+                return
+            self._remove(pk)
+            self._add(pk, name, department)
+
+    def remove(self, pk):
+        with self._lock:
+            if self.is_built:
+                self._remove(pk)
+
+    def clear(self):
+        """خالی کردن ایندکس؛ ساخت مجدد در اولین جستجو (ensure_built) انجام می‌شود
+
+        برای تغییرهایی که سیگنال ندارند، مثل QuerySet.update یا بارگذاری داده خام.
+        """
+        with self._lock:
+            self._postings = defaultdict(set)
+            self._documents = {}
+            self.is_built = False
+
+    def search(self, query, limit=10, min_score=0.3):
+        """k نتیجه برتر به صورت (شناسه، امتیاز) با امتیاز بین ۰ و ۱"""
+        query_trigrams = text_trigrams(query, prefix=True)
+        if not query_trigrams:
+            return []
+
+        with self._lock:
+            shared = defaultdict(int)
+            for trigram in query_trigrams:
+                for pk in self._postings.get(trigram, ()):
+                    shared[pk] += 1
+
+            results = []
+            for pk, count in shared.items():
+                # سهم سه‌حرفی‌های عبارت که در سند پیدا شده‌اند
+                coverage = count / len(query_trigrams)
+                if coverage < min_score:
+                    continue
+                # شباهت Dice برای ترجیح نام‌های نزدیک‌تر به عبارت
+                dice = 2 * count / (len(query_trigrams) + len(self._documents[pk]))
+                results.append((coverage, dice, pk))
+
+        top = heapq.nlargest(limit, results)
+        return [(pk, round(coverage, 3)) for coverage, dice, pk in top]
+
+
+professor_index = TrigramIndex()
+_build_lock = threading.Lock()
+
+
+def ensure_built():
+    """ساخت ایندکس از پایگاه‌داده در صورتی که هنوز ساخته نشده باشد"""
+    if professor_index.is_built:
+        return professor_index
+    with _build_lock:
+        if not professor_index.is_built:
+            from .models import Professor
+
+            started = time.perf_counter()
+            professor_index.build(Professor.objects.values_list('pk', 'name', 'department').iterator())
+            logger.info(
+                f"ایندکس فازی اساتید با {len(professor_index)} رکورد در "
+                f"{(time.perf_counter() - started) * 1000:.1f}ms ساخته شد"
+            )
+    return professor_index
+
+
+def _build_on_first_request(sender, **kwargs):
+    request_started.disconnect(dispatch_uid='reviews_fuzzy_index_build')
+    try:
+        ensure_built()
+    except Exception as e:
+        logger.error(f"خطا در ساخت ایندکس فازی اساتید: {e}")
+
+
+def schedule_build():
+    """ساخت ایندکس پیش از پردازش اولین درخواست پروسه
+
+    دسترسی به پایگاه‌داده در AppConfig.ready توصیه نمی‌شود (و هنگام migrate
+    ممکن است جدول وجود نداشته باشد)، پس ساخت به شروع اولین درخواست موکول می‌شود.
+    """
+    request_started.connect(_build_on_first_request, dispatch_uid='reviews_fuzzy_index_build')
+
+
+def search_professor_ids(query, limit=10):
+    """شناسه اساتید منطبق با عبارت (با تحمل غلط تایپی)، مرتب شده بر اساس امتیاز"""
+    return [pk for pk, score in ensure_built().search(query, limit=limit)]
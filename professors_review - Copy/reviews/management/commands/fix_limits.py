@@ -1,13 +1,52 @@
+import datetime
+
 from django.core.management.base import BaseCommand
 from reviews.models import fix_current_daily_limits
 
 class Command(BaseCommand):
     help = 'رفع مشکل محدودیت‌های روزانه کاربران با تطبیق شمارنده‌ها با داده‌های واقعی'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='فقط نمایش اصلاحات بدون ذخیره در پایگاه‌داده'
+        )
+        parser.add_argument(
+            '--since',
+            type=datetime.date.fromisoformat,
+            help='فقط رکوردهای این تاریخ و بعد از آن (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='تعداد رکوردهای هر دسته (پیش‌فرض ۵۰۰)'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.WARNING('در حال رفع مشکل محدودیت‌های روزانه...'))
-        
-        fix_current_daily_limits()
-        
-        self.stdout.write(self.style.SUCCESS('✓ رفع مشکل محدودیت‌های روزانه با موفقیت انجام شد.'))
-        self.stdout.write('از این به بعد وقتی نظر یا پرسشی حذف می‌شود، شمارنده به طور خودکار کاهش می‌یابد.')
\ No newline at end of file
+
+        def progress(processed, total):
+            self.stdout.write(f'  {processed}/{total} رکورد بررسی شد')
+
+        corrections = fix_current_daily_limits(
+            since=options['since'],
+            dry_run=options['dry_run'],
+            chunk_size=options['chunk_size'],
+            progress=progress
+        )
+
+        if options['verbosity'] > 1:
+            for daily_limit, field, stored, real in corrections:
+                self.stdout.write(f'  کاربر {daily_limit.user_id} در {daily_limit.date}: {field} {stored} → {real}')
+
+        rows = len({daily_limit.pk for daily_limit, field, stored, real in corrections})
+        reviews = sum(1 for correction in corrections if correction[1] == 'review_count')
+        questions = len(corrections) - reviews
+        summary = f'{rows} رکورد ({reviews} شمارنده نظر و {questions} شمارنده پرسش)'
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'اجرای آزمایشی: {summary} نیاز به اصلاح دارد.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✓ {summary} اصلاح شد.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews.models import ProfessorEvaluationSummary
+
+class Command(BaseCommand):
+    help = 'ساخت مجدد آمار تجمیعی ارزیابی‌های کیفی اساتید (مجموع، تعداد و توزیع امتیازها)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--professor',
+            type=int,
+            action='append',
+            dest='professor_ids',
+            help='شناسه استاد (قابل تکرار). در صورت عدم تعیین، همه اساتید محاسبه می‌شوند.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('در حال ساخت مجدد آمار ارزیابی‌های کیفی...'))
+
+        with transaction.atomic():
+            rebuilt = ProfessorEvaluationSummary.rebuild(options['professor_ids'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ آمار ارزیابی {rebuilt} استاد ساخته شد.'))
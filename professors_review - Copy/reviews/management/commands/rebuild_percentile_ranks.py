@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from reviews import ranking
+
+class Command(BaseCommand):
+    help = 'محاسبه رتبه درصدی اساتید در دانشکده (امتیاز کلی و پارامترهای ارزیابی) با NumPy'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='محاسبه مجدد همه دانشکده‌ها. در حالت پیش‌فرض فقط دانشکده‌های تغییر کرده محاسبه می‌شوند.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('در حال محاسبه رتبه درصدی اساتید...'))
+
+        departments, rows = ranking.refresh_ranks(full=options['full'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ رتبه {rows} استاد در {departments} دانشکده ذخیره شد.'))
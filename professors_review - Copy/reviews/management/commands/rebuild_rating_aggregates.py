@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews.models import Professor
+
+class Command(BaseCommand):
+    help = 'محاسبه مجدد آمار تجمیعی امتیاز اساتید (مجموع، تعداد و توزیع ستاره‌ها) از روی نظرات تأیید شده'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--professor',
+            type=int,
+            action='append',
+            dest='professor_ids',
+            help='شناسه استاد (قابل تکرار). در صورت عدم تعیین، همه اساتید محاسبه می‌شوند.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('در حال محاسبه مجدد آمار امتیاز اساتید...'))
+
+        with transaction.atomic():
+            changed = Professor.rebuild_rating_aggregates(options['professor_ids'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ آمار {changed} استاد اصلاح شد.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews import search
+from reviews.models import Professor
+
+class Command(BaseCommand):
+    help = 'ساخت مجدد ایندکس جستجوی متنی (FTS5) اساتید'
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            self.stdout.write(self.style.WARNING('ایندکس FTS5 روی این پایگاه‌داده در دسترس نیست؛ جستجو از icontains استفاده می‌کند.'))
+            return
+
+        self.stdout.write(self.style.WARNING('در حال ساخت مجدد ایندکس جستجو...'))
+
+        with transaction.atomic():
+            count = search.rebuild_index(Professor.objects.order_by('pk'))
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {count} استاد در ایندکس جستجو ثبت شد.'))
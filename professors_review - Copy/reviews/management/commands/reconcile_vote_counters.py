@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews.models import Answer, Review
+
+class Command(BaseCommand):
+    help = 'همگام‌سازی شمارنده‌های لایک/دیس‌لایک نظرات و پاسخ‌ها با جدول رأی‌ها'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('در حال بررسی شمارنده‌های رأی...'))
+
+        with transaction.atomic():
+            reviews_changed = Review.rebuild_vote_counters()
+            answers_changed = Answer.rebuild_vote_counters()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ شمارنده {reviews_changed} نظر و {answers_changed} پاسخ اصلاح شد.'
+        ))
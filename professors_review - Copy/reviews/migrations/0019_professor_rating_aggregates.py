@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:38
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Professor = apps.get_model('reviews', 'Professor')
+    Review = apps.get_model('reviews', 'Review')
+
+    stats = {}
+    grouped = Review.objects.filter(is_approved=True).values('professor_id', 'rating').annotate(total=Count('id')).order_by()
+    for row in grouped:
+        item = stats.setdefault(row['professor_id'], {'rating_sum': 0, 'rating_count': 0})
+        item['rating_sum'] += row['rating'] * row['total']
+        item['rating_count'] += row['total']
+        if 1 <= row['rating'] <= 5:
+            item[f"rating_{row['rating']}_count"] = row['total']
+
+    for professor_id, values in stats.items():
+        Professor.objects.filter(pk=professor_id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0018_professorevaluation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professor',
+            name='rating_1_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='تعداد امتیاز ۱'),
+        ),
+        migrations.AddField(
+            model_name='professor',
+            name='rating_2_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='تعداد امتیاز ۲'),
+        ),
+        migrations.AddField(
+            model_name='professor',
+            name='rating_3_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='تعداد امتیاز ۳'),
+        ),
+        migrations.AddField(
+            model_name='professor',
+            name='rating_4_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='تعداد امتیاز ۴'),
+        ),
+        migrations.AddField(
+            model_name='professor',
+            name='rating_5_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='تعداد امتیاز ۵'),
+        ),
+        migrations.AddField(
+            model_name='professor',
+            name='rating_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='تعداد امتیازها'),
+        ),
+        migrations.AddField(
+            model_name='professor',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False, verbose_name='مجموع امتیازها'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
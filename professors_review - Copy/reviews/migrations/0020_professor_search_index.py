@@ -0,0 +1,36 @@
+from django.db import migrations, OperationalError
+
+FTS_TABLE = 'reviews_professor_fts'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(name, department, bio, tokenize='unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        # SQLite بدون پشتیبانی FTS5؛ جستجو به icontains برمی‌گردد
+        return
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, name, department, bio) "
+        f"SELECT id, name, department, bio FROM reviews_professor"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0019_professor_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:41
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+FTS_TABLE = 'reviews_professor_fts'
+
+# کپی reviews/normalization.py در زمان این مهاجرت؛ مهاجرت به تغییرهای بعدی آن وابسته نیست
+_CHARACTER_MAP = {
+    'ي': 'ی',
+    'ى': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    'ؤ': 'و',
+    '\u200c': ' ',  # نیم‌فاصله (ZWNJ)
+    '\u200d': '',   # ZWJ
+    '\u0640': '',   # کشیده
+}
+_CHARACTER_MAP.update({persian: str(digit) for digit, persian in enumerate('۰۱۲۳۴۵۶۷۸۹')})
+_CHARACTER_MAP.update({arabic: str(digit) for digit, arabic in enumerate('٠١٢٣٤٥٦٧٨٩')})
+
+_TRANSLATION = str.maketrans(_CHARACTER_MAP)
+_DIACRITICS = re.compile('[\u064b-\u065f\u0670\u06d6-\u06ed]')
+
+
+def normalize_text(text):
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text)
+    text = _DIACRITICS.sub('', text)
+    text = text.translate(_TRANSLATION).casefold()
+    return ' '.join(text.split())
+
+
+def backfill_normalized_columns(apps, schema_editor):
+    Professor = apps.get_model('reviews', 'Professor')
+    professors = list(Professor.objects.all())
+    for professor in professors:
+        professor.name_normalized = normalize_text(professor.name)
+        professor.department_normalized = normalize_text(professor.department)
+    Professor.objects.bulk_update(professors, ['name_normalized', 'department_normalized'], batch_size=500)
+
+    # ایندکس FTS از این پس متن یکسان‌شده را نگه می‌دارد
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, department, bio) VALUES (%s, %s, %s, %s)',
+                [
+                    [p.pk, p.name_normalized, p.department_normalized, normalize_text(p.bio)]
+                    for p in professors
+                ]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0020_professor_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professor',
+            name='department_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='professor',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.RunPython(backfill_normalized_columns, migrations.RunPython.noop),
+    ]
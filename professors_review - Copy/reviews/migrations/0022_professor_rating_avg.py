@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:44
+
+from django.db import migrations, models
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+
+def backfill_rating_avg(apps, schema_editor):
+    Professor = apps.get_model('reviews', 'Professor')
+    Professor.objects.filter(rating_count__gt=0).update(
+        rating_avg=Cast('rating_sum', FloatField()) / F('rating_count')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0021_professor_normalized_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professor',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False, verbose_name='میانگین امتیاز'),
+        ),
+        migrations.RunPython(backfill_rating_avg, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='professor',
+            index=models.Index(fields=['name', 'id'], name='reviews_prof_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='professor',
+            index=models.Index(fields=['-rating_avg', 'id'], name='reviews_prof_rating_id_idx'),
+        ),
+    ]
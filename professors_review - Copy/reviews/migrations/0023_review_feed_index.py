@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0022_professor_rating_avg'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['professor', 'is_approved', '-created_at', '-id'], name='reviews_review_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_vote_counters(apps, schema_editor):
+    for model_name, vote_model_name, target in (
+        ('Review', 'ReviewVote', 'review_id'),
+        ('Answer', 'AnswerVote', 'answer_id'),
+    ):
+        Model = apps.get_model('reviews', model_name)
+        Vote = apps.get_model('reviews', vote_model_name)
+
+        stats = {}
+        for row in Vote.objects.values(target, 'value').annotate(total=Count('id')).order_by():
+            item = stats.setdefault(row[target], {'likes': 0, 'dislikes': 0})
+            item['likes' if row['value'] == 1 else 'dislikes'] += row['total']
+
+        for pk, values in stats.items():
+            Model.objects.filter(pk=pk).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0023_review_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='dislikes',
+            field=models.IntegerField(default=0, editable=False, verbose_name='تعداد مخالف'),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='likes',
+            field=models.IntegerField(default=0, editable=False, verbose_name='تعداد موافق'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='dislikes',
+            field=models.IntegerField(default=0, editable=False, verbose_name='تعداد مخالف'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='likes',
+            field=models.IntegerField(default=0, editable=False, verbose_name='تعداد موافق'),
+        ),
+        migrations.RunPython(backfill_vote_counters, migrations.RunPython.noop),
+    ]
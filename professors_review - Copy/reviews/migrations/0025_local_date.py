@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:06
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_local_date(apps, schema_editor):
+    for model_name in ('Review', 'Question', 'Answer'):
+        Model = apps.get_model('reviews', model_name)
+        changed = []
+        for obj in Model.objects.only('created_at', 'local_date').iterator(chunk_size=1000):
+            local_date = timezone.localdate(obj.created_at)
+            if obj.local_date != local_date:
+                obj.local_date = local_date
+                changed.append(obj)
+        Model.objects.bulk_update(changed, ['local_date'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0024_vote_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='local_date',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False, verbose_name='روز ایجاد'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='local_date',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False, verbose_name='روز ایجاد'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='local_date',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False, verbose_name='روز ایجاد'),
+        ),
+        migrations.RunPython(backfill_local_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['user', 'local_date'], name='reviews_answer_user_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['user', 'local_date'], name='reviews_question_user_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', 'local_date'], name='reviews_review_user_day_idx'),
+        ),
+    ]
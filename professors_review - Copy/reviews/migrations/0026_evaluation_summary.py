@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+PARAMETERS = (
+    'teaching_method', 'grading_flexibility', 'exam_difficulty',
+    'subject_knowledge', 'respect', 'student_interaction',
+)
+
+
+def backfill_evaluation_summaries(apps, schema_editor):
+    ProfessorEvaluation = apps.get_model('reviews', 'ProfessorEvaluation')
+    Summary = apps.get_model('reviews', 'ProfessorEvaluationSummary')
+
+    aggregates = {'evaluation_count': Count('id')}
+    for field in PARAMETERS:
+        aggregates[f'{field}_sum'] = Sum(field)
+        for score in range(1, 6):
+            aggregates[f'{field}_{score}_count'] = Count('id', filter=Q(**{field: score}))
+
+    rows = ProfessorEvaluation.objects.order_by().values('professor_id').annotate(**aggregates)
+    Summary.objects.bulk_create([Summary(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0025_local_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfessorEvaluationSummary',
+            fields=[
+                ('professor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='evaluation_summary', serialize=False, to='reviews.professor', verbose_name='استاد')),
+                ('evaluation_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد ارزیابی\u200cها')),
+                ('teaching_method_sum', models.IntegerField(default=0, editable=False, verbose_name='مجموع روش تدریس')),
+                ('teaching_method_1_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 1 ستاره روش تدریس')),
+                ('teaching_method_2_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 2 ستاره روش تدریس')),
+                ('teaching_method_3_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 3 ستاره روش تدریس')),
+                ('teaching_method_4_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 4 ستاره روش تدریس')),
+                ('teaching_method_5_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 5 ستاره روش تدریس')),
+                ('grading_flexibility_sum', models.IntegerField(default=0, editable=False, verbose_name='مجموع انعطاف پذیری')),
+                ('grading_flexibility_1_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 1 ستاره انعطاف پذیری')),
+                ('grading_flexibility_2_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 2 ستاره انعطاف پذیری')),
+                ('grading_flexibility_3_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 3 ستاره انعطاف پذیری')),
+                ('grading_flexibility_4_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 4 ستاره انعطاف پذیری')),
+                ('grading_flexibility_5_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 5 ستاره انعطاف پذیری')),
+                ('exam_difficulty_sum', models.IntegerField(default=0, editable=False, verbose_name='مجموع سختی امتحانات')),
+                ('exam_difficulty_1_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 1 ستاره سختی امتحانات')),
+                ('exam_difficulty_2_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 2 ستاره سختی امتحانات')),
+                ('exam_difficulty_3_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 3 ستاره سختی امتحانات')),
+                ('exam_difficulty_4_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 4 ستاره سختی امتحانات')),
+                ('exam_difficulty_5_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 5 ستاره سختی امتحانات')),
+                ('subject_knowledge_sum', models.IntegerField(default=0, editable=False, verbose_name='مجموع سواد علمی')),
+                ('subject_knowledge_1_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 1 ستاره سواد علمی')),
+                ('subject_knowledge_2_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 2 ستاره سواد علمی')),
+                ('subject_knowledge_3_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 3 ستاره سواد علمی')),
+                ('subject_knowledge_4_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 4 ستاره سواد علمی')),
+                ('subject_knowledge_5_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 5 ستاره سواد علمی')),
+                ('respect_sum', models.IntegerField(default=0, editable=False, verbose_name='مجموع ادب و احترام')),
+                ('respect_1_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 1 ستاره ادب و احترام')),
+                ('respect_2_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 2 ستاره ادب و احترام')),
+                ('respect_3_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 3 ستاره ادب و احترام')),
+                ('respect_4_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 4 ستاره ادب و احترام')),
+                ('respect_5_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 5 ستاره ادب و احترام')),
+                ('student_interaction_sum', models.IntegerField(default=0, editable=False, verbose_name='مجموع تعامل با دانشجو')),
+                ('student_interaction_1_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 1 ستاره تعامل با دانشجو')),
+                ('student_interaction_2_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 2 ستاره تعامل با دانشجو')),
+                ('student_interaction_3_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 3 ستاره تعامل با دانشجو')),
+                ('student_interaction_4_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 4 ستاره تعامل با دانشجو')),
+                ('student_interaction_5_count', models.IntegerField(default=0, editable=False, verbose_name='تعداد 5 ستاره تعامل با دانشجو')),
+            ],
+            options={
+                'verbose_name': 'آمار ارزیابی کیفی',
+                'verbose_name_plural': 'آمار ارزیابی\u200cهای کیفی',
+            },
+        ),
+        migrations.RunPython(backfill_evaluation_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0026_evaluation_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professorevaluationsummary',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='تاریخ به\u200cروزرسانی'),
+        ),
+        migrations.AddField(
+            model_name='professorevaluationsummary',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='نسخه'),
+        ),
+    ]
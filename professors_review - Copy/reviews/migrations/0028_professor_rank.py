@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0027_evaluation_summary_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfessorRank',
+            fields=[
+                ('professor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='percentile_rank', serialize=False, to='reviews.professor', verbose_name='استاد')),
+                ('department', models.CharField(db_index=True, editable=False, max_length=200, verbose_name='دانشکده')),
+                ('department_size', models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد اساتید دانشکده')),
+                ('source_rating_sum', models.IntegerField(default=0, editable=False)),
+                ('source_rating_count', models.IntegerField(default=0, editable=False)),
+                ('source_evaluation_version', models.PositiveIntegerField(default=0, editable=False)),
+                ('rating_top_percent', models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='درصد برتری امتیاز کلی')),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='زمان محاسبه')),
+                ('teaching_method_top_percent', models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='درصد برتری روش تدریس')),
+                ('grading_flexibility_top_percent', models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='درصد برتری انعطاف پذیری')),
+                ('exam_difficulty_top_percent', models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='درصد برتری سختی امتحانات')),
+                ('subject_knowledge_top_percent', models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='درصد برتری سواد علمی')),
+                ('respect_top_percent', models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='درصد برتری ادب و احترام')),
+                ('student_interaction_top_percent', models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='درصد برتری تعامل با دانشجو')),
+            ],
+            options={
+                'verbose_name': 'رتبه درصدی استاد',
+                'verbose_name_plural': 'رتبه\u200cهای درصدی اساتید',
+            },
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:25
+
+import datetime
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+
+# کپی reviews/decay.py در زمان این مهاجرت؛ مهاجرت به تغییرهای بعدی آن وابسته نیست
+LANDMARK = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+HALF_LIFE_DAYS = 365
+
+
+def decay_weight(moment):
+    return 2.0 ** ((moment - LANDMARK).total_seconds() / (HALF_LIFE_DAYS * 86400))
+
+
+PARAMETERS = (
+    'teaching_method', 'grading_flexibility', 'exam_difficulty',
+    'subject_knowledge', 'respect', 'student_interaction',
+)
+
+
+def backfill_decayed_scores(apps, schema_editor):
+    Professor = apps.get_model('reviews', 'Professor')
+    Review = apps.get_model('reviews', 'Review')
+    ProfessorEvaluation = apps.get_model('reviews', 'ProfessorEvaluation')
+    ProfessorEvaluationSummary = apps.get_model('reviews', 'ProfessorEvaluationSummary')
+
+    ratings = defaultdict(Counter)
+    for professor_id, rating, created_at in Review.objects.filter(is_approved=True).values_list(
+        'professor_id', 'rating', 'created_at'
+    ).iterator(chunk_size=2000):
+        weight = decay_weight(created_at)
+        ratings[professor_id]['rating_decayed_sum'] += rating * weight
+        ratings[professor_id]['rating_decayed_weight'] += weight
+    changed = []
+    for professor in Professor.objects.filter(pk__in=list(ratings)).only('pk'):
+        for field, value in ratings[professor.pk].items():
+            setattr(professor, field, value)
+        changed.append(professor)
+    Professor.objects.bulk_update(changed, ['rating_decayed_sum', 'rating_decayed_weight'], batch_size=500)
+
+    evaluations = defaultdict(Counter)
+    for professor_id, created_at, *scores in ProfessorEvaluation.objects.values_list(
+        'professor_id', 'created_at', *PARAMETERS
+    ).iterator(chunk_size=2000):
+        weight = decay_weight(created_at)
+        evaluations[professor_id]['decayed_weight'] += weight
+        for field, score in zip(PARAMETERS, scores):
+            evaluations[professor_id][f'{field}_decayed_sum'] += score * weight
+    columns = ['decayed_weight'] + [f'{field}_decayed_sum' for field in PARAMETERS]
+    changed = []
+    for summary in ProfessorEvaluationSummary.objects.filter(pk__in=list(evaluations)).only('pk'):
+        for column in columns:
+            setattr(summary, column, evaluations[summary.pk][column])
+        changed.append(summary)
+    ProfessorEvaluationSummary.objects.bulk_update(changed, columns, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0028_professor_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professor',
+            name='rating_decayed_sum',
+            field=models.FloatField(default=0, editable=False, verbose_name='مجموع وزنی امتیازها'),
+        ),
+        migrations.AddField(
+            model_name='professor',
+            name='rating_decayed_weight',
+            field=models.FloatField(default=0, editable=False, verbose_name='مجموع وزن امتیازها'),
+        ),
+        migrations.AddField(
+            model_name='professorevaluationsummary',
+            name='decayed_weight',
+            field=models.FloatField(default=0, editable=False, verbose_name='مجموع وزن ارزیابی\u200cها'),
+        ),
+        migrations.AddField(
+            model_name='professorevaluationsummary',
+            name='exam_difficulty_decayed_sum',
+            field=models.FloatField(default=0, editable=False, verbose_name='مجموع وزنی سختی امتحانات'),
+        ),
+        migrations.AddField(
+            model_name='professorevaluationsummary',
+            name='grading_flexibility_decayed_sum',
+            field=models.FloatField(default=0, editable=False, verbose_name='مجموع وزنی انعطاف پذیری'),
+        ),
+        migrations.AddField(
+            model_name='professorevaluationsummary',
+            name='respect_decayed_sum',
+            field=models.FloatField(default=0, editable=False, verbose_name='مجموع وزنی ادب و احترام'),
+        ),
+        migrations.AddField(
+            model_name='professorevaluationsummary',
+            name='student_interaction_decayed_sum',
+            field=models.FloatField(default=0, editable=False, verbose_name='مجموع وزنی تعامل با دانشجو'),
+        ),
+        migrations.AddField(
+            model_name='professorevaluationsummary',
+            name='subject_knowledge_decayed_sum',
+            field=models.FloatField(default=0, editable=False, verbose_name='مجموع وزنی سواد علمی'),
+        ),
+        migrations.AddField(
+            model_name='professorevaluationsummary',
+            name='teaching_method_decayed_sum',
+            field=models.FloatField(default=0, editable=False, verbose_name='مجموع وزنی روش تدریس'),
+        ),
+        migrations.RunPython(backfill_decayed_scores, migrations.RunPython.noop),
+    ]
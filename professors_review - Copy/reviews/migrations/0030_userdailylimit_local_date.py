@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0029_decayed_scores'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userdailylimit',
+            name='date',
+            field=models.DateField(default=django.utils.timezone.localdate, verbose_name='تاریخ'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:20
+
+from django.db import migrations
+
+
+def clear_ranks(apps, schema_editor):
+    # رتبه سختی امتحانات برعکس شده است؛ با جدول خالی اجرای بعدی
+    # rebuild_percentile_ranks همه دانشکده‌ها را دوباره محاسبه می‌کند
+    apps.get_model('reviews', 'ProfessorRank').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0030_userdailylimit_local_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_ranks, migrations.RunPython.noop),
+    ]
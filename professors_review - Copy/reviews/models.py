@@ -1,21 +1,60 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf, Round
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
-import datetime
-from django.db.models.signals import post_delete
+import math
+import threading
+from collections import Counter, defaultdict
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from . import decay, fuzzy, quotas, search
+from .normalization import normalize_text
+
 # =========================
 # ثابت‌های سیستم
 # =========================
-DAILY_REVIEW_LIMIT = 3  # تغییر از ۴ به ۳
-DAILY_QUESTION_LIMIT = 3  # تغییر از ۴ به ۳
+RATING_STARS = range(1, 6)
+
+
+def _per_row(values):
+    """مقدار جداگانه هر ردیف ({شناسه: مقدار}) در یک UPDATE گروهی"""
+    return Case(
+        *(When(pk=pk, then=Value(value)) for pk, value in values.items()),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
 
 # =========================
 # Professor
 # =========================
+class ProfessorQuerySet(models.QuerySet):
+    def for_listing(self):
+        """اساتید به همراه میانگین امتیاز و تعداد نظر/پرسش/ارزیابی، همه در یک دستور SQL"""
+        approved_questions = Question.objects.filter(
+            professor=OuterRef('pk'), is_approved=True
+        ).order_by().values('professor').annotate(total=Count('id')).values('total')
+        evaluations = ProfessorEvaluation.objects.filter(
+            professor=OuterRef('pk')
+        ).order_by().values('professor').annotate(total=Count('id')).values('total')
+
+        return self.annotate(
+            avg_rating=Case(
+                When(rating_count__gt=0, then=Round(Cast('rating_sum', FloatField()) / F('rating_count'), 1)),
+                default=None,
+                output_field=FloatField(),
+            ),
+            review_count=F('rating_count'),
+            question_count=Coalesce(Subquery(approved_questions, output_field=IntegerField()), 0),
+            evaluation_count=Coalesce(Subquery(evaluations, output_field=IntegerField()), 0),
+        )
+
+
 class Professor(models.Model):
     name = models.CharField(max_length=200, verbose_name=_("نام کامل"))
     department = models.CharField(max_length=200, blank=True, verbose_name=_("دانشکده/دپارتمان"))
@@ -28,32 +67,295 @@ class Professor(models.Model):
         verbose_name=_("عکس پروفایل"),
         help_text=_("عکس با ابعاد مناسب (ترجیحاً مربعی) حداکثر 2MB")
     )
+
+    # شکل یکسان‌شده نام و دپارتمان برای جستجو (reviews/normalization.py)
+    name_normalized = models.CharField(max_length=200, db_index=True, editable=False, blank=True)
+    department_normalized = models.CharField(max_length=200, db_index=True, editable=False, blank=True)
+
+    # آمار تجمیعی نظرات تأیید شده (به‌صورت خودکار نگهداری می‌شود)
+    rating_sum = models.IntegerField(default=0, editable=False, verbose_name=_("مجموع امتیازها"))
+    rating_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد امتیازها"))
+    rating_1_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد امتیاز ۱"))
+    rating_2_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد امتیاز ۲"))
+    rating_3_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد امتیاز ۳"))
+    rating_4_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد امتیاز ۴"))
+    rating_5_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد امتیاز ۵"))
+    # میانگین دقیق (بدون گرد کردن) برای مرتب‌سازی و صفحه‌بندی؛ بدون امتیاز برابر صفر
+    rating_avg = models.FloatField(default=0, editable=False, verbose_name=_("میانگین امتیاز"))
+    # مجموع امتیازها و وزن‌ها با وزن کاهش‌یابنده با زمان (reviews/decay.py)
+    rating_decayed_sum = models.FloatField(default=0, editable=False, verbose_name=_("مجموع وزنی امتیازها"))
+    rating_decayed_weight = models.FloatField(default=0, editable=False, verbose_name=_("مجموع وزن امتیازها"))
+
+    RATING_AGGREGATE_FIELDS = (
+        ['rating_sum', 'rating_count'] + [f'rating_{star}_count' for star in RATING_STARS]
+        + ['rating_avg', 'rating_decayed_sum', 'rating_decayed_weight']
+    )
+
+    objects = ProfessorQuerySet.as_manager()
     
     class Meta:
         verbose_name = _("استاد")
         verbose_name_plural = _("اساتید")
         ordering = ['name']
+        indexes = [
+            # ایندکس‌های صفحه‌بندی keyset (reviews/pagination.py)
+            models.Index(fields=['name', 'id'], name='reviews_prof_name_id_idx'),
+            models.Index(fields=['-rating_avg', 'id'], name='reviews_prof_rating_id_idx'),
+        ]
     
     def __str__(self):
         return self.name
 
+    def clean(self):
+        """جلوگیری از ثبت استاد تکراری با املای متفاوت (ي/ی، نیم‌فاصله و ...)"""
+        duplicates = Professor.objects.filter(
+            name_normalized=normalize_text(self.name),
+            department_normalized=normalize_text(self.department)
+        ).exclude(pk=self.pk)
+        if duplicates.exists():
+            raise ValidationError({'name': _("استادی با همین نام و دپارتمان قبلاً ثبت شده است.")})
+
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_text(self.name)
+        self.department_normalized = normalize_text(self.department)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'name_normalized', 'department_normalized'}
+        super().save(*args, **kwargs)
+
     @property
     def average_rating(self):
-        approved_reviews = self.reviews.filter(is_approved=True)
-        if approved_reviews.exists():
-            return round(sum(r.rating for r in approved_reviews) / approved_reviews.count(), 1)
+        if self.rating_count > 0:
+            return round(self.rating_sum / self.rating_count, 1)
+        return None
+
+    @property
+    def decayed_rating(self):
+        """میانگین امتیاز با وزن بیشتر برای نظرات اخیر"""
+        if self.rating_count > 0:
+            return decay.average(self.rating_decayed_sum, self.rating_decayed_weight)
         return None
 
+    @property
+    def rating_histogram(self):
+        """تعداد نظرات تأیید شده برای هر ستاره (از ۱ تا ۵)"""
+        return [getattr(self, f'rating_{star}_count') for star in RATING_STARS]
+
+    @classmethod
+    def apply_rating_delta(cls, professor_id, rating, delta, moment):
+        """اعمال تغییر نظرات تأیید شده روی آمار تجمیعی استاد با یک UPDATE اتمیک
+
+        delta مثبت یعنی افزودن نظر (یا تأیید آن) و منفی یعنی حذف (یا لغو تأیید)؛
+        moment زمان ثبت نظر است (برای وزن کاهش‌یابنده).
+        """
+        weight = delta * decay.weight(moment)
+        cls.objects.filter(pk=professor_id).update(
+            **cls._rating_changes({rating: delta}, (rating * weight, weight))
+        )
+
+    @classmethod
+    def apply_rating_deltas(cls, deltas, decayed=None):
+        """اعمال گروهی تغییرها؛ deltas نگاشت شناسه استاد به {ستاره: تغییر تعداد}
+        و decayed نگاشت شناسه استاد به (تغییر مجموع وزنی، تغییر وزن)
+
+        اساتیدی با تغییر تعداد یکسان با یک UPDATE به‌روزرسانی می‌شوند؛ تغییر
+        وزنی هر استاد با CASE در همان UPDATE اعمال می‌شود.
+        """
+        decayed = decayed or {}
+        groups = {}
+        for pk, rating_deltas in deltas.items():
+            key = tuple(sorted((rating, delta) for rating, delta in rating_deltas.items() if delta))
+            if key:
+                groups.setdefault(key, []).append(pk)
+        for key, pks in groups.items():
+            group_decayed = None
+            if any(pk in decayed for pk in pks):
+                group_decayed = tuple(
+                    _per_row({pk: decayed[pk][position] for pk in pks if pk in decayed})
+                    for position in (0, 1)
+                )
+            cls.objects.filter(pk__in=pks).update(**cls._rating_changes(dict(key), group_decayed))
+
+    @staticmethod
+    def _rating_changes(rating_deltas, decayed=None):
+        """عبارت‌های UPDATE برای تغییر تعداد نظرات هر ستاره ({ستاره: تغییر})
+
+        decayed در صورت وجود (تغییر مجموع وزنی، تغییر وزن) است.
+        """
+        new_sum = F('rating_sum') + sum(rating * delta for rating, delta in rating_deltas.items())
+        new_count = F('rating_count') + sum(rating_deltas.values())
+        changes = {
+            'rating_sum': new_sum,
+            'rating_count': new_count,
+            # مقادیر سمت راست SET از سطر قبل از به‌روزرسانی خوانده می‌شوند
+            'rating_avg': Coalesce(Cast(new_sum, FloatField()) / NullIf(new_count, 0), 0.0),
+        }
+        for rating, delta in rating_deltas.items():
+            if rating in RATING_STARS:
+                star_field = f'rating_{rating}_count'
+                changes[star_field] = F(star_field) + delta
+        if decayed is not None:
+            changes['rating_decayed_sum'] = F('rating_decayed_sum') + decayed[0]
+            changes['rating_decayed_weight'] = F('rating_decayed_weight') + decayed[1]
+        return changes
+
+    @classmethod
+    def rebuild_rating_aggregates(cls, professor_ids=None):
+        """محاسبه مجدد آمار تجمیعی از روی نظرات تأیید شده (برای همه یا اساتید مشخص)"""
+        reviews = Review.objects.filter(is_approved=True)
+        professors = cls.objects.all()
+        if professor_ids is not None:
+            reviews = reviews.filter(professor_id__in=professor_ids)
+            professors = professors.filter(pk__in=professor_ids)
+
+        stats = {}
+        grouped = reviews.values('professor_id', 'rating').annotate(total=Count('id')).order_by()
+        for row in grouped:
+            item = stats.setdefault(row['professor_id'], dict.fromkeys(cls.RATING_AGGREGATE_FIELDS, 0))
+            item['rating_sum'] += row['rating'] * row['total']
+            item['rating_count'] += row['total']
+            if row['rating'] in RATING_STARS:
+                item[f"rating_{row['rating']}_count"] += row['total']
+        # وزن هر نظر به زمان ثبت آن بستگی دارد و در پایتون جمع زده می‌شود
+        for professor_id, rating, created_at in reviews.order_by().values_list(
+            'professor_id', 'rating', 'created_at'
+        ).iterator(chunk_size=2000):
+            weight = decay.weight(created_at)
+            stats[professor_id]['rating_decayed_sum'] += rating * weight
+            stats[professor_id]['rating_decayed_weight'] += weight
+        for item in stats.values():
+            item['rating_avg'] = item['rating_sum'] / item['rating_count']
+
+        changed = []
+        for professor in professors.only('pk', *cls.RATING_AGGREGATE_FIELDS):
+            values = stats.get(professor.pk, dict.fromkeys(cls.RATING_AGGREGATE_FIELDS, 0))
+            # مجموع‌های وزنی اعشاری هستند و با خطای گرد کردن مقایسه می‌شوند
+            if any(
+                not math.isclose(getattr(professor, field), value, rel_tol=1e-12, abs_tol=1e-9)
+                for field, value in values.items()
+            ):
+                for field, value in values.items():
+                    setattr(professor, field, value)
+                changed.append(professor)
+
+        cls.objects.bulk_update(changed, cls.RATING_AGGREGATE_FIELDS, batch_size=500)
+        return len(changed)
+
     def get_image_url(self):
         if self.image and hasattr(self.image, 'url'):
             return self.image.url
         return '/static/images/default-professor.png'
 
 
+# =========================
+# شمارنده رأی‌ها (مشترک نظر و پاسخ)
+# =========================
+class VoteCountersModel(models.Model):
+    """تعداد رأی‌های موافق/مخالف که همراه با تغییر رأی‌ها در همان تراکنش نگهداری می‌شود"""
+    likes = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد موافق"))
+    dislikes = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد مخالف"))
+
+    class Meta:
+        abstract = True
+
+    def likes_count(self):
+        return self.likes
+
+    def dislikes_count(self):
+        return self.dislikes
+
+    @staticmethod
+    def _vote_field(value):
+        return 'likes' if value == 1 else 'dislikes'
+
+    @classmethod
+    def apply_vote_delta(cls, pk, old_value, new_value):
+        """اعمال تغییر یک رأی (از old_value به new_value؛ None یعنی بدون رأی) با یک UPDATE اتمیک"""
+        if old_value == new_value:
+            return
+        changes = {}
+        if old_value is not None:
+            field = cls._vote_field(old_value)
+            changes[field] = F(field) - 1
+        if new_value is not None:
+            field = cls._vote_field(new_value)
+            changes[field] = F(field) + 1
+        cls.objects.filter(pk=pk).update(**changes)
+
+    @classmethod
+    def apply_vote_deltas(cls, deltas):
+        """اعمال گروهی تغییر شمارنده‌ها؛ deltas نگاشت شناسه به {'likes': d, 'dislikes': d}
+
+        ردیف‌هایی با تغییر یکسان با یک UPDATE به‌روزرسانی می‌شوند.
+        """
+        groups = {}
+        for pk, delta in deltas.items():
+            key = (delta.get('likes', 0), delta.get('dislikes', 0))
+            if key != (0, 0):
+                groups.setdefault(key, []).append(pk)
+        for (likes, dislikes), pks in groups.items():
+            cls.objects.filter(pk__in=pks).update(likes=F('likes') + likes, dislikes=F('dislikes') + dislikes)
+
+    def refresh_vote_counts(self):
+        """خواندن مقدار فعلی شمارنده‌ها از پایگاه‌داده"""
+        self.refresh_from_db(fields=['likes', 'dislikes'])
+
+    @classmethod
+    def rebuild_vote_counters(cls, ids=None):
+        """محاسبه مجدد شمارنده‌ها از روی جدول رأی‌ها (برای همه یا شناسه‌های مشخص)"""
+        relation = cls._meta.get_field('votes')
+        target = f'{relation.field.name}_id'
+        votes = relation.related_model.objects.all()
+        objects = cls.objects.all()
+        if ids is not None:
+            votes = votes.filter(**{f'{target}__in': ids})
+            objects = objects.filter(pk__in=ids)
+
+        stats = {}
+        for row in votes.values(target, 'value').annotate(total=Count('id')).order_by():
+            item = stats.setdefault(row[target], {'likes': 0, 'dislikes': 0})
+            item[cls._vote_field(row['value'])] += row['total']
+
+        changed = []
+        for obj in objects.only('pk', 'likes', 'dislikes').iterator(chunk_size=2000):
+            values = stats.get(obj.pk, {'likes': 0, 'dislikes': 0})
+            if obj.likes != values['likes'] or obj.dislikes != values['dislikes']:
+                obj.likes, obj.dislikes = values['likes'], values['dislikes']
+                changed.append(obj)
+
+        cls.objects.bulk_update(changed, ['likes', 'dislikes'], batch_size=500)
+        return len(changed)
+
+
+class CountedVoteModel(models.Model):
+    """رأی‌ای که هر تغییرش روی شمارنده‌های هدف (target_field) اعمال می‌شود"""
+    target_field = None
+
+    class Meta:
+        abstract = True
+
+    @property
+    def target_id(self):
+        return getattr(self, f'{self.target_field}_id')
+
+    @classmethod
+    def target_model(cls):
+        return cls._meta.get_field(cls.target_field).related_model
+
+    def save(self, *args, **kwargs):
+        """ذخیره رأی و به‌روزرسانی شمارنده‌های هدف در همان تراکنش"""
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = type(self).objects.filter(pk=self.pk).values_list('value', flat=True).first()
+            super().save(*args, **kwargs)
+            self.target_model().apply_vote_delta(self.target_id, previous, self.value)
+
+
 # =========================
 # Review
 # =========================
-class Review(models.Model):
+class Review(VoteCountersModel):
     professor = models.ForeignKey(
         Professor,
         on_delete=models.CASCADE,
@@ -65,26 +367,53 @@ class Review(models.Model):
     rating = models.PositiveSmallIntegerField(verbose_name=_("امتیاز"))
     is_approved = models.BooleanField(default=False, verbose_name=_("تأیید شده"))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("تاریخ ایجاد"))
+    # روز ایجاد به وقت تهران؛ جستجوهای روزانه به‌جای created_at__date از این ستون استفاده می‌کنند
+    local_date = models.DateField(default=timezone.localdate, editable=False, verbose_name=_("روز ایجاد"))
 
     class Meta:
         verbose_name = _("نظر")
         verbose_name_plural = _("نظرات")
         ordering = ['-created_at']
+        indexes = [
+            # صفحه‌بندی نظرات تأیید شده هر استاد (جدیدترین اول)
+            models.Index(
+                fields=['professor', 'is_approved', '-created_at', '-id'],
+                name='reviews_review_feed_idx'
+            ),
+            models.Index(fields=['user', 'local_date'], name='reviews_review_user_day_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.rating}"
 
-    def likes_count(self):
-        return self.votes.filter(value=1).count()
+    def save(self, *args, **kwargs):
+        """ذخیره نظر و به‌روزرسانی آمار تجمیعی استاد در همان تراکنش"""
+        # داخل تراکنش بیرونی (مثلاً ثبت با سهمیه) SAVEPOINT جداگانه لازم نیست
+        with transaction.atomic(savepoint=False):
+            previous = None
+            if self.pk:
+                previous = Review.objects.filter(pk=self.pk).values(
+                    'professor_id', 'rating', 'is_approved', 'created_at'
+                ).first()
 
-    def dislikes_count(self):
-        return self.votes.filter(value=-1).count()
+            super().save(*args, **kwargs)
+
+            old_state = None
+            if previous and previous['is_approved']:
+                old_state = (previous['professor_id'], previous['rating'])
+            new_state = (self.professor_id, self.rating) if self.is_approved else None
+
+            if old_state != new_state:
+                if old_state:
+                    Professor.apply_rating_delta(*old_state, -1, previous['created_at'])
+                if new_state:
+                    Professor.apply_rating_delta(*new_state, 1, self.created_at)
 
 
 # =========================
 # Review Vote
 # =========================
-class ReviewVote(models.Model):
+class ReviewVote(CountedVoteModel):
     VOTE_CHOICES = (
         (1, 'موافق'),
         (-1, 'مخالف'),
@@ -99,6 +428,8 @@ class ReviewVote(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("کاربر"))
     value = models.SmallIntegerField(choices=VOTE_CHOICES, verbose_name=_("رأی"))
 
+    target_field = 'review'
+
     class Meta:
         verbose_name = _("رأی به نظر")
         verbose_name_plural = _("رأی‌ها به نظرات")
@@ -122,11 +453,15 @@ class Question(models.Model):
     text = models.TextField(verbose_name=_("متن پرسش"))
     is_approved = models.BooleanField(default=False, verbose_name=_("تأیید شده"))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("تاریخ ایجاد"))
+    local_date = models.DateField(default=timezone.localdate, editable=False, verbose_name=_("روز ایجاد"))
 
     class Meta:
         verbose_name = _("پرسش")
         verbose_name_plural = _("پرسش‌ها")
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'local_date'], name='reviews_question_user_day_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.text[:30]}"
@@ -135,7 +470,7 @@ class Question(models.Model):
 # =========================
 # Answer
 # =========================
-class Answer(models.Model):
+class Answer(VoteCountersModel):
     question = models.ForeignKey(
         Question,
         on_delete=models.CASCADE,
@@ -146,26 +481,24 @@ class Answer(models.Model):
     text = models.TextField(verbose_name=_("متن پاسخ"))
     is_approved = models.BooleanField(default=False, verbose_name=_("تأیید شده"))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("تاریخ ایجاد"))
+    local_date = models.DateField(default=timezone.localdate, editable=False, verbose_name=_("روز ایجاد"))
 
     class Meta:
         verbose_name = _("پاسخ")
         verbose_name_plural = _("پاسخ‌ها")
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['user', 'local_date'], name='reviews_answer_user_day_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.text[:30]}"
 
-    def likes_count(self):
-        return self.votes.filter(value=1).count()
-
-    def dislikes_count(self):
-        return self.votes.filter(value=-1).count()
-
 
 # =========================
 # Answer Vote
 # =========================
-class AnswerVote(models.Model):
+class AnswerVote(CountedVoteModel):
     VOTE_CHOICES = (
         (1, 'موافق'),
         (-1, 'مخالف'),
@@ -180,6 +513,8 @@ class AnswerVote(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("کاربر"))
     value = models.SmallIntegerField(choices=VOTE_CHOICES, verbose_name=_("رأی"))
 
+    target_field = 'answer'
+
     class Meta:
         verbose_name = _("رأی به پاسخ")
         verbose_name_plural = _("رأی‌ها به پاسخ‌ها")
@@ -262,6 +597,27 @@ class ProfessorEvaluation(models.Model):
     
     def __str__(self):
         return f"ارزیابی {self.user.username} برای {self.professor.name}"
+
+    def save(self, *args, **kwargs):
+        """ذخیره ارزیابی و به‌روزرسانی آمار تجمیعی استاد در همان تراکنش"""
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = ProfessorEvaluation.objects.filter(pk=self.pk).values(
+                    'professor_id', 'created_at', *self.PARAMETER_NAMES
+                ).first()
+
+            super().save(*args, **kwargs)
+
+            deltas = defaultdict(Counter)
+            if previous:
+                deltas[previous['professor_id']].update(
+                    ProfessorEvaluationSummary.evaluation_delta(previous, -1, previous['created_at'])
+                )
+            scores = {field: getattr(self, field) for field in self.PARAMETER_NAMES}
+            deltas[self.professor_id].update(ProfessorEvaluationSummary.evaluation_delta(scores, 1, self.created_at))
+            for professor_id, delta in deltas.items():
+                ProfessorEvaluationSummary.apply_delta(professor_id, delta)
     
     # محاسبه میانگین کل ارزیابی
     @property
@@ -293,34 +649,304 @@ class ProfessorEvaluation(models.Model):
         except cls.DoesNotExist:
             return None
     
-    # محاسبه میانگین هر پارامتر برای استاد
+    PARAMETER_NAMES = {
+        'teaching_method': 'روش تدریس',
+        'grading_flexibility': 'انعطاف پذیری',
+        'exam_difficulty': 'سختی امتحانات',
+        'subject_knowledge': 'سواد علمی',
+        'respect': 'ادب و احترام',
+        'student_interaction': 'تعامل با دانشجو'
+    }
+
+    # محاسبه میانگین و توزیع امتیازهای هر پارامتر برای استاد
     @classmethod
     def get_professor_averages(cls, professor):
-        evaluations = cls.objects.filter(professor=professor)
-        if not evaluations.exists():
+        """میانگین، تعداد و هیستوگرام ۱ تا ۵ هر پارامتر از جدول آمار تجمیعی (یک کوئری با کلید اصلی)"""
+        summary = ProfessorEvaluationSummary.objects.filter(pk=professor.pk).first()
+        return summary.averages() if summary else None
+
+
+# =========================
+# Professor Evaluation Summary
+# =========================
+class ProfessorEvaluationSummary(models.Model):
+    """آمار تجمیعی ارزیابی‌های کیفی هر استاد
+
+    برای هر پارامتر مجموع امتیازها ({پارامتر}_sum) و تعداد هر امتیاز ۱ تا ۵
+    ({پارامتر}_{امتیاز}_count) نگه‌داری می‌شود. با ثبت، ویرایش یا حذف ارزیابی
+    ستون‌ها با UPDATE اتمیک (delta) در همان تراکنش تغییر می‌کنند؛ در صورت
+    اختلاف با rebuild_evaluation_summaries از نو ساخته می‌شوند.
+    """
+    professor = models.OneToOneField(
+        Professor,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='evaluation_summary',
+        verbose_name=_("استاد")
+    )
+    evaluation_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد ارزیابی‌ها"))
+    # مجموع وزن ارزیابی‌ها با وزن کاهش‌یابنده با زمان (reviews/decay.py)
+    decayed_weight = models.FloatField(default=0, editable=False, verbose_name=_("مجموع وزن ارزیابی‌ها"))
+    # با هر تغییر یک واحد زیاد می‌شود (برای ETag داده‌های نمودار)
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name=_("نسخه"))
+    updated_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name=_("تاریخ به‌روزرسانی"))
+
+    # مجموع، توزیع ۱ تا ۵ و مجموع وزنی هر پارامتر (ترتیب PARAMETER_NAMES)
+    teaching_method_sum = models.IntegerField(default=0, editable=False, verbose_name=_("مجموع روش تدریس"))
+    teaching_method_1_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 1 ستاره روش تدریس"))
+    teaching_method_2_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 2 ستاره روش تدریس"))
+    teaching_method_3_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 3 ستاره روش تدریس"))
+    teaching_method_4_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 4 ستاره روش تدریس"))
+    teaching_method_5_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 5 ستاره روش تدریس"))
+    teaching_method_decayed_sum = models.FloatField(default=0, editable=False, verbose_name=_("مجموع وزنی روش تدریس"))
+
+    grading_flexibility_sum = models.IntegerField(default=0, editable=False, verbose_name=_("مجموع انعطاف پذیری"))
+    grading_flexibility_1_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 1 ستاره انعطاف پذیری"))
+    grading_flexibility_2_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 2 ستاره انعطاف پذیری"))
+    grading_flexibility_3_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 3 ستاره انعطاف پذیری"))
+    grading_flexibility_4_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 4 ستاره انعطاف پذیری"))
+    grading_flexibility_5_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 5 ستاره انعطاف پذیری"))
+    grading_flexibility_decayed_sum = models.FloatField(default=0, editable=False, verbose_name=_("مجموع وزنی انعطاف پذیری"))
+
+    exam_difficulty_sum = models.IntegerField(default=0, editable=False, verbose_name=_("مجموع سختی امتحانات"))
+    exam_difficulty_1_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 1 ستاره سختی امتحانات"))
+    exam_difficulty_2_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 2 ستاره سختی امتحانات"))
+    exam_difficulty_3_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 3 ستاره سختی امتحانات"))
+    exam_difficulty_4_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 4 ستاره سختی امتحانات"))
+    exam_difficulty_5_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 5 ستاره سختی امتحانات"))
+    exam_difficulty_decayed_sum = models.FloatField(default=0, editable=False, verbose_name=_("مجموع وزنی سختی امتحانات"))
+
+    subject_knowledge_sum = models.IntegerField(default=0, editable=False, verbose_name=_("مجموع سواد علمی"))
+    subject_knowledge_1_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 1 ستاره سواد علمی"))
+    subject_knowledge_2_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 2 ستاره سواد علمی"))
+    subject_knowledge_3_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 3 ستاره سواد علمی"))
+    subject_knowledge_4_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 4 ستاره سواد علمی"))
+    subject_knowledge_5_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 5 ستاره سواد علمی"))
+    subject_knowledge_decayed_sum = models.FloatField(default=0, editable=False, verbose_name=_("مجموع وزنی سواد علمی"))
+
+    respect_sum = models.IntegerField(default=0, editable=False, verbose_name=_("مجموع ادب و احترام"))
+    respect_1_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 1 ستاره ادب و احترام"))
+    respect_2_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 2 ستاره ادب و احترام"))
+    respect_3_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 3 ستاره ادب و احترام"))
+    respect_4_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 4 ستاره ادب و احترام"))
+    respect_5_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 5 ستاره ادب و احترام"))
+    respect_decayed_sum = models.FloatField(default=0, editable=False, verbose_name=_("مجموع وزنی ادب و احترام"))
+
+    student_interaction_sum = models.IntegerField(default=0, editable=False, verbose_name=_("مجموع تعامل با دانشجو"))
+    student_interaction_1_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 1 ستاره تعامل با دانشجو"))
+    student_interaction_2_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 2 ستاره تعامل با دانشجو"))
+    student_interaction_3_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 3 ستاره تعامل با دانشجو"))
+    student_interaction_4_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 4 ستاره تعامل با دانشجو"))
+    student_interaction_5_count = models.IntegerField(default=0, editable=False, verbose_name=_("تعداد 5 ستاره تعامل با دانشجو"))
+    student_interaction_decayed_sum = models.FloatField(default=0, editable=False, verbose_name=_("مجموع وزنی تعامل با دانشجو"))
+
+    # ستون‌های اعشاری که در UPDATE گروهی برای هر ردیف جداگانه (CASE) تغییر می‌کنند
+    DECAYED_COLUMNS = ('decayed_weight', *(f'{field}_decayed_sum' for field in ProfessorEvaluation.PARAMETER_NAMES))
+
+    class Meta:
+        verbose_name = _("آمار ارزیابی کیفی")
+        verbose_name_plural = _("آمار ارزیابی‌های کیفی")
+
+    def __str__(self):
+        return f"آمار ارزیابی {self.professor_id}"
+
+    @property
+    def etag(self):
+        return f'"evaluation-{self.professor_id}-{self.version}"'
+
+    @staticmethod
+    def _changes(delta):
+        changes = {column: F(column) + value for column, value in delta}
+        changes.update(version=F('version') + 1, updated_at=timezone.now())
+        return changes
+
+    @staticmethod
+    def evaluation_delta(scores, sign, moment):
+        """تغییر ستون‌ها برای افزودن (sign=1) یا حذف (sign=-1) ارزیابی با امتیازهای scores
+
+        moment زمان ثبت ارزیابی است (برای وزن کاهش‌یابنده).
+        """
+        weight = sign * decay.weight(moment)
+        delta = Counter({'evaluation_count': sign, 'decayed_weight': weight})
+        for field in ProfessorEvaluation.PARAMETER_NAMES:
+            score = scores[field]
+            delta[f'{field}_sum'] += sign * score
+            delta[f'{field}_decayed_sum'] += weight * score
+            if score in RATING_STARS:
+                delta[f'{field}_{score}_count'] += sign
+        return delta
+
+    @classmethod
+    def apply_delta(cls, professor_id, delta):
+        """اعمال تغییر روی آمار یک استاد؛ اگر ردیف آمار وجود نداشته باشد ساخته می‌شود"""
+        delta = {column: value for column, value in delta.items() if value}
+        if not delta:
+            return
+        changes = cls._changes(delta.items())
+        if cls.objects.filter(pk=professor_id).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(professor_id=professor_id, **delta)
+        except IntegrityError:
+            cls.objects.filter(pk=professor_id).update(**changes)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """اعمال گروهی تغییرها؛ اساتیدی با تغییر تعداد یکسان با یک UPDATE به‌روزرسانی
+        می‌شوند و ستون‌های وزنی هر استاد با CASE در همان UPDATE تغییر می‌کنند.
+        """
+        groups = {}
+        for pk, delta in deltas.items():
+            key = tuple(sorted(
+                (column, value) for column, value in delta.items()
+                if value and column not in cls.DECAYED_COLUMNS
+            ))
+            if key:
+                groups.setdefault(key, []).append(pk)
+        for key, pks in groups.items():
+            changes = cls._changes(key)
+            for column in cls.DECAYED_COLUMNS:
+                values = {pk: deltas[pk][column] for pk in pks if deltas[pk].get(column)}
+                if values:
+                    changes[column] = F(column) + _per_row(values)
+            cls.objects.filter(pk__in=pks).update(**changes)
+
+    @classmethod
+    def rebuild(cls, professor_ids=None):
+        """ساخت مجدد آمار از روی جدول ارزیابی‌ها (برای همه یا اساتید مشخص)"""
+        aggregates = {'evaluation_count': Count('id')}
+        for field in ProfessorEvaluation.PARAMETER_NAMES:
+            aggregates[f'{field}_sum'] = Sum(field)
+            for score in RATING_STARS:
+                aggregates[f'{field}_{score}_count'] = Count('id', filter=Q(**{field: score}))
+
+        evaluations = ProfessorEvaluation.objects.order_by()
+        summaries = cls.objects.all()
+        if professor_ids is not None:
+            evaluations = evaluations.filter(professor_id__in=professor_ids)
+            summaries = summaries.filter(pk__in=professor_ids)
+
+        rows = list(evaluations.values('professor_id').annotate(**aggregates))
+        # وزن هر ارزیابی به زمان ثبت آن بستگی دارد و در پایتون جمع زده می‌شود
+        decayed = defaultdict(Counter)
+        fields = list(ProfessorEvaluation.PARAMETER_NAMES)
+        for professor_id, created_at, *scores in evaluations.values_list(
+            'professor_id', 'created_at', *fields
+        ).iterator(chunk_size=2000):
+            decayed[professor_id].update(
+                ProfessorEvaluationSummary.evaluation_delta(dict(zip(fields, scores)), 1, created_at)
+            )
+        # نسخه‌ها ادامه پیدا می‌کنند تا ETag های قبلی معتبر نمانند؛ آمار اساتیدی که
+        # دیگر ارزیابی ندارند مثل حذف تدریجی (delta) با مقدار صفر باقی می‌ماند
+        versions = dict(summaries.values_list('pk', 'version'))
+        summaries.delete()
+        evaluated = {row['professor_id'] for row in rows}
+        cls.objects.bulk_create([
+            cls(
+                **row,
+                **{column: decayed[row['professor_id']][column] for column in cls.DECAYED_COLUMNS},
+                version=versions.get(row['professor_id'], 0) + 1,
+            )
+            for row in rows
+        ] + [
+            cls(professor_id=pk, version=version + 1)
+            for pk, version in versions.items() if pk not in evaluated
+        ], batch_size=500)
+        return len(rows)
+
+    @classmethod
+    def compact_rows(cls, professor_ids):
+        """میانگین پارامترهای چند استاد با یک کوئری
+
+        خروجی برای هر استاد دارای ارزیابی: (شناسه، نسخه، تعداد، [میانگین‌ها به
+        ترتیب PARAMETER_NAMES]).
+        """
+        fields = [f'{field}_sum' for field in ProfessorEvaluation.PARAMETER_NAMES]
+        rows = cls.objects.filter(
+            pk__in=professor_ids, evaluation_count__gt=0
+        ).order_by('pk').values_list('pk', 'version', 'evaluation_count', *fields)
+        return [
+            (pk, version, count, [round(total / count, 1) for total in sums])
+            for pk, version, count, *sums in rows
+        ]
+
+    def averages(self):
+        """خروجی هم‌شکل get_professor_averages؛ None اگر ارزیابی‌ای ثبت نشده باشد"""
+        if not self.evaluation_count:
             return None
-        
-        parameter_names = {
-            'teaching_method': 'روش تدریس',
-            'grading_flexibility': 'انعطاف پذیری',
-            'exam_difficulty': 'سختی امتحانات',
-            'subject_knowledge': 'سواد علمی',
-            'respect': 'ادب و احترام',
-            'student_interaction': 'تعامل با دانشجو'
+        return {
+            field: {
+                'name': name,
+                'average': round(getattr(self, f'{field}_sum') / self.evaluation_count, 1),
+                'count': self.evaluation_count,
+                'histogram': [getattr(self, f'{field}_{score}_count') for score in RATING_STARS],
+                'decayed_average': decay.average(getattr(self, f'{field}_decayed_sum'), self.decayed_weight),
+            }
+            for field, name in ProfessorEvaluation.PARAMETER_NAMES.items()
         }
-        
-        averages = {}
-        for field, name in parameter_names.items():
-            values = [getattr(eval_obj, field) for eval_obj in evaluations]
-            if values:
-                averages[field] = {
-                    'name': name,
-                    'average': round(sum(values) / len(values), 1),
-                    'count': len(values),
-                    'values': values  # برای نمودار توزیع
-                }
-        
-        return averages
+
+
+# =========================
+# Professor Percentile Rank
+# =========================
+class ProfessorRank(models.Model):
+    """رتبه درصدی هر استاد در دانشکده خودش («X٪ برتر دانشکده»)
+
+    با دستور rebuild_percentile_ranks (reviews.ranking) محاسبه می‌شود. ستون‌های
+    source_* ورودی‌های آخرین محاسبه هستند تا اجرای بعدی فقط دانشکده‌هایی را
+    که آمار یکی از اساتیدشان تغییر کرده دوباره محاسبه کند.
+    """
+    professor = models.OneToOneField(
+        Professor,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='percentile_rank',
+        verbose_name=_("استاد")
+    )
+    # department_normalized استاد در زمان محاسبه
+    department = models.CharField(max_length=200, db_index=True, editable=False, verbose_name=_("دانشکده"))
+    department_size = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("تعداد اساتید دانشکده"))
+    source_rating_sum = models.IntegerField(default=0, editable=False)
+    source_rating_count = models.IntegerField(default=0, editable=False)
+    source_evaluation_version = models.PositiveIntegerField(default=0, editable=False)
+    rating_top_percent = models.PositiveSmallIntegerField(
+        null=True, editable=False, verbose_name=_("درصد برتری امتیاز کلی")
+    )
+    teaching_method_top_percent = models.PositiveSmallIntegerField(
+        null=True, editable=False, verbose_name=_("درصد برتری روش تدریس")
+    )
+    grading_flexibility_top_percent = models.PositiveSmallIntegerField(
+        null=True, editable=False, verbose_name=_("درصد برتری انعطاف پذیری")
+    )
+    exam_difficulty_top_percent = models.PositiveSmallIntegerField(
+        null=True, editable=False, verbose_name=_("درصد برتری سختی امتحانات")
+    )
+    subject_knowledge_top_percent = models.PositiveSmallIntegerField(
+        null=True, editable=False, verbose_name=_("درصد برتری سواد علمی")
+    )
+    respect_top_percent = models.PositiveSmallIntegerField(
+        null=True, editable=False, verbose_name=_("درصد برتری ادب و احترام")
+    )
+    student_interaction_top_percent = models.PositiveSmallIntegerField(
+        null=True, editable=False, verbose_name=_("درصد برتری تعامل با دانشجو")
+    )
+    computed_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name=_("زمان محاسبه"))
+
+    class Meta:
+        verbose_name = _("رتبه درصدی استاد")
+        verbose_name_plural = _("رتبه‌های درصدی اساتید")
+
+    def __str__(self):
+        return f"رتبه {self.professor_id} در {self.department}"
+
+    def parameter_top_percents(self):
+        """[(نام پارامتر، درصد برتری)] برای پارامترهایی که رتبه دارند"""
+        return [
+            (name, getattr(self, f'{field}_top_percent'))
+            for field, name in ProfessorEvaluation.PARAMETER_NAMES.items()
+            if getattr(self, f'{field}_top_percent') is not None
+        ]
 
 
 # =========================
@@ -329,7 +955,8 @@ class ProfessorEvaluation(models.Model):
 class UserDailyLimit(models.Model):
     """مدل برای ذخیره محدودیت روزانه کاربران"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("کاربر"))
-    date = models.DateField(default=datetime.date.today, verbose_name=_("تاریخ"))
+    # روز به وقت تهران، هم‌خوان با local_date نظرات و پرسش‌ها
+    date = models.DateField(default=timezone.localdate, verbose_name=_("تاریخ"))
     review_count = models.IntegerField(default=0, verbose_name=_("تعداد نظرات"))
     question_count = models.IntegerField(default=0, verbose_name=_("تعداد پرسش‌ها"))
     
@@ -344,132 +971,247 @@ class UserDailyLimit(models.Model):
     
     @property
     def can_post_review(self):
-        return self.review_count < DAILY_REVIEW_LIMIT
+        return self.review_count < quotas.limit_for(self.user, 'review')
     
     @property
     def can_post_question(self):
-        return self.question_count < DAILY_QUESTION_LIMIT
+        return self.question_count < quotas.limit_for(self.user, 'question')
     
     @classmethod
-    def get_or_create_today(cls, user):
-        """دریافت یا ایجاد رکورد محدودیت برای کاربر امروز"""
-        today = datetime.date.today()
-        obj, created = cls.objects.get_or_create(
-            user=user,
-            date=today,
-            defaults={'review_count': 0, 'question_count': 0}
-        )
-        return obj
-    
-    def increment_review(self):
-        """افزایش شمارنده نظرات"""
-        if self.review_count < DAILY_REVIEW_LIMIT:
-            self.review_count += 1
-            self.save()
-            return True
-        return False
-    
-    def increment_question(self):
-        """افزایش شمارنده پرسش‌ها"""
-        if self.question_count < DAILY_QUESTION_LIMIT:
-            self.question_count += 1
-            self.save()
-            return True
-        return False
-    
-    def decrement_review(self):
-        """کاهش شمارنده نظرات (برای وقتی که نظر حذف می‌شود)"""
-        if self.review_count > 0:
-            self.review_count -= 1
-            self.save()
-            return True
-        return False
+    def record_usage(cls, user, field, date):
+        """ثبت سابقه یک ارسال ('review_count' یا 'question_count')
+
+        این جدول فقط برای گزارش است و بررسی سهمیه در reviews/quotas.py انجام می‌شود.
+        """
+        row = cls.objects.filter(user=user, date=date)
+        if row.update(**{field: F(field) + 1}):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user=user, date=date, **{field: 1})
+        except IntegrityError:
+            row.update(**{field: F(field) + 1})
     
-    def decrement_question(self):
-        """کاهش شمارنده پرسش‌ها (برای وقتی که پرسش حذف می‌شود)"""
-        if self.question_count > 0:
-            self.question_count -= 1
-            self.save()
-            return True
-        return False
+    @classmethod
+    def release_usage(cls, usage):
+        """کاهش گروهی شمارنده‌ها؛ usage نگاشت (کاربر، تاریخ) به {فیلد: تعداد}
+
+        رکوردهایی با کاهش یکسان با یک UPDATE (برای هر ۱۰۰ رکورد) به‌روزرسانی
+        می‌شوند و شمارنده‌ها منفی نمی‌شوند.
+        """
+        groups = {}
+        for key, fields in usage.items():
+            amounts = tuple(sorted((field, count) for field, count in fields.items() if count))
+            if amounts:
+                groups.setdefault(amounts, []).append(key)
+        for amounts, keys in groups.items():
+            changes = {field: Greatest(F(field) - count, 0) for field, count in amounts}
+            for start in range(0, len(keys), 100):
+                condition = Q()
+                for user_id, date in keys[start:start + 100]:
+                    condition |= Q(user_id=user_id, date=date)
+                cls.objects.filter(condition).update(**changes)
 
 
 # =========================
-# سیگنال‌ها برای کاهش شمارنده هنگام حذف
+# سیگنال‌ها برای کاهش شمارنده‌ها هنگام حذف
 # =========================
+class _DeletionBatch:
+    """تغییر شمارنده‌های یک عملیات حذف (تکی، دسته‌ای یا آبشاری)
+
+    جنگو pre_delete همه ردیف‌ها را قبل از حذف و post_delete هر ردیف را بعد از
+    حذف آن می‌فرستد؛ تغییرها تا post_delete آخرین ردیف جمع و سپس با UPDATE های
+    گروهی (داخل همان تراکنش حذف) اعمال می‌شوند. شمارنده ردیف‌هایی که خودشان
+    در همین عملیات حذف شده‌اند (مثلاً رأی‌های یک نظر حذف شده) به‌روز نمی‌شود.
+    """
+
+    def __init__(self, origin):
+        self.origin = origin
+        # ردیف‌هایی که pre_delete آن‌ها رسیده و post_delete هنوز نه
+        self.expected = set()
+        self.deleting = False
+        self.deleted = defaultdict(set)
+        self.daily_limits = defaultdict(Counter)
+        self.ratings = defaultdict(Counter)
+        self.decayed_ratings = defaultdict(lambda: [0.0, 0.0])
+        self.votes = defaultdict(lambda: defaultdict(Counter))
+        self.evaluations = defaultdict(Counter)
+        self.released = []
+
+    def add(self, sender, instance):
+        self.deleted[sender].add(instance.pk)
+        if sender in (Review, Question):
+            field = 'review_count' if sender is Review else 'question_count'
+            self.daily_limits[(instance.user_id, instance.local_date)][field] += 1
+        if sender is Review and instance.is_approved:
+            self.ratings[instance.professor_id][instance.rating] -= 1
+            weight = decay.weight(instance.created_at)
+            self.decayed_ratings[instance.professor_id][0] -= instance.rating * weight
+            self.decayed_ratings[instance.professor_id][1] -= weight
+        if sender in (ReviewVote, AnswerVote):
+            self.votes[sender][instance.target_id][sender.target_model()._vote_field(instance.value)] -= 1
+        if sender in (Review, Question, Answer):
+            self.released.append(instance)
+        if sender is ProfessorEvaluation:
+            scores = {field: getattr(instance, field) for field in ProfessorEvaluation.PARAMETER_NAMES}
+            self.evaluations[instance.professor_id].update(
+                ProfessorEvaluationSummary.evaluation_delta(scores, -1, instance.created_at)
+            )
+
+    def flush(self):
+        users = self.deleted[User]
+        UserDailyLimit.release_usage({
+            key: fields for key, fields in self.daily_limits.items() if key[0] not in users
+        })
+        Professor.apply_rating_deltas({
+            pk: deltas for pk, deltas in self.ratings.items() if pk not in self.deleted[Professor]
+        }, self.decayed_ratings)
+        ProfessorEvaluationSummary.apply_deltas({
+            pk: delta for pk, delta in self.evaluations.items() if pk not in self.deleted[Professor]
+        })
+        for vote_model, deltas in self.votes.items():
+            target_model = vote_model.target_model()
+            target_model.apply_vote_deltas({
+                pk: delta for pk, delta in deltas.items() if pk not in self.deleted[target_model]
+            })
+        quotas.release_for(*(instance for instance in self.released if instance.user_id not in users))
+
+
+_deletions = threading.local()
+DELETION_TRACKED_MODELS = (User, Professor, Review, Question, Answer, ReviewVote, AnswerVote, ProfessorEvaluation)
+
+
+def _deletion_batches():
+    """عملیات حذف در جریان این رشته بر اساس origin (حذف تو در تو origin خودش را دارد)"""
+    batches = getattr(_deletions, 'batches', None)
+    if batches is None:
+        batches = _deletions.batches = {}
+    return batches
+
+
+def start_deletion_batch(sender, instance, origin=None, **kwargs):
+    batches = _deletion_batches()
+    batch = batches.get(id(origin))
+    key = (sender, instance.pk)
+    # عملیات قبلی همین origin که با خطا متوقف شده کنار گذاشته می‌شود: جنگو در هر
+    # عملیات برای هر ردیف یک pre_delete و همه آن‌ها را پیش از اولین post_delete می‌فرستد
+    if batch is None or batch.origin is not origin or batch.deleting or key in batch.expected:
+        batch = batches[id(origin)] = _DeletionBatch(origin)
+    batch.expected.add(key)
+
+
+def update_counters_on_delete(sender, instance, origin=None, **kwargs):
+    """هنگام حذف نظر، پرسش، پاسخ، رأی یا ارزیابی، شمارنده‌های مربوط را کاهش بده"""
+    batches = _deletion_batches()
+    batch = batches.get(id(origin))
+    if batch is None or batch.origin is not origin:
+        batch = _DeletionBatch(origin)
+    batch.deleting = True
+    batch.add(sender, instance)
+    batch.expected.discard((sender, instance.pk))
+    if not batch.expected:
+        if batches.get(id(origin)) is batch:
+            del batches[id(origin)]
+        batch.flush()
 
-@receiver(post_delete, sender=Review)
-def decrease_review_count_on_delete(sender, instance, **kwargs):
-    """هنگام حذف نظر، review_count کاربر را کاهش بده"""
-    try:
-        # پیدا کردن رکورد محدودیت برای روز ایجاد نظر
-        limit_date = instance.created_at.date()
-        daily_limit = UserDailyLimit.objects.filter(
-            user=instance.user,
-            date=limit_date
-        ).first()
-        
-        if daily_limit:
-            daily_limit.decrement_review()
-            print(f"✓ کاهش review_count برای کاربر {instance.user.username} در تاریخ {limit_date}")
-    except Exception as e:
-        print(f"✗ خطا در کاهش review_count: {e}")
-
-
-@receiver(post_delete, sender=Question)
-def decrease_question_count_on_delete(sender, instance, **kwargs):
-    """هنگام حذف پرسش، question_count کاربر را کاهش بده"""
-    try:
-        # پیدا کردن رکورد محدودیت برای روز ایجاد پرسش
-        limit_date = instance.created_at.date()
-        daily_limit = UserDailyLimit.objects.filter(
-            user=instance.user,
-            date=limit_date
-        ).first()
-        
-        if daily_limit:
-            daily_limit.decrement_question()
-            print(f"✓ کاهش question_count برای کاربر {instance.user.username} در تاریخ {limit_date}")
-    except Exception as e:
-        print(f"✗ خطا در کاهش question_count: {e}")
+
+@receiver(request_finished)
+def discard_deletion_batches(sender, **kwargs):
+    """کنار گذاشتن عملیات حذف ناتمام (متوقف شده با خطا) در پایان درخواست"""
+    _deletions.__dict__.pop('batches', None)
+
+
+# فقط برای همین مدل‌ها؛ گیرنده بدون sender حذف سریع (fast delete) بقیه مدل‌ها را غیرفعال می‌کند
+for _model in DELETION_TRACKED_MODELS:
+    pre_delete.connect(start_deletion_batch, sender=_model)
+    post_delete.connect(update_counters_on_delete, sender=_model)
+
+
+@receiver(post_save, sender=Professor)
+def index_professor_on_save(sender, instance, **kwargs):
+    """به‌روزرسانی ایندکس‌های جستجو پس از ذخیره استاد
+
+    ایندکس FTS در همان تراکنش نوشته می‌شود؛ ایندکس فازی درون حافظه و کش
+    جستجوی زنده فقط پس از commit تغییر می‌کنند تا rollback در آن‌ها نماند.
+    """
+    search.index_professor(instance)
+    pk, name, department = instance.pk, instance.name, instance.department
+
+    def update_in_memory():
+        fuzzy.professor_index.update(pk, name, department)
+        search.live_search_cache.clear()
+
+    transaction.on_commit(update_in_memory)
+
+
+@receiver(post_delete, sender=Professor)
+def remove_professor_from_index(sender, instance, **kwargs):
+    """حذف استاد از ایندکس‌های جستجو (ایندکس فازی و کش پس از commit)"""
+    search.remove_professor(instance.pk)
+    pk = instance.pk
+
+    def remove_in_memory():
+        fuzzy.professor_index.remove(pk)
+        search.live_search_cache.clear()
+
+    transaction.on_commit(remove_in_memory)
 
 
 # =========================
 # تابع برای رفع مشکل داده‌های فعلی
 # =========================
-def fix_current_daily_limits():
-    """رفع مشکل محدودیت‌های روزانه فعلی"""
-    from django.db.models import Count
-    
-    print("در حال رفع مشکل محدودیت‌های روزانه...")
-    
-    # برای هر کاربر
-    for user in User.objects.all():
-        # پیدا کردن همه رکوردهای محدودیت
-        daily_limits = UserDailyLimit.objects.filter(user=user)
-        
-        for daily_limit in daily_limits:
-            # شمارش واقعی نظرات در آن تاریخ
-            actual_review_count = Review.objects.filter(
-                user=user,
-                created_at__date=daily_limit.date
-            ).count()
-            
-            # شمارش واقعی پرسش‌ها در آن تاریخ
-            actual_question_count = Question.objects.filter(
-                user=user,
-                created_at__date=daily_limit.date
-            ).count()
-            
-            # اگر اختلاف وجود داشت، اصلاح کن
-            if daily_limit.review_count != actual_review_count:
-                print(f"اصلاح review_count کاربر {user.username} در {daily_limit.date}: {daily_limit.review_count} → {actual_review_count}")
-                daily_limit.review_count = actual_review_count
-            
-            if daily_limit.question_count != actual_question_count:
-                print(f"اصلاح question_count کاربر {user.username} در {daily_limit.date}: {daily_limit.question_count} → {actual_question_count}")
-                daily_limit.question_count = actual_question_count
-            
-            daily_limit.save()
-    
-    print("✓ رفع مشکل محدودیت‌های روزانه تکمیل شد.")
\ No newline at end of file
+def fix_current_daily_limits(since=None, dry_run=False, chunk_size=500, progress=None):
+    """تطبیق شمارنده‌های UserDailyLimit با تعداد واقعی نظرات و پرسش‌ها
+
+    تعداد واقعی با یک کوئری GROUP BY (کاربر، تاریخ محلی) برای هر نوع محتوا
+    خوانده می‌شود و فقط رکوردهای تغییر کرده، دسته‌ای با bulk_update ذخیره
+    می‌شوند (هر دسته در یک تراکنش). since محدوده را به تاریخ‌های بعد از آن
+    محدود می‌کند و progress(بررسی شده، کل) پس از هر دسته صدا زده می‌شود.
+
+    خروجی: فهرست اصلاحات به شکل (رکورد، فیلد، مقدار قبلی، مقدار جدید)
+    """
+    actual = {}
+    for model, field in ((Review, 'review_count'), (Question, 'question_count')):
+        rows = model.objects.order_by()
+        if since:
+            rows = rows.filter(local_date__gte=since)
+        grouped = rows.values('user_id', 'local_date').annotate(total=Count('id'))
+        for row in grouped:
+            actual[(row['user_id'], row['local_date'], field)] = row['total']
+
+    limits = UserDailyLimit.objects.order_by('pk').only('user_id', 'date', 'review_count', 'question_count')
+    if since:
+        limits = limits.filter(date__gte=since)
+    total = limits.count()
+
+    corrections = []
+    changed = []
+    fields = ('review_count', 'question_count')
+
+    def save_chunk():
+        if changed and not dry_run:
+            with transaction.atomic():
+                UserDailyLimit.objects.bulk_update(changed, fields, batch_size=chunk_size)
+        changed.clear()
+
+    for processed, daily_limit in enumerate(limits.iterator(chunk_size=chunk_size), start=1):
+        row_changed = False
+        for field in fields:
+            stored = getattr(daily_limit, field)
+            real = actual.get((daily_limit.user_id, daily_limit.date, field), 0)
+            if stored != real:
+                corrections.append((daily_limit, field, stored, real))
+                setattr(daily_limit, field, real)
+                row_changed = True
+        if row_changed:
+            changed.append(daily_limit)
+
+        if processed % chunk_size == 0:
+            save_chunk()
+            if progress:
+                progress(processed, total)
+
+    save_chunk()
+    if progress and total % chunk_size:
+        progress(total, total)
+    return corrections
@@ -0,0 +1,42 @@
+"""
+یکسان‌سازی متن فارسی/عربی برای جستجو و مقایسه
+
+- حروف عربی (ي، ى، ك، ة، أ، إ، ...) به معادل فارسی تبدیل می‌شوند
+- اعراب، تنوین و کشیده (ـ) حذف می‌شوند
+- نیم‌فاصله (ZWNJ) به فاصله تبدیل می‌شود تا «رحیم‌پور» و «رحیم پور» یکسان شوند
+- ارقام فارسی و عربی به ارقام لاتین تبدیل می‌شوند
+- حروف لاتین کوچک و فاصله‌های پشت سر هم یکی می‌شوند
+"""
+import re
+import unicodedata
+
+_CHARACTER_MAP = {
+    'ي': 'ی',
+    'ى': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    'ؤ': 'و',
+    '\u200c': ' ',  # نیم‌فاصله (ZWNJ)
+    '\u200d': '',   # ZWJ
+    '\u0640': '',   # کشیده
+}
+_CHARACTER_MAP.update({persian: str(digit) for digit, persian in enumerate('۰۱۲۳۴۵۶۷۸۹')})
+_CHARACTER_MAP.update({arabic: str(digit) for digit, arabic in enumerate('٠١٢٣٤٥٦٧٨٩')})
+
+_TRANSLATION = str.maketrans(_CHARACTER_MAP)
+_DIACRITICS = re.compile('[\u064b-\u065f\u0670\u06d6-\u06ed]')
+
+
+def normalize_text(text):
+    """شکل یکسان‌شده متن برای ذخیره در ستون‌های جستجو و مقایسه"""
+    if not text:
+        return ''
+    # NFKC شکل‌های نمایشی (presentation forms) عربی را به حروف پایه برمی‌گرداند
+    text = unicodedata.normalize('NFKC', text)
+    text = _DIACRITICS.sub('', text)
+    text = text.translate(_TRANSLATION).casefold()
+    return ' '.join(text.split())
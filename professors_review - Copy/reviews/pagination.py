@@ -0,0 +1,131 @@
+"""
+صفحه‌بندی keyset (cursor)
+
+به‌جای OFFSET که با جلو رفتن صفحات کندتر می‌شود، صفحه بعد با شرط «بعد از
+آخرین سطر صفحه قبل» روی ستون‌های مرتب‌سازی خوانده می‌شود؛ به کمک ایندکس
+ترکیبی همان ستون‌ها هزینه هر صفحه ثابت می‌ماند.
+
+cursor مقادیر ستون‌های مرتب‌سازی آخرین سطر است که به صورت JSON و base64
+در URL قرار می‌گیرد. cursor نامعتبر یا دست‌کاری شده (مقادیری که با نوع ستون‌ها
+نمی‌خوانند) مثل نبود cursor صفحه اول را برمی‌گرداند.
+"""
+import base64
+import binascii
+import datetime
+import json
+import math
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 24
+
+
+class KeysetPage:
+    """یک صفحه از نتایج به همراه cursor صفحه بعد (یا None در صفحه آخر)
+
+    truncated یعنی فهرست نتایجی که صفحه‌بندی شده خودش به سقفی محدود شده است.
+    """
+
+    def __init__(self, items, next_cursor, truncated=False):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.truncated = truncated
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _json_default(value):
+    # تاریخ‌ها با دقت کامل میکروثانیه ذخیره می‌شوند تا مرز صفحه‌ها دقیق بماند
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} در cursor قابل ذخیره نیست")
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':'), default=_json_default).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _is_cursor_value(value):
+    """فقط رشته و عدد متناهی (اعداد صحیح در بازه ۶۴ بیتی پایگاه‌داده)"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return -2 ** 63 <= value < 2 ** 63
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return isinstance(value, str)
+
+
+def decode_cursor(cursor, length):
+    """مقادیر cursor؛ برای cursor نامعتبر None برمی‌گرداند (یعنی صفحه اول)"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != length or not all(map(_is_cursor_value, values)):
+        return None
+    return values
+
+
+def _after(ordering, values):
+    """شرط «بعد از» برای ترتیب چندستونی: (a > x) یا (a = x و b > y) یا ..."""
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        clause = Q(**{f'{name}__{lookup}': values[position]})
+        for previous, value in zip(ordering[:position], values):
+            clause &= Q(**{previous.lstrip('-'): value})
+        condition |= clause
+    return condition
+
+
+def paginate(queryset, ordering, cursor=None, page_size=PAGE_SIZE):
+    """یک صفحه از کوئری‌ست با ترتیب داده شده
+
+    آخرین ستون ordering باید یکتا باشد (معمولاً id) تا ترتیب کامل باشد.
+    """
+    values = decode_cursor(cursor, len(ordering))
+    queryset = queryset.order_by(*ordering)
+    if values is not None:
+        try:
+            queryset = queryset.filter(_after(ordering, values))
+        except (TypeError, ValueError, ValidationError):
+            # مقدار با نوع ستون نمی‌خواند (مثلاً متن به‌جای عدد یا تاریخ)
+            pass
+
+    # یک سطر اضافه برای فهمیدن وجود صفحه بعد
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip('-')) for field in ordering])
+    return KeysetPage(items, next_cursor)
+
+
+def paginate_ids(queryset, ids, cursor=None, page_size=PAGE_SIZE, truncated=False):
+    """صفحه‌بندی روی فهرست مرتب و محدود شناسه‌ها (مثلاً نتایج رتبه‌بندی شده جستجو)"""
+    values = decode_cursor(cursor, 1)
+    start = values[0] if values and isinstance(values[0], int) and values[0] > 0 else 0
+    page_ids = ids[start:start + page_size]
+
+    items = []
+    if page_ids:
+        by_pk = queryset.in_bulk(page_ids)
+        items = [by_pk[pk] for pk in page_ids if pk in by_pk]
+    next_cursor = encode_cursor([start + page_size]) if start + page_size < len(ids) else None
+    return KeysetPage(items, next_cursor, truncated)
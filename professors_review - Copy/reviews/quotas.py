@@ -0,0 +1,256 @@
+"""
+سهمیه کاربران (نظر، پرسش، پاسخ و رأی)
+
+سقف هر عمل در POLICIES برای هر نقش تعریف می‌شود و با تنظیم
+REVIEWS_QUOTA_LIMITS قابل تغییر است، مثلاً {'review': {'user': 5}}. پنجره هر
+سهمیه یا روز تقویمی به وقت تهران (DAY) است یا پنجره لغزان با طول داده شده
+به ثانیه؛ پنجره لغزان با دو شمارنده (بازه فعلی و قبلی) و وزن‌دهی بازه قبلی
+تخمین زده می‌شود.
+
+شمارنده‌ها در کش جنگو (REVIEWS_QUOTA_CACHE) نگه‌داری و با add/incr به‌روز
+می‌شوند، پس بررسی سهمیه به پایگاه‌داده نمی‌نویسد. اگر شمارنده‌ای در کش نباشد
+(شروع پروسه یا پاک شدن کش) مقدار اولیه با شمارش محتوای ثبت شده در همان بازه
+خوانده می‌شود. جدول UserDailyLimit فقط برای ثبت سابقه به‌روز می‌شود.
+
+رزروی که داخل تراکنش انجام شود تا commit همان تراکنش موقت است: commit آن را
+قطعی می‌کند و اگر تراکنش بدون commit تمام شود (rollback، حتی rollback تراکنش
+بیرونی پس از پایان کار فراخواننده) رزرو در پایان درخواست (request_finished)
+یا اولین claim/status بیرون از تراکنش برگردانده می‌شود.
+
+کش پیش‌فرض (locmem) بین پروسه‌ها مشترک نیست؛ در اجرای چندپروسه‌ای باید از
+کش مشترک (memcached یا redis) استفاده شود.
+"""
+import datetime
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+DAY = 'day'
+# رزروهای تأیید نشده تراکنش جاری روی همان اتصال پایگاه‌داده
+HOLDS_ATTRIBUTE = 'reviews_quota_holds'
+
+
+class QuotaPolicy:
+    """سهمیه یک عمل: سقف برای هر نقش، پنجره زمانی و مدلی که ارسال‌ها در آن ذخیره می‌شوند"""
+
+    def __init__(self, action, limits, window=DAY, model=None, audit_field=None):
+        self.action = action
+        self.limits = limits
+        self.window = window
+        self.model = model
+        self.audit_field = audit_field
+
+    def limit_for(self, user):
+        limits = {**self.limits, **getattr(settings, 'REVIEWS_QUOTA_LIMITS', {}).get(self.action, {})}
+        return limits.get(role_of(user), limits['user'])
+
+    def bucket(self, moment):
+        """بازه‌ای که moment در آن قرار دارد: (شناسه، شروع، پایان)"""
+        if self.window == DAY:
+            day = timezone.localdate(moment)
+            start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+            return day.isoformat(), start, start + datetime.timedelta(days=1)
+        index = int(moment.timestamp() // self.window)
+        start = datetime.datetime.fromtimestamp(index * self.window, tz=datetime.timezone.utc)
+        return str(index), start, start + datetime.timedelta(seconds=self.window)
+
+
+POLICIES = {
+    'review': QuotaPolicy('review', {'user': 3, 'staff': 10}, DAY, 'reviews.Review', 'review_count'),
+    'question': QuotaPolicy('question', {'user': 3, 'staff': 10}, DAY, 'reviews.Question', 'question_count'),
+    'answer': QuotaPolicy('answer', {'user': 10, 'staff': 50}, DAY, 'reviews.Answer'),
+    'vote': QuotaPolicy('vote', {'user': 120, 'staff': 600}, 10 * 60),
+}
+
+
+def role_of(user):
+    return 'staff' if user.is_staff else 'user'
+
+
+def limit_for(user, action):
+    return POLICIES[action].limit_for(user)
+
+
+def _cache():
+    return caches[getattr(settings, 'REVIEWS_QUOTA_CACHE', 'default')]
+
+
+# =========================
+# شمارنده‌ها
+# =========================
+def _key(policy, user_id, bucket_id):
+    return f'quota:{policy.action}:{user_id}:{bucket_id}'
+
+
+def _timeout(policy, end, now):
+    # شمارنده بازه پنجره لغزان تا پایان بازه بعد هم (به عنوان بازه قبلی) لازم است
+    extra = 60 if policy.window == DAY else policy.window
+    return max(int((end - now).total_seconds()) + extra, 1)
+
+
+def _seed(policy, user_id, start, end):
+    if policy.model is None:
+        return 0
+    rows = apps.get_model(policy.model).objects.filter(user_id=user_id)
+    if policy.window == DAY:
+        # ایندکس (user, local_date)
+        return rows.filter(local_date=timezone.localdate(start)).count()
+    return rows.filter(created_at__gte=start, created_at__lt=end).count()
+
+
+def _add_seed(policy, user_id, key, start, end, now):
+    """مقداردهی شمارنده از پایگاه‌داده با add؛ اگر درخواست هم‌زمانی زودتر
+    مقداردهی کرده باشد مقدار (و رزروهای) او حفظ می‌شود"""
+    value = _seed(policy, user_id, start, end)
+    if not _cache().add(key, value, _timeout(policy, end, now)):
+        value = _cache().get(key, value)
+    return value
+
+
+def _count(policy, user_id, moment, now):
+    """مقدار شمارنده بازه moment؛ در صورت نبود در کش از پایگاه‌داده مقداردهی می‌شود"""
+    bucket_id, start, end = policy.bucket(moment)
+    key = _key(policy, user_id, bucket_id)
+    value = _cache().get(key)
+    if value is None:
+        value = _add_seed(policy, user_id, key, start, end, now)
+    return key, end, value
+
+
+def _usage(policy, user_id, now, current):
+    if policy.window == DAY:
+        return current
+    previous_moment = now - datetime.timedelta(seconds=policy.window)
+    _, end, previous = _count(policy, user_id, previous_moment, now)
+    remaining_share = (end - previous_moment).total_seconds() / policy.window
+    return current + previous * remaining_share
+
+
+# =========================
+# API
+# =========================
+def claim(user, action, amount=1):
+    """رزرو amount واحد از سهمیه؛ اگر از سقف عبور کند رزرو برگردانده و False برگردانده می‌شود
+
+    داخل تراکنش، رزرو تا commit موقت است (_hold).
+    """
+    release_uncommitted()
+    policy = POLICIES[action]
+    now = timezone.now()
+    bucket_id, start, end = policy.bucket(now)
+    key = _key(policy, user.pk, bucket_id)
+    cache = _cache()
+    try:
+        current = cache.incr(key, amount)
+    except ValueError:
+        # شمارنده در کش نیست (یا منقضی شده): مقداردهی اتمیک و سپس افزایش
+        _add_seed(policy, user.pk, key, start, end, now)
+        current = cache.incr(key, amount)
+
+    if _usage(policy, user.pk, now, current) > policy.limit_for(user):
+        _decr(key, amount)
+        return False
+    _hold(key, amount)
+    return True
+
+
+def release(user_id, action, moment=None, amount=1):
+    """بازگرداندن سهمیه (مثلاً هنگام حذف محتوا یا خطا در ذخیره آن)
+
+    اگر رزرو هنوز منتظر commit باشد، از رزروهای تراکنش هم حذف می‌شود تا دوباره
+    برگردانده نشود.
+    """
+    policy = POLICIES[action]
+    bucket_id = policy.bucket(moment or timezone.now())[0]
+    key = _key(policy, user_id, bucket_id)
+    _drop_hold(key, amount)
+    _decr(key, amount)
+
+
+def _decr(key, amount):
+    cache = _cache()
+    try:
+        value = cache.decr(key, amount)
+        if value < 0:
+            cache.incr(key, -value)
+    except ValueError:
+        # شمارنده در کش نیست؛ مقداردهی بعدی از پایگاه‌داده انجام می‌شود
+        pass
+
+
+# =========================
+# رزرو وابسته به تراکنش
+# =========================
+def _hold(key, amount):
+    """نگه‌داشتن رزرو داخل تراکنش تا commit؛ commit آن را از فهرست رزروها حذف می‌کند"""
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return
+    holds = connection.__dict__.setdefault(HOLDS_ATTRIBUTE, {})
+    token = object()
+    holds[token] = (key, amount)
+    # اگر تراکنش (یا savepoint رزرو) rollback شود این تابع هرگز اجرا نمی‌شود
+    transaction.on_commit(lambda: holds.pop(token, None))
+
+
+def _drop_hold(key, amount):
+    holds = transaction.get_connection().__dict__.get(HOLDS_ATTRIBUTE, {})
+    for token, hold in list(holds.items()):
+        if hold == (key, amount):
+            del holds[token]
+            return
+
+
+def release_uncommitted(**kwargs):
+    """بازگرداندن رزروهایی که تراکنششان بدون commit تمام شده است
+
+    بیرون از بلوک atomic، هر رزروی که هنوز تأیید نشده rollback شده است.
+    گیرنده request_finished است و در ابتدای claim و status هم اجرا می‌شود.
+    """
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        return
+    holds = connection.__dict__.pop(HOLDS_ATTRIBUTE, None)
+    for key, amount in (holds or {}).values():
+        _decr(key, amount)
+
+
+def release_for(*instances):
+    """بازگرداندن سهمیه محتوای حذف شده بر اساس مدل و زمان ایجاد آن
+
+    برای حذف‌های دسته‌ای، سهمیه هر شمارنده با یک decr برگردانده می‌شود.
+    """
+    amounts = Counter()
+    for instance in instances:
+        for policy in POLICIES.values():
+            if policy.model == instance._meta.label:
+                amounts[_key(policy, instance.user_id, policy.bucket(instance.created_at)[0])] += 1
+    for key, amount in amounts.items():
+        _decr(key, amount)
+
+
+def record(user, action):
+    """ثبت سابقه ارسال در جدول UserDailyLimit (فقط برای گزارش)"""
+    policy = POLICIES[action]
+    if policy.audit_field:
+        apps.get_model('reviews.UserDailyLimit').record_usage(user, policy.audit_field, timezone.localdate())
+
+
+def status(user, action):
+    """وضعیت سهمیه برای نمایش، بدون نوشتن در پایگاه‌داده"""
+    release_uncommitted()
+    policy = POLICIES[action]
+    now = timezone.now()
+    _, _, current = _count(policy, user.pk, now, now)
+    used = int(round(_usage(policy, user.pk, now, current)))
+    total = policy.limit_for(user)
+    return {
+        'used': used,
+        'remaining': max(total - used, 0),
+        'total': total,
+        'reached_limit': used >= total,
+    }
@@ -0,0 +1,193 @@
+"""
+رتبه درصدی اساتید در دانشکده («X٪ برتر دانشکده»)
+
+اساتید و آمار ارزیابی‌ها با دو کوئری در آرایه‌های NumPy بارگذاری می‌شوند و
+رتبه هر معیار برای همه دانشکده‌ها با یک مرتب‌سازی (lexsort) محاسبه می‌شود؛
+حلقه پایتونی روی دانشکده‌ها یا اساتید وجود ندارد.
+
+«X٪ برتر» برابر ceil(100 × رتبه / تعداد) است؛ رتبه ۱ بهترین است و امتیازهای
+برابر بهترین رتبه گروه خود را می‌گیرند. فقط اساتیدی که در آن معیار امتیاز
+دارند رتبه‌بندی می‌شوند و در دانشکده‌های با کمتر از MIN_PEERS استاد رتبه‌ای
+ثبت نمی‌شود. در پارامترهای LOWER_IS_BETTER (سختی امتحانات) میانگین کمتر
+رتبه بهتری دارد.
+
+در اجرای افزایشی فقط دانشکده‌هایی که استادی در آن‌ها اضافه یا حذف شده یا
+امتیاز یا نسخه آمار ارزیابی‌اش تغییر کرده دوباره محاسبه و ذخیره می‌شوند.
+ردیف‌ها مستقیماً با executemany نوشته می‌شوند؛ ساخت نمونه مدل و bulk_create
+برای ۱۰۰ هزار ردیف چند برابر کل محاسبه زمان می‌برد.
+"""
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Professor, ProfessorEvaluation, ProfessorEvaluationSummary, ProfessorRank
+
+MIN_PEERS = 3
+BATCH_SIZE = 1000
+# امتیاز بیشتر یعنی امتحان سخت‌تر؛ برای دانشجو امتیاز کمتر بهتر است
+LOWER_IS_BETTER = ('exam_difficulty',)
+
+
+def top_percents(groups, scores, valid):
+    """درصد برتری هر عنصر در گروه خودش؛ 0 برای عناصر بدون رتبه"""
+    result = np.zeros(len(scores), dtype=np.int16)
+    index = np.flatnonzero(valid)
+    if not len(index):
+        return result
+
+    # مرتب‌سازی بر اساس گروه و سپس امتیاز نزولی
+    order = np.lexsort((-scores[index], groups[index]))
+    group, score = groups[index][order], scores[index][order]
+    group_start = np.searchsorted(group, group, side='left')
+    group_size = np.searchsorted(group, group, side='right') - group_start
+
+    # امتیازهای برابر در یک گروه رتبه اولین عضو خود را می‌گیرند
+    positions = np.arange(len(group))
+    new_block = np.ones(len(group), dtype=bool)
+    new_block[1:] = (group[1:] != group[:-1]) | (score[1:] != score[:-1])
+    block_start = np.maximum.accumulate(np.where(new_block, positions, 0))
+
+    rank = block_start - group_start + 1
+    percents = np.ceil(100 * rank / group_size).astype(np.int16)
+    percents[group_size < MIN_PEERS] = 0
+    result[index[order]] = percents
+    return result
+
+
+def _align(pks, other_pks):
+    """موقعیت other_pks در آرایه مرتب pks و ماسک موارد موجود"""
+    positions = np.searchsorted(pks, other_pks).clip(max=max(len(pks) - 1, 0))
+    found = (pks[positions] == other_pks) if len(pks) else np.zeros(len(other_pks), dtype=bool)
+    return positions, found
+
+
+def _load_professors():
+    fields = [f'{field}_sum' for field in ProfessorEvaluation.PARAMETER_NAMES]
+    professors = list(
+        Professor.objects.exclude(department_normalized='').order_by('pk').values_list(
+            'pk', 'department_normalized', 'rating_sum', 'rating_count'
+        )
+    )
+    summaries = list(
+        ProfessorEvaluationSummary.objects.order_by().values_list('pk', 'version', 'evaluation_count', *fields)
+    )
+
+    data = {
+        'pk': np.array([row[0] for row in professors], dtype=np.int64),
+        'department': np.array([row[1] for row in professors], dtype=object),
+        'rating_sum': np.array([row[2] for row in professors], dtype=np.int64),
+        'rating_count': np.array([row[3] for row in professors], dtype=np.int64),
+        'evaluation_version': np.zeros(len(professors), dtype=np.int64),
+        'evaluation_count': np.zeros(len(professors), dtype=np.int64),
+        'evaluation_sums': np.zeros((len(professors), len(fields)), dtype=np.int64),
+    }
+    if summaries:
+        summary = np.array(summaries, dtype=np.int64)
+        positions, found = _align(data['pk'], summary[:, 0])
+        positions = positions[found]
+        data['evaluation_version'][positions] = summary[found, 1]
+        data['evaluation_count'][positions] = summary[found, 2]
+        data['evaluation_sums'][positions] = summary[found, 3:]
+    return data
+
+
+def _department_sizes(departments):
+    """تعداد اساتید دانشکده هر عنصر"""
+    if not len(departments):
+        return np.zeros(0, dtype=np.int64)
+    _, inverse, counts = np.unique(departments.astype(str), return_inverse=True, return_counts=True)
+    return counts[inverse]
+
+
+def _dirty_departments(data):
+    """دانشکده‌هایی که از آخرین محاسبه تغییر کرده‌اند"""
+    stored = list(ProfessorRank.objects.order_by('pk').values_list(
+        'pk', 'department', 'department_size',
+        'source_rating_sum', 'source_rating_count', 'source_evaluation_version'
+    ))
+    if not stored:
+        return set(data['department'])
+
+    stored_pk = np.array([row[0] for row in stored], dtype=np.int64)
+    stored_department = np.array([row[1] for row in stored], dtype=object)
+    stored_source = np.array([row[2:] for row in stored], dtype=np.int64)
+
+    # تغییر تعداد اعضا، حذف استاد را هم (که ردیفش با CASCADE حذف شده) نشان می‌دهد
+    current_source = np.column_stack((
+        _department_sizes(data['department']),
+        data['rating_sum'], data['rating_count'], data['evaluation_version'],
+    ))
+    positions, found = _align(stored_pk, data['pk'])
+    changed = ~found
+    changed[found] = (
+        (stored_department[positions[found]] != data['department'][found])
+        | (stored_source[positions[found]] != current_source[found]).any(axis=1)
+    )
+
+    # اساتیدی که دیگر دانشکده‌ای ندارند
+    _, still_listed = _align(data['pk'], stored_pk)
+
+    dirty = set(data['department'][changed])
+    # دانشکده قبلی اساتید جابه‌جا شده
+    dirty.update(stored_department[positions[found][changed[found]]])
+    dirty.update(stored_department[~still_listed])
+    return dirty
+
+
+def refresh_ranks(full=False):
+    """به‌روزرسانی جدول ProfessorRank؛ خروجی: (تعداد دانشکده‌ها، تعداد ردیف‌های ذخیره شده)"""
+    data = _load_professors()
+    departments = set(data['department']) if full else _dirty_departments(data)
+    if not departments:
+        return 0, 0
+
+    mask = np.isin(data['department'], list(departments))
+    _, groups, sizes = np.unique(data['department'][mask].astype(str), return_inverse=True, return_counts=True)
+
+    rating_count = data['rating_count'][mask]
+    evaluation_count = data['evaluation_count'][mask]
+    columns = {
+        'rating_top_percent': top_percents(
+            groups, data['rating_sum'][mask] / np.maximum(rating_count, 1), rating_count > 0
+        ),
+    }
+    sums = data['evaluation_sums'][mask]
+    for column, field in enumerate(ProfessorEvaluation.PARAMETER_NAMES):
+        averages = sums[:, column] / np.maximum(evaluation_count, 1)
+        if field in LOWER_IS_BETTER:
+            averages = -averages
+        columns[f'{field}_top_percent'] = top_percents(groups, averages, evaluation_count > 0)
+
+    # ستون‌ها به ترتیب INSERT؛ درصد 0 یعنی بدون رتبه (NULL)
+    values = [
+        data['pk'][mask].tolist(),
+        data['department'][mask].tolist(),
+        sizes[groups].tolist(),
+        data['rating_sum'][mask].tolist(),
+        rating_count.tolist(),
+        data['evaluation_version'][mask].tolist(),
+        [connection.ops.adapt_datetimefield_value(timezone.now())] * len(rating_count),
+    ] + [[percent or None for percent in array.tolist()] for array in columns.values()]
+    fields = [
+        'professor', 'department', 'department_size', 'source_rating_sum', 'source_rating_count',
+        'source_evaluation_version', 'computed_at', *columns,
+    ]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(ProfessorRank._meta.db_table),
+        ', '.join(connection.ops.quote_name(ProfessorRank._meta.get_field(field).column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    rows = list(zip(*values))
+
+    with transaction.atomic():
+        if full:
+            ProfessorRank.objects.all().delete()
+        else:
+            # ردیف‌های قبلی با دانشکده ذخیره شده حذف می‌شوند (شامل اساتید جابه‌جا شده)
+            names = sorted(departments)
+            for start in range(0, len(names), BATCH_SIZE):
+                ProfessorRank.objects.filter(department__in=names[start:start + BATCH_SIZE]).delete()
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), BATCH_SIZE):
+                cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+    return len(departments), len(rows)
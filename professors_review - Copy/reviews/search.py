@@ -0,0 +1,246 @@
+"""
+جستجوی متنی اساتید
+
+در SQLite از یک جدول مجازی FTS5 (با rowid برابر شناسه استاد) برای جستجوی
+پیشوندی و رتبه‌بندی bm25 استفاده می‌شود. در سایر پایگاه‌داده‌ها یا اگر FTS5
+در دسترس نباشد، جستجو به تطبیق پیشوندی کلمات ستون‌های یکسان‌شده برمی‌گردد.
+"""
+import hashlib
+import json
+import logging
+import re
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections
+from django.db.models import Case, IntegerField, Q, When
+from django.db.models.expressions import RawSQL
+
+from . import fuzzy
+from .caching import SingleFlight, TTLCache
+from .normalization import normalize_text
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'reviews_professor_fts'
+SEARCH_RESULT_LIMIT = 200
+
+# جستجوی زنده: تعداد پیش‌فرض و حداکثر نتایج و مدت اعتبار کش نتایج (ثانیه)
+LIVE_SEARCH_LIMIT = 8
+LIVE_SEARCH_MAX_LIMIT = 20
+LIVE_SEARCH_CACHE_TTL = 30
+
+# وزن ستون‌ها در رتبه‌بندی bm25: نام، دپارتمان، بیوگرافی
+FTS_COLUMN_WEIGHTS = (10.0, 4.0, 1.0)
+
+# نتیجه بررسی وجود ایندکس روی خود اتصال نگه‌داری می‌شود (نه متغیر سراسری)
+FTS_AVAILABLE_ATTRIBUTE = 'reviews_fts_available'
+
+
+def fts_available():
+    """آیا ایندکس FTS5 روی پایگاه‌داده فعلی وجود دارد؟"""
+    available = getattr(connection, FTS_AVAILABLE_ATTRIBUTE, None)
+    if available is None:
+        available = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+        setattr(connection, FTS_AVAILABLE_ATTRIBUTE, available)
+    return available
+
+
+def reset_fts_available(using=DEFAULT_DB_ALIAS, **kwargs):
+    """پاک کردن نتیجه کش شده (گیرنده post_migrate؛ جدول ممکن است ساخته یا حذف شده باشد)"""
+    connections[using].__dict__.pop(FTS_AVAILABLE_ATTRIBUTE, None)
+
+
+def build_match_expression(query):
+    """تبدیل عبارت کاربر به عبارت MATCH با تطبیق پیشوندی برای هر کلمه"""
+    tokens = re.findall(r'\w+', normalize_text(query))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _document(professor):
+    # متن یکسان‌شده ایندکس می‌شود تا املای متفاوت حروف و نیم‌فاصله مانع تطبیق نشود
+    return [
+        professor.pk,
+        normalize_text(professor.name),
+        normalize_text(professor.department),
+        normalize_text(professor.bio),
+    ]
+
+
+def index_professor(professor):
+    """افزودن یا به‌روزرسانی یک استاد در ایندکس"""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [professor.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, department, bio) VALUES (%s, %s, %s, %s)',
+            _document(professor)
+        )
+
+
+def remove_professor(professor_id):
+    """حذف یک استاد از ایندکس"""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [professor_id])
+
+
+def rebuild_index(professors):
+    """ساخت مجدد کامل ایندکس از روی کوئری‌ست داده شده"""
+    if not fts_available():
+        return 0
+    count = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        batch = []
+        for professor in professors.iterator(chunk_size=1000):
+            batch.append(_document(professor))
+            if len(batch) >= 1000:
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, name, department, bio) VALUES (%s, %s, %s, %s)',
+                    batch
+                )
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, department, bio) VALUES (%s, %s, %s, %s)',
+                batch
+            )
+            count += len(batch)
+    return count
+
+
+def ranked_professor_ids(match_expression, limit=SEARCH_RESULT_LIMIT):
+    """شناسه اساتید منطبق، مرتب شده بر اساس ارتباط (bm25)"""
+    weights = ', '.join(str(weight) for weight in FTS_COLUMN_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s',
+            [match_expression, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _prefix_lookup(field, prefix):
+    """شرط پیشوندی به صورت بازه، تا ایندکس B-tree ستون قابل استفاده باشد"""
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\U0010ffff'})
+
+
+def in_id_order(queryset, ids):
+    """محدود کردن کوئری‌ست به شناسه‌های داده شده با حفظ ترتیب آن‌ها"""
+    if not ids:
+        return queryset.none()
+    position = Case(
+        *[When(pk=pk, then=index) for index, pk in enumerate(ids)],
+        output_field=IntegerField()
+    )
+    return queryset.filter(pk__in=ids).order_by(position)
+
+
+def _fallback_condition(query):
+    """شرط جستجو بدون FTS (یا None برای عبارت بدون کلمه)
+
+    عبارت یکسان‌شده باید پیشوند کل نام یا دپارتمان باشد؛ جستجوی کلمات میانی
+    به LIKE با wildcard ابتدایی و پیمایش کامل جدول نیاز دارد.
+    """
+    prefix = ' '.join(re.findall(r'\w+', normalize_text(query)))
+    if not prefix:
+        return None
+    return _prefix_lookup('name_normalized', prefix) | _prefix_lookup('department_normalized', prefix)
+
+
+def matching_professor_ids(query, limit=SEARCH_RESULT_LIMIT):
+    """شناسه اساتید منطبق با عبارت جستجو، مرتب شده بر اساس ارتباط"""
+    if fts_available():
+        match_expression = build_match_expression(query)
+        if match_expression is None:
+            return []
+        try:
+            return ranked_professor_ids(match_expression, limit)
+        except DatabaseError as e:
+            logger.warning(f"خطا در جستجوی FTS برای «{query}»: {e}")
+
+    from .models import Professor
+
+    condition = _fallback_condition(query)
+    if condition is None:
+        return []
+    return list(Professor.objects.filter(condition).values_list('pk', flat=True)[:limit])
+
+
+def filter_professors(queryset, query):
+    """محدود کردن کوئری‌ست به همه اساتید منطبق، بدون سقف تعداد و بدون ترتیب ارتباط
+
+    شرط جستجو به صورت زیرکوئری در همان کوئری باقی می‌ماند تا ترتیب و cursor
+    صفحه‌بندی (نام، امتیاز) روی همه نتایج اعمال شود.
+    """
+    if fts_available():
+        match_expression = build_match_expression(query)
+        if match_expression is None:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match_expression]
+        ))
+
+    condition = _fallback_condition(query)
+    if condition is None:
+        return queryset.none()
+    return queryset.filter(condition)
+
+
+def search_professors(queryset, query, limit=SEARCH_RESULT_LIMIT):
+    """فیلتر کوئری‌ست اساتید با عبارت جستجو، مرتب شده بر اساس ارتباط"""
+    return in_id_order(queryset, matching_professor_ids(query, limit))
+
+
+# =========================
+# جستجوی زنده (JSON)
+# =========================
+# کلید کش: (عبارت یکسان‌شده، تعداد نتایج)؛ با هر تغییر اساتید کل کش پاک می‌شود
+live_search_cache = TTLCache(maxsize=512, ttl=LIVE_SEARCH_CACHE_TTL)
+_live_search_flights = SingleFlight()
+
+
+def _live_search_result(professor):
+    return {
+        'id': professor.pk,
+        'name': professor.name,
+        'department': professor.department,
+        'avg': professor.avg_rating,
+        'image': professor.get_image_url(),
+    }
+
+
+def live_search(query, limit=LIVE_SEARCH_LIMIT):
+    """بدنه JSON و ETag نتایج جستجوی زنده
+
+    نتیجه برای هر عبارت یکسان‌شده کش می‌شود و درخواست‌های هم‌زمان با عبارت
+    یکسان فقط یک بار محاسبه می‌شوند.
+    """
+    key = (normalize_text(query), limit)
+    cached = live_search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    def compute():
+        from .models import Professor
+
+        ids = fuzzy.search_professor_ids(query, limit=limit) if key[0] else []
+        professors = in_id_order(Professor.objects.for_listing(), ids)
+        body = json.dumps(
+            {'results': [_live_search_result(professor) for professor in professors]},
+            ensure_ascii=False,
+            separators=(',', ':')
+        ).encode('utf-8')
+        value = (body, '"%s"' % hashlib.md5(body).hexdigest())
+        live_search_cache.set(key, value)
+        return value
+
+    return _live_search_flights.do(key, compute)
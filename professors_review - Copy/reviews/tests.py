@@ -1,3 +1,1572 @@
-from django.test import TestCase
+import base64
+import datetime
+import importlib
+import io
+import json
+import re
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models.signals import post_delete, pre_delete
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+
+from . import decay, fuzzy, pagination, quotas, ranking, search, views, vote_buffer, votes
+from .admin import ReviewAdmin
+from .normalization import normalize_text
+from .forms import QuestionForm, ReviewForm
+from .models import (
+    Answer, AnswerVote, Professor, ProfessorEvaluation, ProfessorEvaluationSummary, ProfessorRank, Question, Review,
+    ReviewVote, UserDailyLimit, fix_current_daily_limits,
+)
+
+
+class DailyLimitPostPathTests(TestCase):
+    """ثبت نظر/پرسش با رزرو سهمیه کاربر"""
+
+    def setUp(self):
+        quotas._cache().clear()
+        self.user = User.objects.create_user('student', password='pass')
+        self.professor = Professor.objects.create(name='دکتر تست', department='کامپیوتر')
+        self.factory = RequestFactory()
+
+    def _request(self):
+        request = self.factory.post('/')
+        request.user = self.user
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        return request
+
+    def _post_review(self, text):
+        form = ReviewForm({'rating': 4, 'text': text})
+        return views._handle_review_form(self._request(), self.professor, form)
+
+    def test_review_post_query_count(self):
+        # اولین ارسال: بررسی تکراری، مقداردهی شمارنده از پایگاه‌داده، درج نظر و ایجاد رکورد سابقه
+        # (به‌علاوه SAVEPOINT تراکنش ثبت، که بیرون از تست BEGIN/COMMIT است)
+        with self.assertNumQueries(9):
+            success, message = self._post_review('متن نظر اول برای آزمایش مسیر ثبت')
+        self.assertTrue(success, message)
+
+        # ارسال‌های بعدی: بررسی تکراری، درج نظر و به‌روزرسانی رکورد سابقه در یک تراکنش
+        with self.assertNumQueries(5):
+            success, message = self._post_review('متن نظر دوم برای آزمایش مسیر ثبت')
+        self.assertTrue(success, message)
+
+    def test_review_limit_is_enforced(self):
+        limit = quotas.limit_for(self.user, 'review')
+        for i in range(limit):
+            success, message = self._post_review(f'متن نظر شماره {i} برای آزمایش محدودیت')
+            self.assertTrue(success, message)
+
+        success, message = self._post_review('متن نظری که نباید ثبت شود چون سهمیه پر است')
+        self.assertFalse(success)
+        self.assertEqual(Review.objects.filter(user=self.user).count(), limit)
+        self.assertEqual(UserDailyLimit.objects.get(user=self.user).review_count, limit)
+
+    def test_duplicate_review_does_not_use_quota(self):
+        self.assertTrue(self._post_review('متن تکراری برای آزمایش ثبت دوباره')[0])
+        self.assertFalse(self._post_review('متن تکراری برای آزمایش ثبت دوباره')[0])
+        self.assertEqual(quotas.status(self.user, 'review')['used'], 1)
+
+    def test_failed_insert_releases_claim(self):
+        def failing_create():
+            raise RuntimeError('insert failed')
+
+        with self.assertRaises(RuntimeError):
+            views._post_with_quota(self.user, 'question', Question.objects.none(), failing_create)
+        self.assertEqual(quotas.status(self.user, 'question')['used'], 0)
+        self.assertFalse(UserDailyLimit.objects.filter(user=self.user).exists())
+
+    def test_question_post_query_count(self):
+        # شمارنده از قبل در کش است؛ هیچ کوئری‌ای برای بررسی سهمیه اجرا نمی‌شود
+        quotas.status(self.user, 'question')
+        form = QuestionForm({'text': 'پرسش آزمایشی درباره این استاد'})
+        with self.assertNumQueries(8):
+            success, message = views._handle_question_form(self._request(), self.professor, form)
+        self.assertTrue(success, message)
+
+
+class QuotaEngineTests(TestCase):
+    """شمارنده‌های سهمیه در کش"""
+
+    def setUp(self):
+        quotas._cache().clear()
+        self.user = User.objects.create_user('student', password='pass')
+        self.professor = Professor.objects.create(name='دکتر تست', department='کامپیوتر')
+
+    def test_claim_never_exceeds_limit(self):
+        results = [quotas.claim(self.user, 'question') for _ in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual(quotas.status(self.user, 'question')['used'], 3)
+
+    def test_status_is_read_only_once_cached(self):
+        quotas.status(self.user, 'review')
+        with self.assertNumQueries(0):
+            status = quotas.status(self.user, 'review')
+        self.assertEqual(status, {'used': 0, 'remaining': 3, 'total': 3, 'reached_limit': False})
+
+    def test_counter_is_seeded_from_database_on_cache_miss(self):
+        Review.objects.create(professor=self.professor, user=self.user, rating=5, text='نظر ثبت شده پیش از پاک شدن کش')
+        quotas._cache().clear()
+        self.assertEqual(quotas.status(self.user, 'review')['used'], 1)
+
+    def test_deleting_content_releases_quota(self):
+        self.assertTrue(quotas.claim(self.user, 'review'))
+        review = Review.objects.create(professor=self.professor, user=self.user, rating=5, text='نظری که حذف می‌شود')
+        review.delete()
+        self.assertEqual(quotas.status(self.user, 'review')['used'], 0)
+
+    def test_limits_depend_on_role(self):
+        staff = User.objects.create_user('moderator', password='pass', is_staff=True)
+        self.assertGreater(quotas.limit_for(staff, 'review'), quotas.limit_for(self.user, 'review'))
+
+    @override_settings(REVIEWS_QUOTA_LIMITS={'vote': {'user': 2}})
+    def test_sliding_window_vote_quota(self):
+        self.assertTrue(quotas.claim(self.user, 'vote'))
+        self.assertFalse(quotas.claim(self.user, 'vote', 2))
+        self.assertTrue(quotas.claim(self.user, 'vote'))
+        self.assertFalse(quotas.claim(self.user, 'vote'))
+
+    def test_concurrent_seed_keeps_other_claims(self):
+        Review.objects.create(professor=self.professor, user=self.user, rating=5, text='نظر ثبت شده پیش از پاک شدن کش')
+        quotas._cache().clear()
+        seed = quotas._seed
+        results = []
+        raced = []
+
+        def seed_while_other_request_claims(*args):
+            # درخواست هم‌زمان بعد از خواندن پایگاه‌داده و پیش از add این درخواست رزرو می‌کند
+            value = seed(*args)
+            if not raced:
+                raced.append(True)
+                results.append(quotas.claim(self.user, 'review'))
+            return value
+
+        with mock.patch.object(quotas, '_seed', side_effect=seed_while_other_request_claims):
+            results.append(quotas.claim(self.user, 'review'))
+        self.assertEqual(results, [True, True])
+        self.assertEqual(quotas.status(self.user, 'review')['used'], 3)
+        self.assertFalse(quotas.claim(self.user, 'review'))
+
+    def test_claim_on_cache_miss_counts_existing_content(self):
+        for index in range(3):
+            Review.objects.create(professor=self.professor, user=self.user, rating=5, text=f'نظر شماره {index} کاربر')
+        quotas._cache().clear()
+        self.assertFalse(quotas.claim(self.user, 'review'))
+        self.assertEqual(quotas.status(self.user, 'review')['used'], 3)
+
+
+class QuotaTransactionTests(TransactionTestCase):
+    """رزرو سهمیه فقط با commit تراکنش قطعی می‌شود"""
+
+    def setUp(self):
+        # رزروهای باقی‌مانده از تست‌های TestCase (که هرگز commit نمی‌شوند) کنار گذاشته می‌شوند
+        transaction.get_connection().__dict__.pop(quotas.HOLDS_ATTRIBUTE, None)
+        quotas._cache().clear()
+        self.user = User.objects.create_user('student')
+        self.professor = Professor.objects.create(name='دکتر تست', department='کامپیوتر')
+
+    def _post_question(self, text='پرسش آزمایشی درباره این استاد'):
+        return views._post_with_quota(
+            self.user, 'question', Question.objects.none(),
+            lambda: Question.objects.create(professor=self.professor, user=self.user, text=text),
+        )
+
+    def test_committed_claim_is_kept(self):
+        self.assertTrue(self._post_question())
+        request_finished.send(sender=self.__class__)
+        self.assertEqual(quotas.status(self.user, 'question')['used'], 1)
+
+    def test_outer_rollback_releases_claim(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.assertTrue(self._post_question())
+                raise RuntimeError('outer rollback')
+        self.assertFalse(Question.objects.exists())
+        self.assertEqual(quotas.status(self.user, 'question')['used'], 0)
+
+    def test_rolled_back_savepoint_is_released_at_request_end(self):
+        with transaction.atomic():
+            self.assertTrue(self._post_question('پرسشی که ذخیره می‌شود'))
+            try:
+                with transaction.atomic():
+                    self.assertTrue(self._post_question('پرسشی که برگردانده می‌شود'))
+                    raise RuntimeError('savepoint rollback')
+            except RuntimeError:
+                pass
+        request_finished.send(sender=self.__class__)
+        self.assertEqual(Question.objects.count(), 1)
+        self.assertEqual(quotas.status(self.user, 'question')['used'], 1)
+
+    def test_failed_insert_is_not_released_twice(self):
+        self.assertTrue(self._post_question())
+
+        def failing_create():
+            raise RuntimeError('insert failed')
+
+        with self.assertRaises(RuntimeError):
+            views._post_with_quota(self.user, 'question', Question.objects.none(), failing_create)
+        request_finished.send(sender=self.__class__)
+        self.assertEqual(quotas.status(self.user, 'question')['used'], 1)
+
+
+class ReadPathTests(TestCase):
+    """درخواست‌های GET صفحه استاد نباید در پایگاه‌داده بنویسند"""
+
+    WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+    def setUp(self):
+        quotas._cache().clear()
+        self.user = User.objects.create_user('student', password='pass')
+        self.professor = Professor.objects.create(name='دکتر تست', department='کامپیوتر')
+        Review.objects.create(professor=self.professor, user=self.user, rating=4, text='نظر تأیید شده برای نمایش', is_approved=True)
+        question = Question.objects.create(professor=self.professor, user=self.user, text='پرسش تأیید شده', is_approved=True)
+        Answer.objects.create(question=question, user=self.user, text='پاسخ تأیید شده', is_approved=True)
+        self.client.force_login(self.user)
+
+    def assertNoWrites(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        writes = [query['sql'] for query in context.captured_queries
+                  if query['sql'].lstrip().upper().startswith(self.WRITE_STATEMENTS)]
+        self.assertEqual(writes, [])
+
+    def test_professor_detail_get_does_not_write(self):
+        for tab in ('reviews', 'questions', 'evaluation'):
+            self.assertNoWrites(f'/professor/{self.professor.pk}/?tab={tab}')
+        self.assertFalse(UserDailyLimit.objects.exists())
+
+    def test_lazy_tabs_and_daily_stats_do_not_write(self):
+        for tab in ('questions', 'evaluation'):
+            self.assertNoWrites(f'/professor/{self.professor.pk}/tab/{tab}/')
+        self.assertNoWrites('/daily-stats/')
+        self.assertFalse(UserDailyLimit.objects.exists())
+
+
+class RatingAggregateTests(TestCase):
+    """آمار تجمیعی امتیاز اساتید باید با محاسبه مجدد از روی نظرات یکسان بماند"""
+
+    def setUp(self):
+        quotas._cache().clear()
+        self.user = User.objects.create_user('student', password='pass')
+        self.professors = [Professor.objects.create(name=f'دکتر تست {i}', department='کامپیوتر') for i in range(2)]
+        now = timezone.now()
+        self.review_ids = []
+        for i in range(6):
+            review = Review.objects.create(
+                professor=self.professors[i % 2], user=self.user, rating=i % 5 + 1, text=f'نظر شماره {i}'
+            )
+            # زمان‌های متفاوت تا وزن کاهش‌یابنده نظرات هم متفاوت باشد
+            Review.objects.filter(pk=review.pk).update(created_at=now - datetime.timedelta(days=90 * i))
+            self.review_ids.append(review.pk)
+        self.admin = ReviewAdmin(Review, admin.site)
+
+    def assertAggregatesConsistent(self):
+        self.assertEqual(Professor.rebuild_rating_aggregates(), 0)
+
+    def test_approve_edit_unapprove_and_delete(self):
+        self.assertEqual(self.admin._set_approval(Review.objects.all(), True), 6)
+        self.assertAggregatesConsistent()
+        professor = Professor.objects.get(pk=self.professors[0].pk)
+        self.assertEqual((professor.rating_sum, professor.rating_count), (9, 3))
+        self.assertEqual(professor.rating_histogram, [1, 0, 1, 0, 1])
+
+        # ویرایش امتیاز و انتقال نظر به استاد دیگر
+        review = Review.objects.get(pk=self.review_ids[0])
+        review.rating = 4
+        review.save()
+        self.assertAggregatesConsistent()
+        review.professor = self.professors[1]
+        review.save()
+        self.assertAggregatesConsistent()
+
+        self.assertEqual(self.admin._set_approval(Review.objects.filter(pk__in=self.review_ids[:3]), False), 3)
+        self.assertAggregatesConsistent()
+        # ویرایش نظر تأیید نشده روی آمار اثری ندارد
+        review.refresh_from_db()
+        review.rating = 1
+        review.save()
+        self.assertAggregatesConsistent()
+
+        Review.objects.get(pk=self.review_ids[4]).delete()
+        self.assertAggregatesConsistent()
+        Review.objects.filter(professor=self.professors[1]).delete()
+        self.assertAggregatesConsistent()
+        professor = Professor.objects.get(pk=self.professors[1].pk)
+        self.assertEqual((professor.rating_count, professor.rating_avg), (0, 0))
+        self.assertIsNone(professor.decayed_rating)
+
+
+class SearchIndexTests(TestCase):
+    """جستجوی FTS5 با رتبه‌بندی ستون‌ها و مسیر جایگزین بدون FTS"""
+
+    def setUp(self):
+        self.by_name = Professor.objects.create(name='علی رضایی', department='ریاضی')
+        self.by_department = Professor.objects.create(name='مریم احمدی', department='گروه رضایی')
+        self.by_bio = Professor.objects.create(name='حسن کریمی', department='فیزیک', bio='همکار پژوهشی گروه رضایی')
+        self.addCleanup(search.reset_fts_available)
+
+    def disable_fts(self):
+        setattr(connection, search.FTS_AVAILABLE_ATTRIBUTE, False)
+
+    def test_fts_ranks_name_above_department_and_bio(self):
+        self.assertTrue(search.fts_available())
+        self.assertEqual(
+            search.matching_professor_ids('رضا'),
+            [self.by_name.pk, self.by_department.pk, self.by_bio.pk]
+        )
+        self.assertEqual(search.matching_professor_ids('ريا'), [self.by_name.pk])
+
+    def test_fts_index_follows_save_and_delete(self):
+        self.by_name.name = 'علی محمدی'
+        self.by_name.save()
+        self.assertEqual(search.matching_professor_ids('محمدی'), [self.by_name.pk])
+        self.by_name.delete()
+        self.assertEqual(search.matching_professor_ids('محمدی'), [])
+
+    def test_fallback_without_fts(self):
+        self.disable_fts()
+        with self.assertNumQueries(1):
+            self.assertEqual(search.matching_professor_ids('علی'), [self.by_name.pk])
+        self.assertEqual(search.matching_professor_ids('فیز'), [self.by_bio.pk])
+        self.assertEqual(search.matching_professor_ids('   '), [])
+
+    def test_fallback_matches_column_prefixes(self):
+        self.disable_fts()
+        # پیشوند نام یا دپارتمان، با املای عربی و فاصله‌های اضافه
+        self.assertEqual(search.matching_professor_ids('علي  رض'), [self.by_name.pk])
+        self.assertEqual(search.matching_professor_ids('مريم'), [self.by_department.pk])
+        self.assertEqual(search.matching_professor_ids('گروه رضا'), [self.by_department.pk])
+        # کلمات میانی و وسط کلمه بدون FTS پیدا نمی‌شوند (بدون LIKE با wildcard ابتدایی)
+        self.assertEqual(search.matching_professor_ids('رضایی'), [])
+        self.assertEqual(search.matching_professor_ids('ضایی'), [])
+        self.assertEqual(search.matching_professor_ids('رضا علی'), [])
+
+    def test_fallback_uses_only_range_lookups(self):
+        self.disable_fts()
+        with CaptureQueriesContext(connection) as context:
+            search.matching_professor_ids('علی رضا')
+        self.assertEqual(len(context), 1)
+        self.assertNotIn('LIKE', context[0]['sql'].upper())
+
+    def test_availability_is_cached_per_connection(self):
+        self.disable_fts()
+        self.assertFalse(search.fts_available())
+        # پس از migrate (یا روی اتصال دیگر) دوباره بررسی می‌شود
+        search.reset_fts_available()
+        self.assertTrue(search.fts_available())
+        with self.assertNumQueries(0):
+            self.assertTrue(search.fts_available())
+
+
+class FuzzyIndexTests(TestCase):
+    """ایندکس فازی: ساخت در اولین درخواست و به‌روزرسانی با ذخیره و حذف استاد"""
+
+    def setUp(self):
+        fuzzy.professor_index.clear()
+        self.addCleanup(fuzzy.professor_index.clear)
+        self.professor = Professor.objects.create(name='حسن کریمی', department='فیزیک')
+
+    def test_index_is_built_on_first_request(self):
+        fuzzy.schedule_build()
+        self.assertFalse(fuzzy.professor_index.is_built)
+        request_started.send(sender=self.__class__)
+        self.assertTrue(fuzzy.professor_index.is_built)
+        self.assertEqual(len(fuzzy.professor_index), 1)
+        # گیرنده پس از اولین درخواست جدا می‌شود
+        self.assertFalse(request_started.disconnect(dispatch_uid='reviews_fuzzy_index_build'))
+
+    def test_index_is_built_lazily_on_first_search(self):
+        self.assertEqual(fuzzy.search_professor_ids('کریمى'), [self.professor.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(fuzzy.search_professor_ids('کرمی'), [self.professor.pk])
+
+    def test_save_and_delete_update_built_index(self):
+        fuzzy.ensure_built()
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Professor.objects.create(name='مریم احمدی', department='شیمی')
+        self.assertEqual(fuzzy.search_professor_ids('احمدی'), [other.pk])
+
+        other.name = 'مریم صادقی'
+        with self.captureOnCommitCallbacks(execute=True):
+            other.save()
+        self.assertEqual(fuzzy.search_professor_ids('احمدی'), [])
+        self.assertEqual(fuzzy.search_professor_ids('صادقی'), [other.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(fuzzy.search_professor_ids('صادقی'), [])
+        self.assertEqual(len(fuzzy.professor_index), 1)
+
+    def test_rolled_back_changes_leave_index_untouched(self):
+        fuzzy.ensure_built()
+        search.live_search_cache.set('sentinel', 'cached')
+        self.addCleanup(search.live_search_cache.clear)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(IntegrityError):
+                with transaction.atomic():
+                    Professor.objects.create(name='مریم احمدی', department='شیمی')
+                    self.professor.name = 'حسن رحیمی'
+                    self.professor.save()
+                    raise IntegrityError('rollback')
+            with self.assertRaises(IntegrityError):
+                with transaction.atomic():
+                    Professor.objects.get(pk=self.professor.pk).delete()
+                    raise IntegrityError('rollback')
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(search.live_search_cache.get('sentinel'), 'cached')
+        self.assertEqual(len(fuzzy.professor_index), 1)
+        self.assertEqual(fuzzy.search_professor_ids('احمدی'), [])
+        self.assertEqual(fuzzy.search_professor_ids('رحیمی'), [])
+        self.assertEqual(fuzzy.search_professor_ids('کریمی'), [self.professor.pk])
+
+    def test_changes_before_build_are_read_from_database(self):
+        self.professor.name = 'حسن رحیمی'
+        self.professor.save()
+        self.assertFalse(fuzzy.professor_index.is_built)
+        self.assertEqual(fuzzy.search_professor_ids('رحیمی'), [self.professor.pk])
+
+
+class NormalizationTests(TestCase):
+    """یکسان‌سازی حروف عربی/فارسی، نیم‌فاصله و ارقام"""
+
+    def test_arabic_letters_become_persian(self):
+        self.assertEqual(normalize_text('علي'), 'علی')
+        self.assertEqual(normalize_text('موسى'), 'موسی')
+        self.assertEqual(normalize_text('كريمي'), 'کریمی')
+        self.assertEqual(normalize_text('فاطمة'), 'فاطمه')
+
+    def test_zwnj_and_spacing(self):
+        self.assertEqual(normalize_text('رحیم\u200cپور'), normalize_text('رحیم پور'))
+        self.assertEqual(normalize_text('  علی   رضایی\u200c '), 'علی رضایی')
+        self.assertEqual(normalize_text('مـــهندسی'), 'مهندسی')
+
+    def test_diacritics_digits_and_case(self):
+        self.assertEqual(normalize_text('مُحَمَّد'), 'محمد')
+        self.assertEqual(normalize_text('کلاس ۱۲۳ و ٤٥'), 'کلاس 123 و 45')
+        self.assertEqual(normalize_text('Dr. Karimi'), 'dr. karimi')
+        self.assertEqual(normalize_text(None), '')
+
+    def test_professor_columns_are_normalized_on_save(self):
+        professor = Professor.objects.create(name='علي كريمي', department='مهندسي\u200cبرق')
+        self.assertEqual((professor.name_normalized, professor.department_normalized), ('علی کریمی', 'مهندسی برق'))
+
+
+class LiveSearchApiTests(TestCase):
+    """پاسخ 304 جستجوی زنده فقط برای ETag دقیقاً برابر"""
+
+    def setUp(self):
+        fuzzy.professor_index.clear()
+        self.addCleanup(fuzzy.professor_index.clear)
+        search.live_search_cache.clear()
+        Professor.objects.create(name='علی رضایی', department='ریاضی')
+
+    def test_etag_revalidation(self):
+        response = self.client.get('/api/professors/search/', {'q': 'رضایی'})
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        for header in (etag, f'"other", {etag}', '*'):
+            response = self.client.get('/api/professors/search/', {'q': 'رضایی'}, HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response['ETag'], etag)
+
+        # تگ کوتاه‌تر یا هم‌پوشان با ETag فعلی نباید 304 بدهد
+        for header in (etag[:-3] + '"', '"' + etag.strip('"')[5:] + '"', etag.strip('"')):
+            response = self.client.get('/api/professors/search/', {'q': 'رضایی'}, HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 200, header)
+
+
+class ListingQueryCountTests(TestCase):
+    """تعداد کوئری صفحه اصلی، جستجو و جستجوی زنده به تعداد اساتید وابسته نیست"""
+
+    # 3N استاد باید در یک صفحه (24) و در محدودیت‌های جستجوی زنده جا شوند
+    N = 2
+    DEPARTMENT = 'مهندسی کامپیوتر'
+
+    def setUp(self):
+        fuzzy.professor_index.clear()
+        self.addCleanup(fuzzy.professor_index.clear)
+        search.live_search_cache.clear()
+        self.user = User.objects.create_user('student')
+        self.professors = []
+
+    def add_professors(self, count):
+        for _ in range(count):
+            index = len(self.professors)
+            professor = Professor.objects.create(name=f'استاد شماره {index}', department=self.DEPARTMENT)
+            Review.objects.create(professor=professor, user=self.user, rating=4, text='نظر', is_approved=True)
+            Question.objects.create(professor=professor, user=self.user, text='پرسش', is_approved=True)
+            ProfessorEvaluation.objects.create(professor=professor, user=self.user, teaching_method=4)
+            self.professors.append(professor)
+
+    def count_queries(self, url, params):
+        # درخواست اول ایندکس fuzzy و وضعیت FTS را گرم می‌کند
+        fuzzy.professor_index.clear()
+        self.client.get(url, params)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        content = response.json()['html'] if response['Content-Type'] == 'application/json' else response.content.decode()
+        for professor in self.professors:
+            self.assertIn(professor.name, content)
+        return len(context)
+
+    def assertConstantQueries(self, url, params=None):
+        self.add_professors(self.N)
+        expected = self.count_queries(url, params or {})
+        self.add_professors(2 * self.N)
+        self.assertEqual(self.count_queries(url, params or {}), expected)
+
+    def test_home(self):
+        self.assertConstantQueries('/')
+
+    def test_search(self):
+        self.assertConstantQueries('/search/', {'query': self.DEPARTMENT})
+
+    def test_live_search(self):
+        self.assertLessEqual(3 * self.N, 10)
+        self.assertConstantQueries('/live-search/', {'query': self.DEPARTMENT})
+
+    def test_live_search_without_query(self):
+        self.assertLessEqual(3 * self.N, search.LIVE_SEARCH_LIMIT)
+        self.assertConstantQueries('/live-search/', {'query': ''})
+
+
+class ProfessorPaginationTests(TestCase):
+    """صفحه‌بندی keyset فهرست اساتید: ترتیب پایدار و cursor نامعتبر"""
+
+    # cursor هایی که باید مثل نبود cursor صفحه اول را برگردانند
+    INVALID_CURSORS = (
+        'garbage!!',
+        pagination.encode_cursor({'name': 'x'}),
+        pagination.encode_cursor([4.5]),
+        pagination.encode_cursor(['abc', 'x']),
+        pagination.encode_cursor([None, 1]),
+        pagination.encode_cursor([True, 1]),
+        pagination.encode_cursor([[1], {}]),
+        pagination.encode_cursor([4.5, 10 ** 30]),
+        base64.urlsafe_b64encode(b'[NaN,1]').decode('ascii'),
+    )
+
+    def setUp(self):
+        fuzzy.professor_index.clear()
+        self.addCleanup(fuzzy.professor_index.clear)
+        self.factory = RequestFactory()
+        # نام‌ها و میانگین‌های تکراری؛ ترتیب کامل با id تضمین می‌شود
+        self.professors = [
+            Professor.objects.create(name=f'استاد {i % 4}', department='برق' if i % 2 else 'کامپیوتر')
+            for i in range(30)
+        ]
+        Professor.objects.filter(pk__in=[p.pk for p in self.professors[::3]]).update(rating_avg=4.5)
+
+    def _page(self, **params):
+        return views._professor_page(self.factory.get('/', params))
+
+    def walk(self, **params):
+        ids = []
+        page, query, sort, next_query = self._page(**params)
+        while True:
+            ids += [professor.pk for professor in page]
+            if next_query is None:
+                return ids
+            page, query, sort, next_query = views._professor_page(self.factory.get('/?' + next_query))
+
+    def test_ties_keep_a_stable_order_across_pages(self):
+        for sort, ordering in views.PROFESSOR_ORDERINGS.items():
+            expected = list(Professor.objects.order_by(*ordering).values_list('pk', flat=True))
+            self.assertEqual(self.walk(sort=sort), expected)
+
+            ids, cursor = [], None
+            while True:
+                page = pagination.paginate(Professor.objects.all(), ordering, cursor, page_size=4)
+                ids += [professor.pk for professor in page]
+                cursor = page.next_cursor
+                if cursor is None:
+                    break
+            self.assertEqual(ids, expected)
+
+    def test_relevance_pages_cover_all_results_once(self):
+        ids = self.walk(query='استاد')
+        self.assertEqual(sorted(ids), sorted(p.pk for p in self.professors))
+
+    def test_invalid_cursor_returns_first_page(self):
+        for sort in views.PROFESSOR_ORDERINGS:
+            first = [professor.pk for professor in self._page(sort=sort)[0]]
+            for cursor in self.INVALID_CURSORS:
+                page = self._page(sort=sort, cursor=cursor)[0]
+                self.assertEqual([professor.pk for professor in page], first, cursor)
+
+    def test_invalid_relevance_cursor_returns_first_page(self):
+        first = [professor.pk for professor in self._page(query='استاد')[0]]
+        for cursor in self.INVALID_CURSORS + tuple(pagination.encode_cursor([value]) for value in (-5, True, '24')):
+            page = self._page(query='استاد', cursor=cursor)[0]
+            self.assertEqual([professor.pk for professor in page], first, cursor)
+
+    def test_search_beyond_result_limit(self):
+        self.assertFalse(self._page(query='استاد')[0].truncated)
+        for i in range(search.SEARCH_RESULT_LIMIT + 10 - len(self.professors)):
+            Professor.objects.create(name=f'استاد {i % 4}', department='کامپیوتر')
+        self.addCleanup(search.reset_fts_available)
+
+        # با ترتیب نام یا امتیاز، cursor از همه نتایج جستجو (بیش از سقف) عبور می‌کند
+        for fts in (True, False):
+            setattr(connection, search.FTS_AVAILABLE_ATTRIBUTE, fts)
+            for sort, ordering in views.PROFESSOR_ORDERINGS.items():
+                expected = list(Professor.objects.order_by(*ordering).values_list('pk', flat=True))
+                self.assertGreater(len(expected), search.SEARCH_RESULT_LIMIT)
+                self.assertEqual(self.walk(query='استاد', sort=sort), expected)
+
+        # ترتیب ارتباط به سقف محدود است و قطع شدن فهرست در صفحه آخر اعلام می‌شود
+        search.reset_fts_available()
+        ids = self.walk(query='استاد')
+        self.assertEqual(len(set(ids)), search.SEARCH_RESULT_LIMIT)
+
+        response = self.client.get('/', {'query': 'استاد'})
+        self.assertTrue(response.context['professors'].truncated)
+        self.assertContains(response, 'id="professors-truncated"')
+        next_query = response.context['next_query']
+        while next_query:
+            data = self.client.get('/professors/page/?' + next_query).json()
+            next_query = data['next_query']
+        self.assertTrue(data['truncated'])
+
+        response = self.client.get('/search/', {'query': 'استاد'})
+        self.assertNotContains(response, 'sort=name')
+        last = pagination.encode_cursor([search.SEARCH_RESULT_LIMIT - 8])
+        response = self.client.get('/search/', {'query': 'استاد', 'cursor': last})
+        self.assertEqual(len(response.context['results']), 8)
+        self.assertContains(response, 'sort=name')
+
+    def test_professor_page_endpoint_rejects_tampered_cursor(self):
+        response = self.client.get('/professors/page/', {'sort': 'rating', 'cursor': pagination.encode_cursor(['abc', 1])})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['next_query'])
+
+
+class ReviewPaginationTests(TestCase):
+    """صفحه‌بندی نظرات استاد (دکمه «نظرات بیشتر»)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='pass')
+        self.professor = Professor.objects.create(name='دکتر تست', department='کامپیوتر')
+        moment = timezone.now() - datetime.timedelta(days=1)
+        for i in range(25):
+            review = Review.objects.create(
+                professor=self.professor, user=self.user, rating=4, text=f'نظر شماره {i}', is_approved=i != 3
+            )
+            # بیشتر نظرات زمان ثبت یکسان دارند
+            if i < 18:
+                Review.objects.filter(pk=review.pk).update(created_at=moment)
+        self.client.force_login(self.user)
+
+    def test_ties_keep_a_stable_order_across_pages(self):
+        expected = list(Review.objects.filter(
+            professor=self.professor, is_approved=True
+        ).order_by(*views.REVIEW_ORDERING).values_list('pk', flat=True))
+        ids, cursor = [], None
+        while True:
+            page = views._review_page(self.professor, self.user, cursor)
+            ids += [review.pk for review in page]
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(ids), 24)
+
+    def test_load_more_endpoint(self):
+        url = f'/professor/{self.professor.pk}/reviews/'
+        first = views._review_page(self.professor, self.user)
+        response = self.client.get(url, {'cursor': first.next_cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['next_cursor'])
+
+        # cursor نامعتبر یا دست‌کاری شده صفحه اول را برمی‌گرداند
+        for cursor in ('garbage!!', pagination.encode_cursor(['not-a-date', 1]),
+                       pagination.encode_cursor([first.next_cursor, 'x']), pagination.encode_cursor([1])):
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 200, cursor)
+            self.assertEqual(response.json()['next_cursor'], first.next_cursor, cursor)
+
+
+class VoteFixtureMixin:
+    """یک نظر و یک پاسخ تأیید شده و چند کاربر رأی‌دهنده"""
+
+    def setUp(self):
+        quotas._cache().clear()
+        self.users = [User.objects.create_user(f'voter{i}') for i in range(4)]
+        self.professor = Professor.objects.create(name='دکتر تست', department='کامپیوتر')
+        self.review = Review.objects.create(
+            professor=self.professor, user=self.users[0], rating=4, text='نظر تأیید شده', is_approved=True
+        )
+        question = Question.objects.create(professor=self.professor, user=self.users[0], text='پرسش', is_approved=True)
+        self.answer = Answer.objects.create(question=question, user=self.users[0], text='پاسخ', is_approved=True)
+
+    def counters(self, obj):
+        obj.refresh_vote_counts()
+        return obj.likes, obj.dislikes
+
+    def assertCountersConsistent(self):
+        self.assertEqual(Review.rebuild_vote_counters(), 0)
+        self.assertEqual(Answer.rebuild_vote_counters(), 0)
+
+
+class VoteCounterTests(VoteFixtureMixin, TestCase):
+    """شمارنده‌های likes/dislikes باید همیشه با جدول رأی‌ها برابر باشند"""
+
+    def test_toggles_keep_counters_in_sync(self):
+        for kind, target in (('review', self.review), ('answer', self.answer)):
+            self.assertEqual(votes.toggle_vote(kind, target.pk, self.users[1].pk, 1), (1, 1, 0))
+            self.assertEqual(votes.toggle_vote(kind, target.pk, self.users[2].pk, -1), (-1, 1, 1))
+            # تغییر رأی، سپس حذف آن با رأی تکراری
+            self.assertEqual(votes.toggle_vote(kind, target.pk, self.users[1].pk, -1), (-1, 0, 2))
+            self.assertEqual(votes.toggle_vote(kind, target.pk, self.users[2].pk, -1), (None, 0, 1))
+            self.assertEqual(self.counters(target), (0, 1))
+        self.assertCountersConsistent()
+
+    def test_direct_vote_saves_and_deletes(self):
+        vote = ReviewVote.objects.create(review=self.review, user=self.users[1], value=1)
+        AnswerVote.objects.create(answer=self.answer, user=self.users[1], value=-1)
+        vote.value = -1
+        vote.save()
+        self.assertEqual(self.counters(self.review), (0, 1))
+        self.assertCountersConsistent()
+        vote.delete()
+        AnswerVote.objects.filter(answer=self.answer).delete()
+        self.assertEqual((self.counters(self.review), self.counters(self.answer)), ((0, 0), (0, 0)))
+        self.assertCountersConsistent()
+
+    def test_reconcile_repairs_corrupted_counters(self):
+        votes.toggle_vote('review', self.review.pk, self.users[1].pk, 1)
+        votes.toggle_vote('answer', self.answer.pk, self.users[1].pk, -1)
+        Review.objects.filter(pk=self.review.pk).update(likes=40, dislikes=-3)
+        Answer.objects.filter(pk=self.answer.pk).update(likes=2)
+
+        call_command('reconcile_vote_counters', stdout=io.StringIO())
+        self.assertEqual((self.counters(self.review), self.counters(self.answer)), ((1, 0), (0, 1)))
+        self.assertCountersConsistent()
+
+
+class VoteServiceTests(VoteFixtureMixin, TestCase):
+    """سرویس مشترک رأی: رأی هم‌زمان و ثبت چند رأی با vote_batch"""
+
+    def test_concurrent_insert_is_retried_once(self):
+        insert = votes._insert_vote
+
+        def racing_insert(vote_model, lookup, value):
+            # درخواست هم‌زمان همان کاربر پیش از این درج رأی مخالف ثبت کرده است
+            if racing_insert.first:
+                racing_insert.first = False
+                vote_model.objects.create(**lookup, value=-value)
+            return insert(vote_model, lookup, value)
+        racing_insert.first = True
+
+        with mock.patch.object(votes, '_insert_vote', side_effect=racing_insert) as patched:
+            self.assertEqual(votes.toggle_vote('review', self.review.pk, self.users[1].pk, 1), (1, 1, 0))
+        self.assertEqual(patched.call_count, 1)
+        self.assertEqual(list(ReviewVote.objects.values_list('user_id', 'value')), [(self.users[1].pk, 1)])
+        self.assertCountersConsistent()
+
+    def test_persistent_conflict_is_not_retried_forever(self):
+        with mock.patch.object(votes, '_insert_vote', return_value=False) as patched:
+            with self.assertRaises(IntegrityError):
+                votes.toggle_vote('answer', self.answer.pk, self.users[1].pk, 1)
+        self.assertEqual(patched.call_count, votes.TOGGLE_ATTEMPTS)
+        self.assertFalse(AnswerVote.objects.exists())
+
+    def post_batch(self, items):
+        self.client.force_login(self.users[1])
+        return self.client.post('/vote-batch/', json.dumps({'votes': items}), content_type='application/json')
+
+    def test_batch_applies_votes_and_counters(self):
+        response = self.post_batch([
+            {'kind': 'review', 'id': self.review.pk, 'value': 1},
+            {'kind': 'answer', 'id': self.answer.pk, 'value': -1},
+            {'kind': 'review', 'id': self.review.pk, 'value': -1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = [(item['kind'], item['user_vote'], item['likes_count'], item['dislikes_count'])
+                   for item in response.json()['results']]
+        # شمارنده‌ها پس از اعمال همه رأی‌ها خوانده می‌شوند
+        self.assertEqual(results, [('review', 1, 0, 1), ('answer', -1, 0, 1), ('review', -1, 0, 1)])
+        self.assertEqual((self.counters(self.review), self.counters(self.answer)), ((0, 1), (0, 1)))
+        self.assertCountersConsistent()
+        self.assertEqual(quotas.status(self.users[1], 'vote')['used'], 3)
+
+    def test_batch_with_invalid_ids_writes_nothing(self):
+        unapproved = Answer.objects.create(question=self.answer.question, user=self.users[0], text='پاسخ تأیید نشده')
+        for items, status in (
+            ([{'kind': 'review', 'id': self.review.pk, 'value': 1}, {'kind': 'review', 'id': 999999, 'value': 1}], 404),
+            ([{'kind': 'review', 'id': self.review.pk, 'value': 1}, {'kind': 'answer', 'id': unapproved.pk, 'value': 1}], 404),
+            ([{'kind': 'review', 'id': self.review.pk, 'value': 1}, {'kind': 'question', 'id': 1, 'value': 1}], 400),
+            ([{'kind': 'review', 'id': self.review.pk, 'value': 2}], 400),
+            ([{'kind': 'review', 'id': 'abc', 'value': 1}], 400),
+            ([], 400),
+            ([{'kind': 'review', 'id': self.review.pk, 'value': 1}] * (votes.MAX_BATCH_VOTES + 1), 400),
+        ):
+            self.assertEqual(self.post_batch(items).status_code, status, items[:2])
+        self.assertFalse(ReviewVote.objects.exists() or AnswerVote.objects.exists())
+        self.assertEqual(self.counters(self.review), (0, 0))
+        self.assertEqual(quotas.status(self.users[1], 'vote')['used'], 0)
+
+
+class VoteStateQueryTests(VoteFixtureMixin, TestCase):
+    """رأی کاربر در صفحه استاد و تب پرسش‌ها با حداکثر دو کوئری IN، مستقل از تعداد موارد"""
+
+    def add_voted_items(self, count):
+        question = self.answer.question
+        for i in range(count):
+            review = Review.objects.create(
+                professor=self.professor, user=self.users[2], rating=3, text=f'نظر {i}', is_approved=True
+            )
+            answer = Answer.objects.create(question=question, user=self.users[2], text=f'پاسخ {i}', is_approved=True)
+            ReviewVote.objects.create(review=review, user=self.users[1], value=1)
+            AnswerVote.objects.create(answer=answer, user=self.users[1], value=-1)
+
+    def render(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        vote_queries = [query['sql'] for query in context if 'vote"' in query['sql']]
+        self.assertLessEqual(len(vote_queries), 2, vote_queries)
+        for sql in vote_queries:
+            self.assertIn(' IN (', sql)
+        return response, len(context)
+
+    def assertActive(self, response, function, target, value):
+        self.assertRegex(
+            response.content.decode(),
+            rf'vote-{function[4:].lower()}-btn[^"]* active"\s+onclick="{function}\({target.pk}, {value}\)"'
+        )
+
+    def test_vote_state_queries_do_not_grow(self):
+        self.client.force_login(self.users[1])
+        ReviewVote.objects.create(review=self.review, user=self.users[1], value=-1)
+        AnswerVote.objects.create(answer=self.answer, user=self.users[1], value=1)
+        urls = (f'/professor/{self.professor.pk}/', f'/professor/{self.professor.pk}/tab/questions/')
+
+        self.add_voted_items(1)
+        # درخواست اول کش‌های سهمیه و ارزیابی را گرم می‌کند
+        for url in urls:
+            self.render(url)
+        counts = [self.render(url)[1] for url in urls]
+        # صفحه اول نظرات (REVIEWS_PAGE_SIZE) پر می‌شود
+        self.add_voted_items(views.REVIEWS_PAGE_SIZE - 2)
+        for url, count in zip(urls, counts):
+            with self.assertNumQueries(count):
+                response, _ = self.render(url)
+
+            if 'questions' in url:
+                self.assertActive(response, 'voteAnswer', self.answer, 1)
+                for vote in AnswerVote.objects.exclude(answer=self.answer):
+                    self.assertActive(response, 'voteAnswer', vote.answer, -1)
+            else:
+                self.assertActive(response, 'voteReview', self.review, -1)
+                for vote in ReviewVote.objects.exclude(review=self.review):
+                    self.assertActive(response, 'voteReview', vote.review, 1)
+
+
+class VoteBufferTests(VoteFixtureMixin, TestCase):
+    """بافر رأی‌ها: ادغام، ذخیره دسته‌ای، بازگشت به صف و موارد حذف شده"""
+
+    def setUp(self):
+        super().setUp()
+        self.buffer = vote_buffer.VoteBuffer()
+        # ذخیره فقط با فراخوانی flush در خود تست انجام می‌شود
+        patcher = mock.patch.object(self.buffer, '_ensure_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_toggles_coalesce_into_one_row_change(self):
+        for value in (1, -1, 1):
+            user_vote, likes, dislikes = self.buffer.toggle('review', self.review.pk, self.users[1].pk, value)
+        self.assertEqual((user_vote, likes, dislikes), (1, 1, 0))
+        self.assertEqual(self.buffer.stats()['queue_depth'], 1)
+        self.assertFalse(ReviewVote.objects.exists())
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(ReviewVote.objects.values_list('user_id', 'value')), [(self.users[1].pk, 1)])
+        self.assertEqual(self.counters(self.review), (1, 0))
+        self.assertCountersConsistent()
+
+        # رأی‌ای که به حالت پایگاه‌داده برگشته چیزی برای ذخیره ندارد
+        self.buffer.toggle('review', self.review.pk, self.users[1].pk, -1)
+        self.buffer.toggle('review', self.review.pk, self.users[1].pk, 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.buffer.flush(), 0)
+
+    def test_flush_applies_likes_and_dislikes(self):
+        ReviewVote.objects.create(review=self.review, user=self.users[0], value=-1)
+        AnswerVote.objects.create(answer=self.answer, user=self.users[0], value=1)
+        self.buffer.toggle('review', self.review.pk, self.users[0].pk, 1)
+        self.buffer.toggle('review', self.review.pk, self.users[1].pk, 1)
+        self.buffer.toggle('review', self.review.pk, self.users[2].pk, -1)
+        self.buffer.toggle('answer', self.answer.pk, self.users[0].pk, 1)
+        self.buffer.toggle('answer', self.answer.pk, self.users[1].pk, -1)
+        self.assertEqual(self.buffer.user_votes('answer', self.users[0].pk, [self.answer.pk]), {self.answer.pk: None})
+
+        self.assertEqual(self.buffer.flush(), 5)
+        self.assertEqual(self.counters(self.review), (2, 1))
+        self.assertEqual(self.counters(self.answer), (0, 1))
+        self.assertCountersConsistent()
+        self.assertEqual(self.buffer.stats()['flushed_votes'], 5)
+
+    def test_failed_flush_is_requeued(self):
+        self.buffer.toggle('review', self.review.pk, self.users[1].pk, 1)
+        self.buffer.toggle('answer', self.answer.pk, self.users[2].pk, -1)
+
+        def fail(*args):
+            # رأی جدیدتری که هنگام ذخیره ناموفق همان دسته ثبت می‌شود
+            self.buffer.toggle('review', self.review.pk, self.users[1].pk, -1)
+            raise DatabaseError('database is locked')
+
+        with mock.patch.object(self.buffer, '_apply', side_effect=fail), self.assertLogs('reviews.vote_buffer', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        stats = self.buffer.stats()
+        self.assertEqual((stats['failed_flushes'], stats['queue_depth'], stats['inflight']), (1, 2, 0))
+        self.assertFalse(ReviewVote.objects.exists())
+        # شمارنده‌های خوش‌بینانه تغییرهای بازگشته به صف را هم شامل می‌شوند
+        self.assertEqual(self.buffer.toggle('review', self.review.pk, self.users[3].pk, 1)[1:], (1, 1))
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.counters(self.review), (1, 1))
+        self.assertEqual(self.counters(self.answer), (0, 1))
+        self.assertCountersConsistent()
+
+    def test_flush_skips_deleted_targets(self):
+        other = Review.objects.create(
+            professor=self.professor, user=self.users[1], rating=3, text='نظری که حذف می‌شود', is_approved=True
+        )
+        self.buffer.toggle('review', other.pk, self.users[2].pk, 1)
+        self.buffer.toggle('review', self.review.pk, self.users[2].pk, -1)
+        other.delete()
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(list(ReviewVote.objects.values_list('review_id', 'value')), [(self.review.pk, -1)])
+        self.assertEqual(self.buffer.stats()['queue_depth'], 0)
+        self.assertCountersConsistent()
+
+    @override_settings(REVIEWS_VOTE_BUFFER_ENABLED=True)
+    def test_vote_view_uses_buffer(self):
+        self.client.force_login(self.users[1])
+        with mock.patch.object(vote_buffer, 'vote_buffer', self.buffer):
+            response = self.client.post('/vote-review/', {'review_id': self.review.pk, 'value': 1})
+            self.assertEqual(response.json()['likes_count'], 1)
+            self.assertTrue(response.json()['buffered'])
+            self.assertEqual(self.counters(self.review), (0, 0))
+
+            # رأی ذخیره نشده در صفحه استاد هم نمایش داده می‌شود
+            views._attach_user_votes(self.users[1], reviews=[self.review])
+            self.assertEqual(self.review.user_vote, 1)
+
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.counters(self.review), (1, 0))
+        self.assertCountersConsistent()
+
+    @override_settings(REVIEWS_VOTE_BUFFER_ENABLED=True)
+    def test_pages_show_pending_counters(self):
+        ReviewVote.objects.create(review=self.review, user=self.users[0], value=1)
+        self.buffer.toggle('review', self.review.pk, self.users[1].pk, 1)
+        self.buffer.toggle('review', self.review.pk, self.users[0].pk, -1)
+        self.buffer.toggle('answer', self.answer.pk, self.users[2].pk, -1)
+
+        self.client.force_login(self.users[1])
+        with mock.patch.object(vote_buffer, 'vote_buffer', self.buffer), \
+                mock.patch.object(self.buffer, 'pending_deltas', wraps=self.buffer.pending_deltas) as pending:
+            detail = self.client.get(f'/professor/{self.professor.pk}/')
+            tab = self.client.get(f'/professor/{self.professor.pk}/tab/questions/')
+        # یک فراخوانی برای همه موارد هر صفحه
+        self.assertEqual(pending.call_count, 2)
+
+        # پایگاه‌داده: یک لایک؛ بافر: لایک جدید و تبدیل لایک قبلی به دیس‌لایک
+        self.assertContains(detail, f'<span id="review-{self.review.pk}-likes">1</span>')
+        self.assertContains(detail, f'<span id="review-{self.review.pk}-dislikes">1</span>')
+        self.assertContains(tab, f'<span id="answer-{self.answer.pk}-likes">0</span>')
+        self.assertContains(tab, f'<span id="answer-{self.answer.pk}-dislikes">1</span>')
+        self.assertEqual(self.counters(self.review), (1, 0))
+
+
+class FixDailyLimitsTests(TestCase):
+    """دستور fix_limits: تطبیق شمارنده‌های UserDailyLimit با محتوای ثبت شده"""
+
+    def setUp(self):
+        self.first = User.objects.create_user('first')
+        self.second = User.objects.create_user('second')
+        self.professor = Professor.objects.create(name='دکتر تست', department='کامپیوتر')
+        today = timezone.localdate()
+        self.days = [today - datetime.timedelta(days=offset) for offset in (3, 2, 1)]
+        day0, day1, day2 = self.days
+        for user, day, model in (
+            (self.first, day0, Review), (self.first, day0, Review), (self.first, day1, Review),
+            (self.first, day1, Question), (self.second, day2, Review),
+        ):
+            self._create(user, day, model)
+        for user, day, review_count, question_count in (
+            (self.first, day0, 5, 0),    # نظر بیش از واقع: 5 ← 2
+            (self.first, day1, 1, 0),    # پرسش شمرده نشده: 0 ← 1
+            (self.first, day2, 0, 0),    # درست
+            (self.second, day0, 0, 2),   # شمارنده بدون محتوا: 2 ← 0
+            (self.second, day2, 1, 0),   # درست
+        ):
+            UserDailyLimit.objects.create(
+                user=user, date=day, review_count=review_count, question_count=question_count
+            )
+
+    def _create(self, user, day, model):
+        # ۰۰:۳۰ به وقت تهران که در UTC هنوز روز قبل است
+        moment = timezone.make_aware(datetime.datetime.combine(day, datetime.time(0, 30)))
+        if model is Review:
+            instance = Review.objects.create(professor=self.professor, user=user, rating=4, text=f'نظر {day}')
+        else:
+            instance = Question.objects.create(professor=self.professor, user=user, text=f'پرسش {day}')
+        model.objects.filter(pk=instance.pk).update(created_at=moment, local_date=day)
+
+    def rows(self):
+        return list(UserDailyLimit.objects.order_by('pk').values_list('user_id', 'date', 'review_count', 'question_count'))
+
+    def per_row_rows(self, since=None):
+        """نتیجه منطق قبلی: شمارش جداگانه برای هر رکورد با created_at__date"""
+        expected = []
+        for daily_limit in UserDailyLimit.objects.order_by('pk'):
+            if since and daily_limit.date < since:
+                expected.append((daily_limit.user_id, daily_limit.date, daily_limit.review_count, daily_limit.question_count))
+                continue
+            expected.append((
+                daily_limit.user_id, daily_limit.date,
+                Review.objects.filter(user_id=daily_limit.user_id, created_at__date=daily_limit.date).count(),
+                Question.objects.filter(user_id=daily_limit.user_id, created_at__date=daily_limit.date).count(),
+            ))
+        return expected
+
+    def call(self, *args):
+        stdout = io.StringIO()
+        call_command('fix_limits', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_matches_per_row_reconciliation(self):
+        expected = self.per_row_rows()
+        self.assertNotEqual(self.rows(), expected)
+        output = self.call()
+        self.assertEqual(self.rows(), expected)
+        self.assertIn('3 رکورد (1 شمارنده نظر و 2 شمارنده پرسش)', output)
+        # اجرای دوباره چیزی برای اصلاح ندارد
+        self.assertEqual(fix_current_daily_limits(), [])
+
+    def test_dry_run_writes_nothing(self):
+        before = self.rows()
+        with CaptureQueriesContext(connection) as context:
+            output = self.call('--dry-run')
+        self.assertEqual(self.rows(), before)
+        self.assertFalse([query['sql'] for query in context.captured_queries if not query['sql'].startswith('SELECT')])
+        self.assertIn('اجرای آزمایشی: 3 رکورد', output)
+
+    def test_since_limits_the_range(self):
+        expected = self.per_row_rows(since=self.days[1])
+        self.call('--since', self.days[1].isoformat())
+        self.assertEqual(self.rows(), expected)
+        # رکوردهای پیش از since دست نخورده‌اند
+        self.assertIn((self.first.pk, self.days[0], 5, 0), self.rows())
+
+    def test_chunk_size_does_not_change_result(self):
+        expected = self.per_row_rows()
+        calls = []
+        corrections = fix_current_daily_limits(chunk_size=2, progress=lambda *args: calls.append(args))
+        self.assertEqual(self.rows(), expected)
+        self.assertEqual(calls, [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(len(corrections), 3)
+
+    def test_chunk_size_option_reports_progress(self):
+        expected = self.per_row_rows()
+        output = self.call('--chunk-size', '2')
+        self.assertEqual(self.rows(), expected)
+        self.assertEqual([line.strip() for line in output.splitlines() if 'بررسی شد' in line], [
+            '2/5 رکورد بررسی شد', '4/5 رکورد بررسی شد', '5/5 رکورد بررسی شد',
+        ])
+
+
+
+class AggregateConsistencyMixin:
+    """مقایسه شمارنده‌ها و آمارهای تجمیعی با ساخت مجدد آن‌ها از جدول‌های اصلی"""
+
+    def summary_snapshot(self):
+        columns = [
+            field.attname for field in ProfessorEvaluationSummary._meta.concrete_fields
+            if field.name not in ('version', 'updated_at')
+        ]
+        return [
+            tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+            for row in ProfessorEvaluationSummary.objects.order_by('pk').values_list(*columns)
+        ]
+
+    def assertAggregatesConsistent(self):
+        self.assertEqual(Professor.rebuild_rating_aggregates(), 0)
+        self.assertEqual(Review.rebuild_vote_counters(), 0)
+        self.assertEqual(Answer.rebuild_vote_counters(), 0)
+        summaries = self.summary_snapshot()
+        ProfessorEvaluationSummary.rebuild()
+        self.assertEqual(summaries, self.summary_snapshot())
+        self.assertEqual(fix_current_daily_limits(dry_run=True), [])
+
+
+
+class EvaluationSummaryTests(AggregateConsistencyMixin, TestCase):
+    """تغییرهای تدریجی (delta) آمار ارزیابی‌ها باید با rebuild برابر باشند"""
+
+    def setUp(self):
+        self.users = [User.objects.create_user(f'student{index}') for index in range(3)]
+        self.professors = [
+            Professor.objects.create(name=f'دکتر {index}', department='کامپیوتر') for index in range(3)
+        ]
+
+    def _evaluate(self, professor, user, days_ago=0, **scores):
+        # زمان‌های متفاوت تا وزن‌های کاهش‌یابنده هر ارزیابی متفاوت باشد
+        moment = timezone.now() - datetime.timedelta(days=days_ago)
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            return ProfessorEvaluation.objects.create(professor=professor, user=user, **scores)
+
+    def test_create_update_and_delete(self):
+        evaluation = self._evaluate(self.professors[0], self.users[0], 400, teaching_method=5, exam_difficulty=1)
+        self._evaluate(self.professors[0], self.users[1], 30, respect=2)
+        self.assertAggregatesConsistent()
+
+        evaluation.teaching_method = 2
+        evaluation.student_interaction = 4
+        evaluation.save()
+        self.assertAggregatesConsistent()
+
+        # انتقال ارزیابی به استاد دیگر
+        evaluation.professor = self.professors[1]
+        evaluation.save()
+        self.assertAggregatesConsistent()
+
+        evaluation.delete()
+        self.assertAggregatesConsistent()
+        self.assertEqual(ProfessorEvaluationSummary.objects.get(pk=self.professors[1].pk).evaluation_count, 0)
+
+    def test_grouped_delete_uses_case_for_decayed_columns(self):
+        for index, professor in enumerate(self.professors):
+            for user_index, user in enumerate(self.users):
+                self._evaluate(professor, user, 100 * index + 10 * user_index, teaching_method=user_index + 1)
+        self.assertAggregatesConsistent()
+
+        # تعداد و مجموع‌ها برای هر سه استاد یکسان است؛ وزن‌ها با CASE جدا اعمال می‌شوند
+        with CaptureQueriesContext(connection) as context:
+            ProfessorEvaluation.objects.filter(user__in=self.users[:2]).delete()
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1, updates)
+        self.assertIn('CASE', updates[0])
+        self.assertAggregatesConsistent()
+
+    def test_apply_deltas_matches_rebuild(self):
+        for index, professor in enumerate(self.professors):
+            self._evaluate(professor, self.users[0], 50 * index, respect=index + 1)
+        deltas = {}
+        for index, professor in enumerate(self.professors[:2]):
+            scores = {field: 3 for field in ProfessorEvaluation.PARAMETER_NAMES}
+            moment = timezone.now() - datetime.timedelta(days=200 * index)
+            with mock.patch('django.utils.timezone.now', return_value=moment):
+                ProfessorEvaluation.objects.bulk_create([
+                    ProfessorEvaluation(professor=professor, user=self.users[1], **scores)
+                ])
+            deltas[professor.pk] = ProfessorEvaluationSummary.evaluation_delta(scores, 1, moment)
+        ProfessorEvaluationSummary.apply_deltas(deltas)
+        self.assertAggregatesConsistent()
+
+
+class EvaluationSummaryApiTests(TestCase):
+    """api_evaluation_summaries: آمار چند استاد در یک پاسخ"""
+
+    URL = '/api/professors/evaluations/'
+
+    def setUp(self):
+        user = User.objects.create_user('student')
+        self.professors = [
+            Professor.objects.create(name=f'دکتر {index}', department='کامپیوتر') for index in range(3)
+        ]
+        for index, professor in enumerate(self.professors[:2]):
+            ProfessorEvaluation.objects.create(
+                professor=professor, user=user, **{field: index + 3 for field in ProfessorEvaluation.PARAMETER_NAMES}
+            )
+
+    def get(self, ids, **headers):
+        return self.client.get(self.URL, {'ids': ','.join(map(str, ids))}, headers=headers)
+
+    def test_unknown_and_unevaluated_ids_are_omitted(self):
+        response = self.get([self.professors[1].pk, self.professors[0].pk, self.professors[2].pk, 999999])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['params'], list(ProfessorEvaluation.PARAMETER_NAMES))
+        self.assertEqual(data['professors'], [
+            [self.professors[0].pk, 1, *[3.0] * 6],
+            [self.professors[1].pk, 1, *[4.0] * 6],
+        ])
+
+    def test_id_limit(self):
+        self.assertEqual(self.get(range(1, views.EVALUATION_BATCH_MAX_IDS + 1)).status_code, 200)
+        response = self.get(range(1, views.EVALUATION_BATCH_MAX_IDS + 2))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(self.client.get(self.URL, {'ids': '1,x'}).status_code, 400)
+
+    def test_not_modified(self):
+        ids = [professor.pk for professor in self.professors]
+        etag = self.get(ids)['ETag']
+        for header in (etag, f'"other", {etag}', f'W/{etag}', '*'):
+            response = self.get(ids, if_none_match=header)
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(ids, if_none_match='"evaluations-stale"').status_code, 200)
+
+        # ارزیابی جدید نسخه آمار و در نتیجه ETag را تغییر می‌دهد
+        ProfessorEvaluation.objects.create(professor=self.professors[2], user=User.objects.create_user('other'))
+        response = self.get(ids, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def chart(self, professor_id, **headers):
+        return self.client.get(f'/professor/{professor_id}/chart-data/', headers=headers)
+
+    def test_chart_data_validators(self):
+        professor = self.professors[0]
+        summary = ProfessorEvaluationSummary.objects.get(pk=professor.pk)
+        etag = f'"evaluation-{professor.pk}-{summary.version}"'
+        last_modified = http_date(int(summary.updated_at.timestamp()))
+
+        response = self.chart(professor.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['has_data'])
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response['Last-Modified'], last_modified)
+        self.assertEqual(response['Cache-Control'], 'max-age=60')
+
+        for headers in ({'if_none_match': etag}, {'if_modified_since': last_modified}):
+            response = self.chart(professor.pk, **headers)
+            self.assertEqual(response.status_code, 304, headers)
+            self.assertEqual(response.content, b'')
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(response['Last-Modified'], last_modified)
+            self.assertEqual(response['Cache-Control'], 'max-age=60')
+
+        # تغییر ارزیابی نسخه آمار و در نتیجه ETag را تغییر می‌دهد
+        evaluation = ProfessorEvaluation.objects.get(professor=professor)
+        evaluation.respect = 1
+        evaluation.save()
+        response = self.chart(professor.pk, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"evaluation-{professor.pk}-{summary.version + 1}"')
+        self.assertEqual(response.json()['total_evaluations'], 1)
+
+    def test_chart_data_without_evaluations(self):
+        professor = self.professors[2]
+        self.assertFalse(ProfessorEvaluationSummary.objects.filter(pk=professor.pk).exists())
+        response = self.chart(professor.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['has_data'])
+        self.assertEqual(response['ETag'], f'"evaluation-{professor.pk}-0"')
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertEqual(self.chart(professor.pk, if_none_match=response['ETag']).status_code, 304)
+        self.assertEqual(self.chart(999999).status_code, 404)
+
+
+class DecayedScoreTests(AggregateConsistencyMixin, TestCase):
+    """مجموع‌های وزنی (forward decay) تدریجی باید با ساخت مجدد برابر باشند"""
+
+    AGES = (0, 200, 400, 800)
+
+    def setUp(self):
+        self.users = [User.objects.create_user(f'student{index}') for index in range(len(self.AGES))]
+        self.professor = Professor.objects.create(name='دکتر تست', department='کامپیوتر')
+        self.reviews, self.evaluations = [], []
+        for index, (user, days) in enumerate(zip(self.users, self.AGES)):
+            with mock.patch('django.utils.timezone.now', return_value=timezone.now() - datetime.timedelta(days=days)):
+                self.reviews.append(Review.objects.create(
+                    professor=self.professor, user=user, rating=index + 2, text='نظر'
+                ))
+                self.evaluations.append(ProfessorEvaluation.objects.create(
+                    professor=self.professor, user=user, teaching_method=index + 2
+                ))
+
+    def expected_rating(self, reviews):
+        weights = [decay.weight(review.created_at) for review in reviews]
+        return sum(review.rating * weight for review, weight in zip(reviews, weights)), sum(weights)
+
+    def assertDecayedRating(self, reviews):
+        self.professor.refresh_from_db()
+        decayed_sum, decayed_weight = self.expected_rating(reviews)
+        self.assertAlmostEqual(self.professor.rating_decayed_sum, decayed_sum, delta=1e-9 * max(decayed_sum, 1))
+        self.assertAlmostEqual(self.professor.rating_decayed_weight, decayed_weight, delta=1e-9 * max(decayed_weight, 1))
+        self.assertAggregatesConsistent()
+
+    def test_review_approve_unapprove_and_delete(self):
+        review_admin = ReviewAdmin(Review, admin.site)
+        self.assertDecayedRating([])
+        review_admin._set_approval(Review.objects.all(), True)
+        self.assertDecayedRating(self.reviews)
+        # نظرهای جدیدتر وزن بیشتری دارند: میانگین وزنی از میانگین ساده کمتر است
+        self.assertLess(self.professor.decayed_rating, self.professor.rating_avg)
+
+        review_admin._set_approval(Review.objects.filter(pk=self.reviews[0].pk), False)
+        self.assertDecayedRating(self.reviews[1:])
+        Review.objects.get(pk=self.reviews[2].pk).delete()
+        self.assertDecayedRating([self.reviews[1], self.reviews[3]])
+        Review.objects.filter(pk__in=[self.reviews[1].pk, self.reviews[3].pk]).delete()
+        self.assertDecayedRating([])
+
+    def test_evaluation_create_update_and_delete(self):
+        summary = ProfessorEvaluationSummary.objects.get(pk=self.professor.pk)
+        weights = [decay.weight(evaluation.created_at) for evaluation in self.evaluations]
+        self.assertAlmostEqual(summary.decayed_weight, sum(weights), delta=1e-9 * sum(weights))
+        self.assertAggregatesConsistent()
+
+        evaluation = self.evaluations[3]
+        evaluation.teaching_method = 1
+        evaluation.save()
+        self.assertAggregatesConsistent()
+        self.evaluations[0].delete()
+        self.assertAggregatesConsistent()
+        ProfessorEvaluation.objects.filter(pk__in=[item.pk for item in self.evaluations[1:3]]).delete()
+        self.assertAggregatesConsistent()
+
+    def test_migration_backfill_matches_rebuild(self):
+        # کپی ثابت تابع وزن در مهاجرت با reviews/decay.py یکسان است
+        migration = importlib.import_module('reviews.migrations.0029_decayed_scores')
+        ReviewAdmin(Review, admin.site)._set_approval(Review.objects.filter(pk__in=[r.pk for r in self.reviews[1:]]), True)
+        Professor.objects.update(rating_decayed_sum=0, rating_decayed_weight=0)
+        ProfessorEvaluationSummary.objects.update(**dict.fromkeys(ProfessorEvaluationSummary.DECAYED_COLUMNS, 0))
+
+        migration.backfill_decayed_scores(django_apps, None)
+        self.assertDecayedRating(self.reviews[1:])
+
+
+class DeletionCounterTests(AggregateConsistencyMixin, TestCase):
+    """کاهش شمارنده‌ها هنگام حذف (_DeletionBatch و گیرنده‌های pre/post_delete)"""
+
+    def setUp(self):
+        quotas._cache().clear()
+        self.author, self.other, self.voter = (User.objects.create_user(name) for name in ('author', 'other', 'voter'))
+        self.professors = [
+            Professor.objects.create(name=f'دکتر {index}', department='کامپیوتر') for index in range(2)
+        ]
+        self.reviews = {}
+        for user in (self.author, self.other):
+            for professor in self.professors:
+                self.reviews[user, professor] = self._review(user, professor)
+        for review in self.reviews.values():
+            for voter, value in ((self.author, 1), (self.other, -1), (self.voter, 1)):
+                if voter != review.user:
+                    ReviewVote.objects.create(review=review, user=voter, value=value)
+        self.question = Question.objects.create(
+            professor=self.professors[0], user=self.other, text='پرسش درباره درس', is_approved=True
+        )
+        UserDailyLimit.record_usage(self.other, 'question_count', self.question.local_date)
+        self.answers = [
+            Answer.objects.create(question=self.question, user=user, text='پاسخ', is_approved=True)
+            for user in (self.author, self.other)
+        ]
+        for answer in self.answers:
+            AnswerVote.objects.create(answer=answer, user=self.voter, value=1)
+            AnswerVote.objects.create(answer=answer, user=self.author, value=-1)
+        for user, professor, score in ((self.author, self.professors[0], 5), (self.other, self.professors[0], 2),
+                                       (self.author, self.professors[1], 4)):
+            ProfessorEvaluation.objects.create(
+                professor=professor, user=user,
+                **{field: score for field in ProfessorEvaluation.PARAMETER_NAMES},
+            )
+        Professor.rebuild_rating_aggregates()
+        self.assertAggregatesConsistent()
+
+    def _review(self, user, professor):
+        review = Review.objects.create(professor=professor, user=user, rating=4, text='نظر تأیید شده', is_approved=True)
+        UserDailyLimit.record_usage(user, 'review_count', review.local_date)
+        return review
+
+    def test_user_delete(self):
+        with CaptureQueriesContext(connection) as context:
+            self.author.delete()
+        self.assertAggregatesConsistent()
+        self.assertEqual(ProfessorEvaluationSummary.objects.get(pk=self.professors[0].pk).evaluation_count, 1)
+        # UPDATE های گروهی: تعداد کوئری به تعداد ردیف‌های حذف شده بستگی ندارد
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 5, updates)
+        self.assertEqual(len(context.captured_queries), 23)
+
+    def test_queryset_delete(self):
+        with CaptureQueriesContext(connection) as context:
+            Review.objects.filter(professor=self.professors[0]).delete()
+        self.assertAggregatesConsistent()
+        self.assertEqual(Professor.objects.get(pk=self.professors[0].pk).rating_count, 0)
+        # رأی‌های نظرهای حذف شده شمارنده‌ای برای به‌روزرسانی ندارند: سهمیه روزانه و امتیاز استاد
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2, updates)
+
+    def test_professor_and_question_cascade(self):
+        self.question.delete()
+        self.assertAggregatesConsistent()
+        self.professors[1].delete()
+        self.assertAggregatesConsistent()
+
+    def test_nested_delete_inside_receiver(self):
+        answer = self.answers[0]
+
+        def delete_answer(sender, instance, **kwargs):
+            # حذف دیگری وسط عملیات بیرونی، بعد از اولین رأی و پیش از بقیه رأی‌ها
+            if Answer.objects.filter(pk=answer.pk).exists():
+                Answer.objects.filter(pk=answer.pk).delete()
+
+        post_delete.connect(delete_answer, sender=ReviewVote)
+        self.addCleanup(post_delete.disconnect, delete_answer, sender=ReviewVote)
+        ReviewVote.objects.filter(user=self.voter).delete()
+        self.assertFalse(Answer.objects.filter(pk=answer.pk).exists())
+        self.assertAggregatesConsistent()
+
+    def test_aborted_delete_then_retry(self):
+        review = self.reviews[self.author, self.professors[0]]
+
+        def fail(sender, instance, **kwargs):
+            raise RuntimeError('delete aborted')
+
+        for signal in (pre_delete, post_delete):
+            signal.connect(fail, sender=ReviewVote)
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    review.delete()
+            signal.disconnect(fail, sender=ReviewVote)
+            self.assertAggregatesConsistent()
+
+        # حذف دوباره همان نمونه (همان origin) پس از دو حذف ناتمام
+        review.delete()
+        self.assertAggregatesConsistent()
+        self.reviews[self.other, self.professors[0]].delete()
+        self.assertAggregatesConsistent()
+
+
+
+class DataMigrationTests(TestCase):
+    """توابع RunPython مهاجرت‌ها روی داده‌های موجود"""
+
+    def test_local_date_backfill(self):
+        migration = importlib.import_module('reviews.migrations.0025_local_date')
+        user = User.objects.create_user('student')
+        professor = Professor.objects.create(name='دکتر تست', department='کامپیوتر')
+        day = datetime.date(2026, 3, 21)
+        # ۰۰:۳۰ به وقت تهران که در UTC هنوز روز قبل است
+        moment = timezone.make_aware(datetime.datetime.combine(day, datetime.time(0, 30)))
+        review = Review.objects.create(professor=professor, user=user, rating=4, text='نظر قدیمی')
+        question = Question.objects.create(professor=professor, user=user, text='پرسش قدیمی')
+        answer = Answer.objects.create(question=question, user=user, text='پاسخ قدیمی')
+        for instance in (review, question, answer):
+            type(instance).objects.filter(pk=instance.pk).update(created_at=moment, local_date=moment.date())
+        self.assertEqual(moment.astimezone(datetime.timezone.utc).date(), day - datetime.timedelta(days=1))
+
+        migration.backfill_local_date(django_apps, None)
+        for instance in (review, question, answer):
+            instance.refresh_from_db()
+            self.assertEqual(instance.local_date, day)
+
+    def test_normalized_columns_backfill(self):
+        migration = importlib.import_module('reviews.migrations.0021_professor_normalized_columns')
+        professor = Professor.objects.create(name='علي رحيم\u200cپور', department='مهندسي كامپيوتر')
+        Professor.objects.filter(pk=professor.pk).update(name_normalized='', department_normalized='')
+
+        migration.backfill_normalized_columns(django_apps, connection.schema_editor())
+        professor.refresh_from_db()
+        self.assertEqual(professor.name_normalized, normalize_text(professor.name))
+        self.assertEqual(professor.department_normalized, 'مهندسی کامپیوتر')
+        self.assertEqual(list(search.matching_professor_ids('رحیم پور')), [professor.pk])
+
+    def test_daily_limit_date_is_local(self):
+        user = User.objects.create_user('student')
+        # ۲۲:۰۰ UTC برابر ۰۱:۳۰ روز بعد به وقت تهران است
+        moment = datetime.datetime(2026, 3, 20, 22, 0, tzinfo=datetime.timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            daily_limit = UserDailyLimit.objects.create(user=user)
+        self.assertEqual(daily_limit.date, datetime.date(2026, 3, 21))
+
+
+
+class PercentileRankTests(TestCase):
+    """رتبه درصدی اساتید در دانشکده (reviews.ranking)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('student')
+
+    def _professor(self, department, rating=None, **scores):
+        professor = Professor.objects.create(name=f'دکتر {Professor.objects.count()}', department=department)
+        if rating:
+            Review.objects.create(professor=professor, user=self.user, rating=rating, text='نظر', is_approved=True)
+        if scores:
+            ProfessorEvaluation.objects.create(professor=professor, user=self.user, **scores)
+        return professor
+
+    def rank_rows(self):
+        fields = [field.attname for field in ProfessorRank._meta.concrete_fields if field.name != 'computed_at']
+        return list(ProfessorRank.objects.order_by('pk').values_list(*fields))
+
+    def percents(self, professors, field='rating'):
+        ranks = ProfessorRank.objects.in_bulk([professor.pk for professor in professors])
+        return [getattr(ranks[professor.pk], f'{field}_top_percent') for professor in professors]
+
+    def test_top_percents_ties_and_small_groups(self):
+        groups = np.array([0, 0, 0, 0, 1, 1, 0, 2, 2, 2])
+        scores = np.array([5, 4, 4, 3, 5, 1, 9, 2, 2, 2], dtype=float)
+        valid = np.array([True] * 6 + [False] + [True] * 3)
+        # امتیازهای برابر رتبه یکسان می‌گیرند؛ گروه با کمتر از MIN_PEERS عضو معتبر رتبه ندارد
+        self.assertEqual(ranking.top_percents(groups, scores, valid).tolist(), [25, 50, 50, 100, 0, 0, 0, 34, 34, 34])
+        self.assertEqual(ranking.top_percents(groups, scores, np.zeros(10, dtype=bool)).tolist(), [0] * 10)
+
+    def test_department_ranks(self):
+        computer = [self._professor('کامپیوتر', rating) for rating in (5, 4, 4, 2)]
+        unrated = self._professor('کامپيوتر')
+        alone = self._professor('ریاضی', 5)
+
+        self.assertEqual(ranking.refresh_ranks(full=True), (2, 6))
+        self.assertEqual(self.percents(computer), [25, 50, 50, 100])
+        # بدون امتیاز یا در دانشکده تک‌نفره: ردیف ذخیره می‌شود ولی رتبه‌ای ندارد
+        self.assertEqual(self.percents([unrated, alone]), [None, None])
+        self.assertEqual(ProfessorRank.objects.get(pk=unrated.pk).department_size, 5)
+        self.assertEqual(ProfessorRank.objects.get(pk=alone.pk).department_size, 1)
+
+    def test_lower_exam_difficulty_ranks_higher(self):
+        professors = [
+            self._professor('کامپیوتر', teaching_method=score, exam_difficulty=score) for score in (1, 3, 5)
+        ]
+        ranking.refresh_ranks(full=True)
+        self.assertEqual(self.percents(professors, 'teaching_method'), [100, 67, 34])
+        self.assertEqual(self.percents(professors, 'exam_difficulty'), [34, 67, 100])
+
+    def test_incremental_refresh_matches_full(self):
+        computer = [self._professor('کامپیوتر', rating) for rating in (5, 4, 3)]
+        math = [self._professor('ریاضی', rating) for rating in (5, 4, 3, 2)]
+        physics = [self._professor('فیزیک', rating, respect=rating) for rating in (5, 4, 3)]
+        self._professor('شیمی', 4)
+        ranking.refresh_ranks(full=True)
+        self.assertEqual(ranking.refresh_ranks(), (0, 0))
+
+        # امتیاز جدید، جابه‌جایی دانشکده، حذف استاد و ارزیابی جدید
+        Review.objects.create(professor=computer[2], user=User.objects.create_user('other'), rating=5,
+                              text='نظر جدید', is_approved=True)
+        math[0].refresh_from_db()
+        math[0].department = 'کامپیوتر'
+        math[0].save()
+        math[3].delete()
+        ProfessorEvaluation.objects.create(professor=physics[2], user=User.objects.create_user('third'), respect=5)
+
+        self.assertEqual(ranking.refresh_ranks(), (3, 9))
+        incremental = self.rank_rows()
+        ranking.refresh_ranks(full=True)
+        self.assertEqual(incremental, self.rank_rows())
+        self.assertEqual(self.percents(computer + math[:1]), [25, 75, 75, 25])
+        self.assertEqual(self.percents(math[1:3]), [None, None])
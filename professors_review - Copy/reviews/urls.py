@@ -7,19 +7,26 @@ app_name = 'reviews'
 urlpatterns = [
     # صفحه اصلی و لیست اساتید
     path('', views.home, name='home'),
+    path('professors/page/', views.professor_page, name='professor_page'),
     
     # صفحه پروفایل استاد (حالا شامل ارزیابی و نمودار هم می‌شود)
     path('professor/<int:pk>/', views.professor_detail, name='professor_detail'),
+    path('professor/<int:pk>/reviews/', views.professor_reviews, name='professor_reviews'),
+    path('professor/<int:pk>/tab/<str:tab>/', views.professor_tab, name='professor_tab'),
     
     # دریافت داده‌های نمودار ارزیابی (جدید)
     path('professor/<int:professor_id>/chart-data/', views.get_evaluation_chart_data, name='evaluation_chart_data'),
+    path('api/professors/evaluations/', views.api_evaluation_summaries, name='api_evaluation_summaries'),
     
     # سیستم رأی‌دهی
     path('vote-review/', views.vote_review, name='vote_review'),
     path('vote-answer/', views.vote_answer_ajax, name='vote_answer_ajax'),
+    path('vote-batch/', views.vote_batch, name='vote_batch'),
+    path('vote-buffer/stats/', views.vote_buffer_stats, name='vote_buffer_stats'),
     
     # جستجوی زنده
     path('live-search/', views.live_search_professors, name='live_search'),
+    path('api/professors/search/', views.api_search_professors, name='api_search_professors'),
     
     # آمار روزانه کاربر
     path('daily-stats/', views.user_daily_stats, name='user_daily_stats'),
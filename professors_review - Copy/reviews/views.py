@@ -1,25 +1,28 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.contrib.auth import login, authenticate
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Count
-from django.http import JsonResponse, HttpResponseRedirect
+from django.db import transaction
+from django.db.models import Q, Count, Prefetch
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseRedirect
 from django.template.loader import render_to_string
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.views.decorators.csrf import csrf_protect
-import datetime
+import hashlib
 import json
 import logging
+from urllib.parse import urlencode
 
-from .models import Professor, Review, Question, Answer, AnswerVote, ReviewVote, UserDailyLimit, ProfessorEvaluation
+from .models import (
+    Professor, Review, Question, Answer, AnswerVote, ReviewVote,
+    ProfessorEvaluation, ProfessorEvaluationSummary, ProfessorRank,
+)
 from .forms import ReviewForm, QuestionForm, AnswerForm, SignUpForm, ProfessorSearchForm, LoginForm, ProfessorEvaluationForm
-
-# =========================
-# ثابت‌های سیستم
-# =========================
-DAILY_REVIEW_LIMIT = 3
-DAILY_QUESTION_LIMIT = 3
+from . import fuzzy, pagination, quotas, search, vote_buffer, votes
 
 # =========================
 # Setup logging
@@ -29,42 +32,91 @@ logger = logging.getLogger(__name__)
 # =========================
 # Helper Functions
 # =========================
-def check_daily_limit(user, limit_type):
-    """بررسی محدودیت روزانه کاربر"""
-    try:
-        daily_limit = UserDailyLimit.get_or_create_today(user)
-        
-        if limit_type == 'review':
-            if not daily_limit.can_post_review:
-                return False, f"شما امروز {DAILY_REVIEW_LIMIT} نظر ارسال کرده‌اید. فردا مجدد تلاش کنید."
-            return True, "مجاز"
-        
-        elif limit_type == 'question':
-            if not daily_limit.can_post_question:
-                return False, f"شما امروز {DAILY_QUESTION_LIMIT} پرسش ارسال کرده‌اید. فردا مجدد تلاش کنید."
-            return True, "مجاز"
-        
-    except Exception as e:
-        logger.error(f"خطا در بررسی محدودیت روزانه کاربر {user.id}: {e}")
-        return False, "خطا در سیستم. لطفاً با پشتیبانی تماس بگیرید."
+def _post_with_quota(user, action, duplicates, create):
+    """ثبت محتوا پس از رزرو سهمیه کاربر
+
+    بررسی تکراری بودن، رزرو سهمیه، درج محتوا و ثبت سابقه در یک تراکنش انجام
+    می‌شوند. خروجی False یعنی سهمیه پر شده و None یعنی محتوای تکراری. اگر
+    ذخیره محتوا خطا بدهد رزرو سهمیه همان لحظه و اگر تراکنش بیرونی rollback شود
+    در پایان درخواست برگردانده می‌شود (quotas.release_uncommitted).
+    """
+    with transaction.atomic():
+        if duplicates.exists():
+            return None
+        if not quotas.claim(user, action):
+            return False
+        try:
+            create()
+            quotas.record(user, action)
+        except Exception:
+            quotas.release(user.pk, action)
+            raise
+    return True
 
 
 # =========================
 # Home + Search
 # =========================
-def home(request):
+PROFESSOR_ORDERINGS = {
+    'name': ('name', 'id'),
+    'rating': ('-rating_avg', 'id'),
+}
+
+
+def _professor_page(request):
+    """یک صفحه از اساتید بر اساس پارامترهای query، sort و cursor"""
     query = request.GET.get('query', '').strip()
-    professors = Professor.objects.all()
-    if query:
-        professors = professors.filter(
-            Q(name__icontains=query) | Q(department__icontains=query)
+    sort = request.GET.get('sort', '')
+    cursor = request.GET.get('cursor')
+    professors = Professor.objects.for_listing()
+
+    if query and sort not in PROFESSOR_ORDERINGS:
+        # بدون ترتیب مشخص، نتایج جستجو به ترتیب ارتباط نمایش داده می‌شوند؛ فقط
+        # SEARCH_RESULT_LIMIT نتیجه اول رتبه‌بندی و قطع شدن فهرست اعلام می‌شود
+        sort = 'relevance'
+        ids = search.matching_professor_ids(query, search.SEARCH_RESULT_LIMIT + 1)
+        page = pagination.paginate_ids(
+            professors, ids[:search.SEARCH_RESULT_LIMIT], cursor,
+            truncated=len(ids) > search.SEARCH_RESULT_LIMIT
         )
+    else:
+        if sort not in PROFESSOR_ORDERINGS:
+            sort = 'name'
+        if query:
+            # ترتیب و cursor روی همه نتایج جستجو اعمال می‌شوند (بدون سقف)
+            professors = search.filter_professors(professors, query)
+        page = pagination.paginate(professors, PROFESSOR_ORDERINGS[sort], cursor)
+
+    next_query = None
+    if page.has_next:
+        params = {'sort': sort, 'cursor': page.next_cursor}
+        if query:
+            params['query'] = query
+        next_query = urlencode(params)
+    return page, query, sort, next_query
+
+
+def home(request):
+    page, query, sort, next_query = _professor_page(request)
     return render(request, 'reviews/home.html', {
-        'professors': professors,
-        'query': query
+        'professors': page,
+        'query': query,
+        'sort': sort,
+        'next_query': next_query,
     })
 
 
+def professor_page(request):
+    """صفحه‌های بعدی فهرست اساتید برای بارگذاری تدریجی (infinite scroll)"""
+    page, query, sort, next_query = _professor_page(request)
+    html = render_to_string(
+        'reviews/partials/professor_cards.html',
+        {'professors': page},
+        request=request
+    )
+    return JsonResponse({'html': html, 'next_query': next_query, 'truncated': page.truncated})
+
+
 # =========================
 # Signup
 # =========================
@@ -123,20 +175,20 @@ def custom_login(request):
 def search_professors(request):
     form = ProfessorSearchForm(request.GET or None)
     results = None
+    next_query = None
     
     if form.is_valid():
         query = form.cleaned_data['query']
         if query:
-            results = Professor.objects.filter(
-                Q(name__icontains=query) | Q(department__icontains=query)
-            )
+            results, query, sort, next_query = _professor_page(request)
         else:
             # اگر جستجو خالی بود، همه نتایج را نشان نده
             results = Professor.objects.none()
     
-    return render(request, 'reviews/search.html', {
+    return render(request, 'reviews/search_results.html', {
         'form': form,
-        'results': results
+        'results': results,
+        'next_query': next_query,
     })
 
 
@@ -145,31 +197,25 @@ def search_professors(request):
 # =========================
 def _handle_review_form(request, professor, review_form):
     """پردازش فرم نظر"""
-    can_post, limit_message = check_daily_limit(request.user, 'review')
-    
-    if not can_post:
-        return False, limit_message
-    
     if review_form.is_valid():
-        existing_review = Review.objects.filter(
+        duplicates = Review.objects.filter(
             user=request.user,
             professor=professor,
             text=review_form.cleaned_data['text'],
             rating=review_form.cleaned_data['rating'],
-            created_at__date=datetime.date.today()
-        ).first()
-        
-        if existing_review:
-            return False, 'این نظر قبلاً ثبت شده است.'
+            local_date=timezone.localdate()
+        )
         
         review = review_form.save(commit=False)
         review.professor = professor
         review.user = request.user
         review.is_approved = False
-        review.save()
-        
-        daily_limit = UserDailyLimit.get_or_create_today(request.user)
-        daily_limit.increment_review()
+
+        posted = _post_with_quota(request.user, 'review', duplicates, review.save)
+        if posted is None:
+            return False, 'این نظر قبلاً ثبت شده است.'
+        if not posted:
+            return False, f"شما امروز {quotas.limit_for(request.user, 'review')} نظر ارسال کرده‌اید. فردا مجدد تلاش کنید."
         
         return True, 'نظر شما ثبت شد و پس از تأیید نمایش داده می‌شود.'
     else:
@@ -178,30 +224,24 @@ def _handle_review_form(request, professor, review_form):
 
 def _handle_question_form(request, professor, question_form):
     """پردازش فرم پرسش"""
-    can_post, limit_message = check_daily_limit(request.user, 'question')
-    
-    if not can_post:
-        return False, limit_message
-    
     if question_form.is_valid():
-        existing_question = Question.objects.filter(
+        duplicates = Question.objects.filter(
             user=request.user,
             professor=professor,
             text=question_form.cleaned_data['text'],
-            created_at__date=datetime.date.today()
-        ).first()
-        
-        if existing_question:
-            return False, 'این پرسش قبلاً ثبت شده است.'
+            local_date=timezone.localdate()
+        )
         
         question = question_form.save(commit=False)
         question.professor = professor
         question.user = request.user
         question.is_approved = False
-        question.save()
-        
-        daily_limit = UserDailyLimit.get_or_create_today(request.user)
-        daily_limit.increment_question()
+
+        posted = _post_with_quota(request.user, 'question', duplicates, question.save)
+        if posted is None:
+            return False, 'این پرسش قبلاً ثبت شده است.'
+        if not posted:
+            return False, f"شما امروز {quotas.limit_for(request.user, 'question')} پرسش ارسال کرده‌اید. فردا مجدد تلاش کنید."
         
         return True, 'پرسش شما ثبت شد و پس از تأیید نمایش داده می‌شود.'
     else:
@@ -220,21 +260,23 @@ def _handle_answer_form(request, professor, answer_form):
         return False, 'پرسش مورد نظر یافت نشد.'
     
     if answer_form.is_valid():
-        existing_answer = Answer.objects.filter(
+        duplicates = Answer.objects.filter(
             user=request.user,
             question=question,
             text=answer_form.cleaned_data['text'],
-            created_at__date=datetime.date.today()
-        ).first()
-        
-        if existing_answer:
-            return False, 'این پاسخ قبلاً ثبت شده است.'
+            local_date=timezone.localdate()
+        )
         
         answer = answer_form.save(commit=False)
         answer.question = question
         answer.user = request.user
         answer.is_approved = False
-        answer.save()
+
+        posted = _post_with_quota(request.user, 'answer', duplicates, answer.save)
+        if posted is None:
+            return False, 'این پاسخ قبلاً ثبت شده است.'
+        if not posted:
+            return False, f"شما امروز {quotas.limit_for(request.user, 'answer')} پاسخ ارسال کرده‌اید. فردا مجدد تلاش کنید."
         return True, 'پاسخ شما ثبت شد و پس از تأیید نمایش داده می‌شود.'
     else:
         return False, 'لطفاً خطاهای فرم را اصلاح کنید.'
@@ -263,36 +305,103 @@ def _handle_evaluation_form(request, professor, user_evaluation, evaluation_form
 # =========================
 # Professor Detail
 # =========================
-@login_required
-def professor_detail(request, pk):
-    professor = get_object_or_404(Professor, pk=pk)
+REVIEW_ORDERING = ('-created_at', '-id')
+REVIEWS_PAGE_SIZE = 10
+
+
+def _attach_user_votes(user, reviews=(), answers=()):
+    """رأی کاربر (۱، ۱- یا None) روی نظرات و پاسخ‌های نمایش داده شده، با حداکثر دو کوئری IN
+
+    با بافر رأی فعال، رأی‌ها و تغییر شمارنده‌های ذخیره نشده هم روی موارد اعمال
+    می‌شوند تا صفحه با پاسخ خوش‌بینانه رأی‌دادن یکسان باشد.
+    """
+    buffered = vote_buffer.enabled()
+    for kind, vote_model, items in (('review', ReviewVote, reviews), ('answer', AnswerVote, answers)):
+        items = list(items)
+        if not items:
+            continue
+        ids = [item.pk for item in items]
+        votes = {}
+        if user.is_authenticated:
+            target = f'{vote_model.target_field}_id'
+            votes = dict(vote_model.objects.filter(
+                user=user, **{f'{target}__in': ids}
+            ).values_list(target, 'value'))
+            if buffered:
+                votes.update(vote_buffer.vote_buffer.user_votes(kind, user.pk, ids))
+        deltas = vote_buffer.vote_buffer.pending_deltas(kind, ids) if buffered else {}
+        for item in items:
+            item.user_vote = votes.get(item.pk)
+            delta = deltas.get(item.pk)
+            if delta:
+                item.likes += delta['likes']
+                item.dislikes += delta['dislikes']
+
+
+def _review_page(professor, user, cursor=None):
+    """یک صفحه از نظرات تأیید شده استاد، جدیدترین اول"""
+    reviews = Review.objects.filter(professor=professor, is_approved=True).select_related('user')
+    page = pagination.paginate(reviews, REVIEW_ORDERING, cursor, REVIEWS_PAGE_SIZE)
+    _attach_user_votes(user, reviews=page.items)
+    return page
+
+
+# تب‌های صفحه استاد؛ فقط تب فعال همراه صفحه رندر می‌شود و بقیه با professor_tab
+PROFESSOR_TABS = ('reviews', 'questions', 'evaluation')
+
+
+def _daily_limit_context(user):
+    """وضعیت سهمیه روزانه نظر و پرسش کاربر برای نمایش در فرم‌ها"""
+    return {
+        'review_limit': quotas.status(user, 'review'),
+        'question_limit': quotas.status(user, 'question'),
+    }
 
-    # استفاده از select_related و prefetch_related برای بهبود performance
-    reviews = Review.objects.filter(
-        professor=professor,
-        is_approved=True
-    ).select_related('user').prefetch_related('votes').order_by('-created_at')
 
-    questions = Question.objects.filter(
+def _professor_questions(professor, user):
+    """پرسش‌های تأیید شده استاد به همراه پاسخ‌های تأیید شده و رأی کاربر روی آن‌ها"""
+    approved_answers = Answer.objects.filter(is_approved=True).select_related('user')
+    questions = list(Question.objects.filter(
         professor=professor,
         is_approved=True
     ).select_related('user').prefetch_related(
-        'answers', 'answers__user', 'answers__votes'
-    ).order_by('-created_at')
+        Prefetch('answers', queryset=approved_answers, to_attr='answers_approved')
+    ).order_by('-created_at'))
+    _attach_user_votes(user, answers=[answer for question in questions for answer in question.answers_approved])
+    return questions
+
+
+def _percentile_rank(professor):
+    """رتبه درصدی استاد در دانشکده (محاسبه شده با rebuild_percentile_ranks) یا None"""
+    try:
+        return professor.percentile_rank
+    except ProfessorRank.DoesNotExist:
+        return None
+
 
-    for question in questions:
-        question.answers_approved = question.answers.filter(is_approved=True)
+@login_required
+def professor_detail(request, pk):
+    # رتبه درصدی در همان کوئری استاد خوانده می‌شود
+    professor = get_object_or_404(Professor.objects.for_listing().select_related('percentile_rank'), pk=pk)
+
+    active_tab = request.GET.get('tab')
+    if active_tab not in PROFESSOR_TABS:
+        active_tab = 'reviews'
+
+    # فقط صفحه اول نظرات؛ صفحات بعدی از professor_reviews بارگذاری می‌شوند
+    reviews = _review_page(professor, request.user)
 
     review_form = ReviewForm()
     question_form = QuestionForm()
     answer_form = AnswerForm()
     evaluation_form = ProfessorEvaluationForm()
     
-    # بررسی ارزیابی کاربر
+    # ارزیابی کاربر فقط برای تب ارزیابی (نمایش یا ارسال فرم آن) لازم است
     user_evaluation = None
-    user_evaluation = ProfessorEvaluation.get_user_evaluation(professor, request.user)
-    if user_evaluation:
-        evaluation_form = ProfessorEvaluationForm(instance=user_evaluation)
+    if active_tab == 'evaluation' or request.POST.get('form_type') == 'evaluation':
+        user_evaluation = ProfessorEvaluation.get_user_evaluation(professor, request.user)
+        if user_evaluation:
+            evaluation_form = ProfessorEvaluationForm(instance=user_evaluation)
 
     if request.method == 'POST':
         form_type = request.POST.get('form_type')
@@ -336,20 +445,6 @@ def professor_detail(request, pk):
             else:
                 messages.error(request, message)
 
-    # محاسبه محدودیت‌های روزانه
-    daily_limit = UserDailyLimit.get_or_create_today(request.user)
-    review_limit_info = {
-        'remaining': DAILY_REVIEW_LIMIT - daily_limit.review_count,
-        'total': DAILY_REVIEW_LIMIT,
-        'reached_limit': daily_limit.review_count >= DAILY_REVIEW_LIMIT
-    }
-    
-    question_limit_info = {
-        'remaining': DAILY_QUESTION_LIMIT - daily_limit.question_count,
-        'total': DAILY_QUESTION_LIMIT,
-        'reached_limit': daily_limit.question_count >= DAILY_QUESTION_LIMIT
-    }
-
     # محاسبه داده‌های نمودار
     chart_data = None
     has_evaluations = False
@@ -360,150 +455,174 @@ def professor_detail(request, pk):
     
     if evaluation_averages:
         has_evaluations = True
-        # محاسبه total_evaluations به صورت ایمن
-        evaluation_values = list(evaluation_averages.values())
-        if evaluation_values:
-            total_evaluations = evaluation_values[0]['count']
-        
-        # آماده‌سازی داده‌های نمودار
-        chart_data = {
-            'labels': [avg['name'] for avg in evaluation_averages.values()],
-            'averages': [avg['average'] for avg in evaluation_averages.values()],
-            'counts': [avg['count'] for avg in evaluation_averages.values()],
-            'max_value': 5,
-            'min_value': 1,
-            'total_evaluations': total_evaluations,
-        }
+        chart_data = {'has_data': True, **_evaluation_chart_data(evaluation_averages)}
+        total_evaluations = chart_data['total_evaluations']
 
     context = {
         'professor': professor,
+        'active_tab': active_tab,
         'reviews': reviews,
-        'questions': questions,
+        'questions': _professor_questions(professor, request.user) if active_tab == 'questions' else None,
         'review_form': review_form,
         'question_form': question_form,
         'answer_form': answer_form,
         'evaluation_form': evaluation_form,
         'user_evaluation': user_evaluation,
-        'review_limit': review_limit_info,
-        'question_limit': question_limit_info,
-        'DAILY_REVIEW_LIMIT': DAILY_REVIEW_LIMIT,
-        'DAILY_QUESTION_LIMIT': DAILY_QUESTION_LIMIT,
-        'chart_data_json': json.dumps(chart_data, ensure_ascii=False) if chart_data else '{}',
+        **_daily_limit_context(request.user),
+        'chart_data': chart_data,
         'has_evaluations': has_evaluations,
         'total_evaluations': total_evaluations,
+        'percentile_rank': _percentile_rank(professor),
     }
     
     return render(request, 'reviews/professor_detail.html', context)
 
 
 # =========================
-# Vote Review (AJAX)
+# Vote Review / Answer (AJAX)
 # =========================
-@login_required
-@csrf_protect
-def vote_review(request):
+VOTE_TARGETS = {
+    'review': Review,
+    'answer': Answer,
+}
+
+
+def _parse_vote_value(value):
+    try:
+        value = int(value)
+    except (ValueError, TypeError):
+        return None
+    return value if value in votes.VOTE_VALUES else None
+
+
+def _vote(request, kind, id_param):
+    """رأی به یک نظر یا پاسخ تأیید شده با منطق toggle"""
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    review_id = request.POST.get("review_id")
+    target_id = request.POST.get(id_param)
     value = request.POST.get("value")
     
-    if not review_id or not value:
+    if not target_id or not value:
         return JsonResponse({"error": "Missing parameters"}, status=400)
     
-    try:
-        value = int(value)
-        if value not in (1, -1):
-            return JsonResponse({"error": "Invalid value"}, status=400)
-    except (ValueError, TypeError):
-        return JsonResponse({"error": "Value must be integer"}, status=400)
+    value = _parse_vote_value(value)
+    if value is None:
+        return JsonResponse({"error": "Invalid value"}, status=400)
 
     try:
-        review = Review.objects.get(id=review_id, is_approved=True)
-    except Review.DoesNotExist:
-        return JsonResponse({"error": "Review not found or not approved"}, status=404)
-
-    vote, created = ReviewVote.objects.get_or_create(
-        review=review,
-        user=request.user,
-        defaults={"value": value}
-    )
+        target_id = int(target_id)
+    except ValueError:
+        return JsonResponse({"error": "Invalid id"}, status=400)
 
-    if not created and vote.value == value:
-        vote.delete()
-    else:
-        vote.value = value
-        vote.save()
+    if not VOTE_TARGETS[kind].objects.filter(id=target_id, is_approved=True).exists():
+        return JsonResponse({"error": f"{kind.capitalize()} not found or not approved"}, status=404)
 
-    likes_count = review.likes_count()
-    dislikes_count = review.dislikes_count()
+    if not quotas.claim(request.user, 'vote'):
+        return JsonResponse({"error": "Vote limit reached"}, status=429)
+
+    if vote_buffer.enabled():
+        user_vote, likes_count, dislikes_count = vote_buffer.vote_buffer.toggle(
+            kind, target_id, request.user.pk, value
+        )
+    else:
+        user_vote, likes_count, dislikes_count = votes.toggle_vote(kind, target_id, request.user.pk, value)
 
     return JsonResponse({
         "success": True,
         "likes_count": likes_count,
-        "dislikes_count": dislikes_count
+        "dislikes_count": dislikes_count,
+        "user_vote": user_vote,
+        "buffered": vote_buffer.enabled()
     })
 
 
-# =========================
-# Vote Answer (AJAX)
-# =========================
+@login_required
+@csrf_protect
+def vote_review(request):
+    return _vote(request, 'review', 'review_id')
+
+
 @login_required
 @csrf_protect
 def vote_answer_ajax(request):
+    return _vote(request, 'answer', 'answer_id')
+
+
+@login_required
+@csrf_protect
+def vote_batch(request):
+    """ثبت چند رأی در یک درخواست
+
+    بدنه JSON به شکل {"votes": [{"kind": "review", "id": 1, "value": 1}, ...]}
+    """
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
 
-    answer_id = request.POST.get("answer_id")
-    value = request.POST.get("value")
-    
-    if not answer_id or not value:
-        return JsonResponse({"error": "Missing parameters"}, status=400)
-    
-    try:
-        value = int(value)
-        if value not in (1, -1):
-            return JsonResponse({"error": "Invalid value"}, status=400)
-    except (ValueError, TypeError):
-        return JsonResponse({"error": "Value must be integer"}, status=400)
-
     try:
-        answer = Answer.objects.get(id=answer_id, is_approved=True)
-    except Answer.DoesNotExist:
-        return JsonResponse({"error": "Answer not found or not approved"}, status=404)
-
-    vote, created = AnswerVote.objects.get_or_create(
-        answer=answer,
-        user=request.user,
-        defaults={"value": value}
-    )
-
-    if not created and vote.value == value:
-        vote.delete()
+        items = json.loads(request.body)["votes"]
+        batch = [
+            (item["kind"], int(item["id"]), _parse_vote_value(item["value"]))
+            for item in items
+        ]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Invalid body"}, status=400)
+
+    if not batch or len(batch) > votes.MAX_BATCH_VOTES:
+        return JsonResponse({"error": f"Between 1 and {votes.MAX_BATCH_VOTES} votes are allowed"}, status=400)
+    if any(kind not in VOTE_TARGETS or value is None for kind, target_id, value in batch):
+        return JsonResponse({"error": "Invalid vote"}, status=400)
+
+    # همه موارد باید وجود داشته و تأیید شده باشند (یک کوئری برای هر نوع)
+    for kind, model in VOTE_TARGETS.items():
+        ids = {target_id for vote_kind, target_id, value in batch if vote_kind == kind}
+        if ids and model.objects.filter(id__in=ids, is_approved=True).count() != len(ids):
+            return JsonResponse({"error": f"{kind.capitalize()} not found or not approved"}, status=404)
+
+    if not quotas.claim(request.user, 'vote', len(batch)):
+        return JsonResponse({"error": "Vote limit reached"}, status=429)
+
+    if vote_buffer.enabled():
+        results = [
+            (kind, target_id, *vote_buffer.vote_buffer.toggle(kind, target_id, request.user.pk, value))
+            for kind, target_id, value in batch
+        ]
     else:
-        vote.value = value
-        vote.save()
-
-    likes_count = answer.likes_count()
-    dislikes_count = answer.dislikes_count()
+        results = votes.toggle_votes(request.user.pk, batch)
 
     return JsonResponse({
         "success": True,
-        "likes_count": likes_count,
-        "dislikes_count": dislikes_count
+        "results": [
+            {
+                "kind": kind,
+                "id": target_id,
+                "user_vote": user_vote,
+                "likes_count": likes_count,
+                "dislikes_count": dislikes_count,
+            }
+            for kind, target_id, user_vote, likes_count, dislikes_count in results
+        ],
+        "buffered": vote_buffer.enabled()
     })
 
 
+@staff_member_required
+def vote_buffer_stats(request):
+    """وضعیت بافر رأی‌ها: طول صف و زمان ذخیره دسته‌ها"""
+    return JsonResponse(vote_buffer.vote_buffer.stats())
+
+
 # =========================
 # Live Search
 # =========================
 def live_search_professors(request):
     query = request.GET.get('query', '').strip()
-    professors = Professor.objects.all()
+    professors = Professor.objects.for_listing()
     if query:
-        professors = professors.filter(
-            Q(name__icontains=query) | Q(department__icontains=query)
-        )[:10]  # محدود کردن نتایج برای performance
+        # تطبیق فازی در حافظه (با تحمل غلط تایپی) و سپس دریافت کارت‌ها با کلید اصلی
+        professors = search.in_id_order(professors, fuzzy.search_professor_ids(query, limit=10))
+    else:
+        professors = professors[:search.LIVE_SEARCH_LIMIT]
 
     html = render_to_string(
         'reviews/partials/professor_list.html',
@@ -513,6 +632,63 @@ def live_search_professors(request):
     return JsonResponse({'html': html})
 
 
+def api_search_professors(request):
+    """جستجوی زنده به صورت JSON با نتایج محدود و پشتیبانی از ETag"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = int(request.GET.get('limit', search.LIVE_SEARCH_LIMIT))
+    except ValueError:
+        limit = search.LIVE_SEARCH_LIMIT
+    limit = max(1, min(limit, search.LIVE_SEARCH_MAX_LIMIT))
+
+    body, etag = search.live_search(query, limit)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json; charset=utf-8')
+    response['ETag'] = etag
+    patch_cache_control(response, max_age=search.LIVE_SEARCH_CACHE_TTL)
+    return response
+
+
+@login_required
+def professor_tab(request, pk, tab):
+    """محتوای یک تب صفحه استاد که هنگام اولین نمایش تب بارگذاری می‌شود"""
+    professor = get_object_or_404(Professor, pk=pk)
+    context = {'professor': professor}
+
+    if tab == 'questions':
+        context.update(_daily_limit_context(request.user))
+        context.update({
+            'questions': _professor_questions(professor, request.user),
+            'question_form': QuestionForm(),
+            'answer_form': AnswerForm(),
+        })
+    elif tab == 'evaluation':
+        user_evaluation = ProfessorEvaluation.get_user_evaluation(professor, request.user)
+        context.update({
+            'user_evaluation': user_evaluation,
+            'evaluation_form': ProfessorEvaluationForm(instance=user_evaluation),
+        })
+    else:
+        raise Http404("تب نامعتبر")
+
+    return render(request, f'reviews/partials/professor_{tab}_tab.html', context)
+
+
+@login_required
+def professor_reviews(request, pk):
+    """صفحات بعدی نظرات یک استاد (دکمه «نظرات بیشتر»)"""
+    professor = get_object_or_404(Professor, pk=pk)
+    page = _review_page(professor, request.user, request.GET.get('cursor'))
+    html = render_to_string(
+        'reviews/partials/review_cards.html',
+        {'reviews': page},
+        request=request
+    )
+    return JsonResponse({'html': html, 'next_cursor': page.next_cursor})
+
+
 # =========================
 # User Daily Stats
 # =========================
@@ -520,15 +696,16 @@ def live_search_professors(request):
 def user_daily_stats(request):
     """نمایش آمار روزانه کاربر"""
     try:
-        daily_limit = UserDailyLimit.get_or_create_today(request.user)
+        review = quotas.status(request.user, 'review')
+        question = quotas.status(request.user, 'question')
         
         return JsonResponse({
             'success': True,
-            'review_count': daily_limit.review_count,
-            'question_count': daily_limit.question_count,
-            'review_remaining': DAILY_REVIEW_LIMIT - daily_limit.review_count,
-            'question_remaining': DAILY_QUESTION_LIMIT - daily_limit.question_count,
-            'date': daily_limit.date.isoformat()
+            'review_count': review['used'],
+            'question_count': question['used'],
+            'review_remaining': review['remaining'],
+            'question_remaining': question['remaining'],
+            'date': timezone.localdate().isoformat()
         })
     except Exception as e:
         logger.error(f"خطا در دریافت آمار روزانه کاربر {request.user.id}: {e}")
@@ -572,40 +749,100 @@ def delete_evaluation(request, pk):
 # =========================
 # Get Evaluation Chart Data (AJAX)
 # =========================
+CHART_DATA_MAX_AGE = 60  # ثانیه
+
+
+def _evaluation_chart_data(evaluation_averages):
+    """داده‌های نمودار با اندازه ثابت: میانگین، میانگین کاهش‌یابنده و هیستوگرام ۱ تا ۵ هر پارامتر"""
+    parameters = list(evaluation_averages.values())
+    return {
+        'labels': [avg['name'] for avg in parameters],
+        'averages': [avg['average'] for avg in parameters],
+        'decayed_averages': [avg['decayed_average'] for avg in parameters],
+        'counts': [avg['count'] for avg in parameters],
+        'histograms': [avg['histogram'] for avg in parameters],
+        'max_value': 5,
+        'min_value': 1,
+        'total_evaluations': parameters[0]['count'],
+    }
+
+
 def get_evaluation_chart_data(request, professor_id):
-    """دریافت داده‌های نمودار ارزیابی به صورت AJAX"""
+    """دریافت داده‌های نمودار ارزیابی به صورت AJAX
+
+    ETag از نسخه آمار ارزیابی استاد ساخته می‌شود و با If-None-Match یا
+    If-Modified-Since پاسخ 304 برگردانده می‌شود.
+    """
     try:
-        professor = get_object_or_404(Professor, pk=professor_id)
-        evaluation_averages = ProfessorEvaluation.get_professor_averages(professor)
-        
-        if not evaluation_averages:
-            return JsonResponse({
-                'success': True,
-                'has_data': False,
-                'message': 'هنوز ارزیابی‌ای برای این استاد ثبت نشده است.'
-            })
-        
-        # محاسبه ایمن total_evaluations
-        total_evaluations = 0
-        evaluation_values = list(evaluation_averages.values())
-        if evaluation_values:
-            total_evaluations = evaluation_values[0]['count']
-        
-        chart_data = {
-            'success': True,
-            'has_data': True,
-            'labels': [avg['name'] for avg in evaluation_averages.values()],
-            'averages': [avg['average'] for avg in evaluation_averages.values()],
-            'counts': [avg['count'] for avg in evaluation_averages.values()],
-            'max_value': 5,
-            'min_value': 1,
-            'total_evaluations': total_evaluations,
-        }
-        
-        return JsonResponse(chart_data)
+        summary = ProfessorEvaluationSummary.objects.filter(pk=professor_id).first()
+        if summary is None:
+            get_object_or_404(Professor, pk=professor_id)
+
+        etag = summary.etag if summary else f'"evaluation-{professor_id}-0"'
+        last_modified = int(summary.updated_at.timestamp()) if summary else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            evaluation_averages = summary.averages() if summary else None
+            if evaluation_averages:
+                response = JsonResponse({
+                    'success': True,
+                    'has_data': True,
+                    **_evaluation_chart_data(evaluation_averages),
+                })
+            else:
+                response = JsonResponse({
+                    'success': True,
+                    'has_data': False,
+                    'message': 'هنوز ارزیابی‌ای برای این استاد ثبت نشده است.'
+                })
+
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, max_age=CHART_DATA_MAX_AGE)
+        return response
+    except Http404:
+        raise
     except Exception as e:
         logger.error(f"خطا در دریافت داده‌های نمودار ارزیابی استاد {professor_id}: {e}")
         return JsonResponse({
             'success': False,
             'error': 'خطا در دریافت داده‌ها'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+EVALUATION_BATCH_MAX_IDS = 100
+
+
+def api_evaluation_summaries(request):
+    """میانگین ارزیابی چند استاد در یک پاسخ (برای نمودارهای کوچک کارت‌ها)
+
+    ?ids=1,2,3 ؛ ترتیب پارامترها یک بار در params و labels می‌آید و هر استاد
+    یک آرایه [شناسه، تعداد ارزیابی، میانگین‌ها به همان ترتیب] است. اساتید
+    بدون ارزیابی در خروجی نیستند.
+    """
+    try:
+        ids = sorted({int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip()})
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'شناسه نامعتبر است'}, status=400)
+    if len(ids) > EVALUATION_BATCH_MAX_IDS:
+        return JsonResponse({
+            'success': False,
+            'error': f'حداکثر {EVALUATION_BATCH_MAX_IDS} استاد در هر درخواست'
+        }, status=400)
+
+    rows = ProfessorEvaluationSummary.compact_rows(ids)
+    versions = ','.join(f'{pk}:{version}' for pk, version, count, averages in rows)
+    etag = '"evaluations-%s"' % hashlib.md5(versions.encode('ascii')).hexdigest()
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        body = json.dumps({
+            'params': list(ProfessorEvaluation.PARAMETER_NAMES),
+            'labels': list(ProfessorEvaluation.PARAMETER_NAMES.values()),
+            'professors': [[pk, count, *averages] for pk, version, count, averages in rows],
+        }, ensure_ascii=False, separators=(',', ':'))
+        response = HttpResponse(body, content_type='application/json; charset=utf-8')
+    response['ETag'] = etag
+    patch_cache_control(response, max_age=CHART_DATA_MAX_AGE)
+    return response
\ No newline at end of file
@@ -0,0 +1,285 @@
+"""
+بافر رأی‌ها (write-behind)
+
+در زمان اوج (مثلاً فصل امتحانات) چند نظر پربازدید رأی‌های زیادی می‌گیرند و هر
+رأی یک تراکنش نوشتنی جداگانه است؛ در SQLite همه این تراکنش‌ها پشت یک قفل نوشتن
+صف می‌کشند. با فعال کردن REVIEWS_VOTE_BUFFER_ENABLED رأی‌ها در حافظه پروسه جمع
+می‌شوند، تغییرهای پشت سر هم یک کاربر روی یک مورد با هم ادغام می‌شوند و هر چند
+لحظه همه در یک تراکنش ذخیره می‌شوند. پاسخ رأی بلافاصله با شمارنده‌های
+خوش‌بینانه (مقدار پایگاه‌داده + تغییرات ذخیره نشده) برگردانده می‌شود.
+
+رأی‌های بافر شده تا ذخیره بعدی فقط در حافظه همین پروسه هستند؛ در صورت توقف
+ناگهانی پروسه از بین می‌روند و شمارنده‌ها با reconcile_vote_counters قابل
+اصلاح هستند.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .votes import VOTE_MODELS
+
+logger = logging.getLogger(__name__)
+
+
+def enabled():
+    return getattr(settings, 'REVIEWS_VOTE_BUFFER_ENABLED', False)
+
+
+def _vote_field(value):
+    return 'likes' if value == 1 else 'dislikes'
+
+
+def _empty_delta():
+    return {'likes': 0, 'dislikes': 0}
+
+
+class VoteBuffer:
+    """صف رأی‌های ذخیره نشده به همراه تغییر شمارنده‌های هر مورد"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # (نوع، شناسه مورد، شناسه کاربر) -> {'base': رأی در پایگاه‌داده، 'desired': رأی نهایی}
+        self._pending = {}
+        self._deltas = defaultdict(_empty_delta)
+        # دسته‌ای که در حال ذخیره است (برای شمارنده‌های خوش‌بینانه)
+        self._inflight = {}
+        self._inflight_deltas = {}
+        self._wake = threading.Event()
+        self._worker = None
+        self._stats = {
+            'flush_count': 0,
+            'flushed_votes': 0,
+            'failed_flushes': 0,
+            'last_flush_ms': None,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+            'last_flush_at': None,
+        }
+
+    # =========================
+    # ثبت رأی
+    # =========================
+    def toggle(self, kind, target_id, user_id, value):
+        """ثبت رأی value (۱ یا ۱-) با منطق toggle؛ خروجی: (رأی فعلی کاربر، لایک‌ها، دیس‌لایک‌ها)"""
+        vote_model = VOTE_MODELS[kind]
+        key = (kind, target_id, user_id)
+
+        with self._lock:
+            known = key in self._pending or key in self._inflight
+        current = None
+        if not known:
+            current = vote_model.objects.filter(
+                **{f'{vote_model.target_field}_id': target_id}, user_id=user_id
+            ).values_list('value', flat=True).first()
+
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                inflight = self._inflight.get(key)
+                base = inflight['desired'] if inflight else current
+                entry = self._pending[key] = {'base': base, 'desired': base}
+
+            old = entry['desired']
+            new = None if old == value else value
+            entry['desired'] = new
+
+            delta = self._deltas[(kind, target_id)]
+            if old is not None:
+                delta[_vote_field(old)] -= 1
+            if new is not None:
+                delta[_vote_field(new)] += 1
+
+            # رأی‌هایی که به حالت اولیه برگشته‌اند نیازی به ذخیره ندارند
+            if entry['desired'] == entry['base']:
+                del self._pending[key]
+
+            pending_delta = self._combined_delta(kind, target_id)
+            depth = len(self._pending)
+
+        self._ensure_worker()
+        if depth >= getattr(settings, 'REVIEWS_VOTE_BUFFER_MAX_BATCH', 500):
+            self._wake.set()
+
+        likes, dislikes = vote_model.target_model().objects.filter(
+            pk=target_id
+        ).values_list('likes', 'dislikes').first() or (0, 0)
+        return new, likes + pending_delta['likes'], dislikes + pending_delta['dislikes']
+
+    def user_votes(self, kind, user_id, target_ids):
+        """رأی‌های ذخیره نشده کاربر روی موارد داده شده: {شناسه مورد: رأی یا None}"""
+        votes = {}
+        with self._lock:
+            for entries in (self._inflight, self._pending):
+                for target_id in target_ids:
+                    entry = entries.get((kind, target_id, user_id))
+                    if entry is not None:
+                        votes[target_id] = entry['desired']
+        return votes
+
+    def pending_deltas(self, kind, target_ids):
+        """تغییر ذخیره نشده شمارنده‌های چند مورد با یک بار گرفتن قفل: {شناسه مورد: {'likes', 'dislikes'}}"""
+        with self._lock:
+            deltas = {target_id: self._combined_delta(kind, target_id) for target_id in target_ids}
+        return {target_id: delta for target_id, delta in deltas.items() if delta['likes'] or delta['dislikes']}
+
+    def _combined_delta(self, kind, target_id):
+        combined = _empty_delta()
+        for deltas in (self._inflight_deltas, self._deltas):
+            delta = deltas.get((kind, target_id))
+            if delta:
+                combined['likes'] += delta['likes']
+                combined['dislikes'] += delta['dislikes']
+        return combined
+
+    # =========================
+    # ذخیره دسته‌ای
+    # =========================
+    def flush(self):
+        """ذخیره همه رأی‌های بافر شده در یک تراکنش؛ خروجی: تعداد رأی‌های ذخیره شده"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+                self._inflight_deltas, self._deltas = dict(self._deltas), defaultdict(_empty_delta)
+
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    for kind, vote_model in VOTE_MODELS.items():
+                        entries = {
+                            (target_id, user_id): entry['desired']
+                            for (entry_kind, target_id, user_id), entry in batch.items()
+                            if entry_kind == kind
+                        }
+                        if entries:
+                            self._apply(vote_model, entries)
+            except Exception as e:
+                logger.error(f"خطا در ذخیره {len(batch)} رأی بافر شده: {e}")
+                with self._lock:
+                    self._requeue(batch)
+                    self._stats['failed_flushes'] += 1
+                return 0
+            finally:
+                close_old_connections()
+
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._inflight = {}
+                self._inflight_deltas = {}
+                self._stats['flush_count'] += 1
+                self._stats['flushed_votes'] += len(batch)
+                self._stats['last_flush_ms'] = round(elapsed, 2)
+                self._stats['max_flush_ms'] = round(max(self._stats['max_flush_ms'], elapsed), 2)
+                self._stats['total_flush_ms'] += elapsed
+                self._stats['last_flush_at'] = time.time()
+            return len(batch)
+
+    def _apply(self, vote_model, entries):
+        target_field = f'{vote_model.target_field}_id'
+        target_model = vote_model.target_model()
+        target_ids = {target_id for target_id, user_id in entries}
+        user_ids = {user_id for target_id, user_id in entries}
+
+        # مواردی که در این فاصله حذف شده‌اند کنار گذاشته می‌شوند
+        live_targets = set(target_model.objects.filter(pk__in=target_ids).values_list('pk', flat=True))
+        existing = {
+            (target_id, user_id): (pk, value)
+            for pk, target_id, user_id, value in vote_model.objects.filter(
+                **{f'{target_field}__in': target_ids}, user_id__in=user_ids
+            ).values_list('pk', target_field, 'user_id', 'value')
+        }
+
+        creates = []
+        updates = {1: [], -1: []}
+        deletes = []
+        deltas = defaultdict(_empty_delta)
+        for (target_id, user_id), desired in entries.items():
+            if target_id not in live_targets:
+                continue
+            pk, actual = existing.get((target_id, user_id), (None, None))
+            if actual == desired:
+                continue
+            if desired is None:
+                # شمارنده رأی‌های حذف شده توسط سیگنال post_delete اصلاح می‌شود
+                deletes.append(pk)
+                continue
+            if actual is None:
+                creates.append(vote_model(**{target_field: target_id}, user_id=user_id, value=desired))
+            else:
+                updates[desired].append(pk)
+                deltas[target_id][_vote_field(actual)] -= 1
+            deltas[target_id][_vote_field(desired)] += 1
+
+        vote_model.objects.bulk_create(creates, batch_size=500)
+        for value, pks in updates.items():
+            if pks:
+                vote_model.objects.filter(pk__in=pks).update(value=value)
+        if deletes:
+            vote_model.objects.filter(pk__in=deletes).delete()
+        target_model.apply_vote_deltas(deltas)
+
+    def _requeue(self, batch):
+        """بازگرداندن دسته ناموفق به صف، با حفظ رأی‌های جدیدتر"""
+        for key, entry in batch.items():
+            if key in self._pending:
+                self._pending[key]['base'] = entry['base']
+            else:
+                self._pending[key] = entry
+        for target, delta in self._inflight_deltas.items():
+            self._deltas[target]['likes'] += delta['likes']
+            self._deltas[target]['dislikes'] += delta['dislikes']
+        self._inflight = {}
+        self._inflight_deltas = {}
+
+    # =========================
+    # پردازش پس‌زمینه
+    # =========================
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='vote-buffer-flush', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        interval = getattr(settings, 'REVIEWS_VOTE_BUFFER_FLUSH_INTERVAL', 1.0)
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"خطا در پردازش بافر رأی‌ها: {e}")
+
+    # =========================
+    # آمار
+    # =========================
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._pending)
+            stats['inflight'] = len(self._inflight)
+        flushes = stats.pop('total_flush_ms')
+        stats['avg_flush_ms'] = round(flushes / stats['flush_count'], 2) if stats['flush_count'] else None
+        stats['enabled'] = enabled()
+        return stats
+
+
+vote_buffer = VoteBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        vote_buffer.flush()
+    except Exception as e:
+        logger.error(f"خطا در ذخیره رأی‌های بافر شده هنگام خروج: {e}")
@@ -0,0 +1,97 @@
+"""
+سرویس رأی‌دهی مشترک برای نظرات و پاسخ‌ها
+
+هر رأی با منطق toggle اعمال می‌شود: رأی تکراری حذف، رأی مخالف جایگزین و در
+غیر این صورت رأی جدید ثبت می‌شود. تغییر رأی و شمارنده‌های هدف در یک تراکنش
+انجام می‌شود و به‌جای get_or_create (که در درخواست‌های هم‌زمان با محدودیت
+unique_together به IntegrityError می‌خورد) هر حالت با یک دستور نوشتنی شرطی
+اجرا می‌شود.
+"""
+from django.db import IntegrityError, transaction
+
+from .models import AnswerVote, ReviewVote
+
+VOTE_MODELS = {
+    'review': ReviewVote,
+    'answer': AnswerVote,
+}
+
+VOTE_VALUES = (1, -1)
+MAX_BATCH_VOTES = 50
+# تلاش اول و یک تکرار پس از برخورد با رأی هم‌زمان
+TOGGLE_ATTEMPTS = 2
+
+
+def _insert_vote(vote_model, lookup, value):
+    """درج رأی جدید؛ False اگر درخواست هم‌زمانی زودتر رأی همین کاربر را ثبت کرده باشد"""
+    try:
+        with transaction.atomic():
+            vote_model.objects.create(**lookup, value=value)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _apply_toggle(vote_model, target_id, user_id, value):
+    """اعمال یک رأی با منطق toggle؛ خروجی: رأی نهایی کاربر (۱، ۱- یا None)"""
+    lookup = {f'{vote_model.target_field}_id': target_id, 'user_id': user_id}
+
+    for attempt in range(TOGGLE_ATTEMPTS):
+        # ۱) همان رأی قبلاً ثبت شده: حذف (شمارنده توسط سیگنال post_delete کم می‌شود)
+        deleted, _ = vote_model.objects.filter(**lookup, value=value).delete()
+        if deleted:
+            return None
+
+        # ۲) رأی مخالف ثبت شده: تغییر مقدار
+        if vote_model.objects.filter(**lookup).exclude(value=value).update(value=value):
+            vote_model.target_model().apply_vote_delta(target_id, -value, value)
+            return value
+
+        # ۳) رأی جدید؛ اگر درخواست هم‌زمانی زودتر ثبت کرده باشد، toggle روی رأی موجود تکرار می‌شود
+        if _insert_vote(vote_model, lookup, value):
+            return value
+
+    raise IntegrityError(f"رأی کاربر {user_id} روی {vote_model.target_field} {target_id} پس از {TOGGLE_ATTEMPTS} تلاش ثبت نشد")
+
+
+def vote_counts(kind, target_ids):
+    """شمارنده‌های فعلی: {شناسه: (لایک‌ها، دیس‌لایک‌ها)}"""
+    target_model = VOTE_MODELS[kind].target_model()
+    return {
+        pk: (likes, dislikes)
+        for pk, likes, dislikes in target_model.objects.filter(
+            pk__in=target_ids
+        ).order_by().values_list('pk', 'likes', 'dislikes')
+    }
+
+
+def toggle_vote(kind, target_id, user_id, value):
+    """ثبت یک رأی؛ خروجی: (رأی نهایی کاربر، لایک‌ها، دیس‌لایک‌ها)"""
+    with transaction.atomic():
+        user_vote = _apply_toggle(VOTE_MODELS[kind], target_id, user_id, value)
+        likes, dislikes = vote_counts(kind, [target_id]).get(target_id, (0, 0))
+    return user_vote, likes, dislikes
+
+
+def toggle_votes(user_id, votes):
+    """ثبت چند رأی در یک تراکنش
+
+    votes فهرستی از (نوع، شناسه مورد، مقدار) است؛ خروجی برای هر رأی به همان
+    ترتیب: (نوع، شناسه، رأی نهایی کاربر، لایک‌ها، دیس‌لایک‌ها). شمارنده‌ها
+    پس از اعمال همه رأی‌ها با یک کوئری برای هر نوع خوانده می‌شوند.
+    """
+    with transaction.atomic():
+        user_votes = [
+            _apply_toggle(VOTE_MODELS[kind], target_id, user_id, value)
+            for kind, target_id, value in votes
+        ]
+        counts = {
+            kind: vote_counts(kind, {target_id for vote_kind, target_id, value in votes if vote_kind == kind})
+            for kind in {kind for kind, target_id, value in votes}
+        }
+
+    results = []
+    for (kind, target_id, value), user_vote in zip(votes, user_votes):
+        likes, dislikes = counts[kind].get(target_id, (0, 0))
+        results.append((kind, target_id, user_vote, likes, dislikes))
+    return results